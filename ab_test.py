@@ -0,0 +1,71 @@
+# Copyright Sierra
+
+import argparse
+from typing import Any, Dict, List
+
+from run import config_from_args, get_parser
+from tau_bench.types import RunConfig
+from tau_bench.ab_test import run_ab_test
+
+
+def parse_overrides(specs: List[str]) -> Dict[str, Any]:
+    """Parses `key=value` overrides of the run config, e.g. `model=gpt-4o-mini` or
+    `agent-strategy=react`."""
+    overrides = {}
+    for spec in specs:
+        if "=" not in spec:
+            raise argparse.ArgumentTypeError(f"Expected key=value, got {spec!r}")
+        key, value = spec.split("=", 1)
+        key = key.strip().lstrip("-").replace("-", "_")
+        if key not in RunConfig.model_fields:
+            raise argparse.ArgumentTypeError(f"Unknown run config field: {key}")
+        overrides[key] = value
+    return overrides
+
+
+def main():
+    parser = get_parser()
+    parser.description = (
+        "Sequential A/B test: the run arguments configure A, and --b overrides them for B"
+    )
+    parser.add_argument(
+        "--b",
+        type=str,
+        nargs="+",
+        required=True,
+        help="Overrides of the run config for B, e.g. --b model=gpt-4o-mini agent-strategy=react",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of the sequential test",
+    )
+    parser.add_argument(
+        "--min-effect",
+        type=float,
+        default=0.05,
+        help="Stop as negligible once the difference in reward is known to be within +/- this",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="Task pairs per batch between tests (default: half of --max-concurrency)",
+    )
+    args = parser.parse_args()
+    print(args)
+    config_a = config_from_args(args)
+    config_b = RunConfig.model_validate(
+        {**config_a.model_dump(), **parse_overrides(args.b)}
+    )
+    run_ab_test(
+        config_a,
+        config_b,
+        confidence=args.confidence,
+        min_effect=args.min_effect,
+        batch_size=args.batch_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from tau_bench.envs.airline.tasks_test import TASKS as AIRLINE_TASKS
 from tau_bench.envs.retail.tasks_test import TASKS_TEST as RETAIL_TASKS
 from tau_bench.model_utils.args import api_parser
 from tau_bench.types import Task, Action
+from tau_bench.result_reader import iter_records
 from typing import List, Dict, Any
 from concurrent.futures import ThreadPoolExecutor
 
@@ -177,9 +178,6 @@ def fault_type_analysis(api: API, results: List[OriginalResult], max_concurrency
 def main() -> None:
     args = get_args()
     api = default_api_from_args(args)
-    with open(args.results_path, "r") as f:
-        results = json.load(f)
-    print(f"Loaded {len(results)} results")
     env = args.env
     if env == "airline":
         tasks: List[Task] = AIRLINE_TASKS
@@ -187,11 +185,21 @@ def main() -> None:
         tasks: List[Task] = RETAIL_TASKS
     else:
         raise ValueError(f"Invalid environment: {env}")
-    failed_results = [r for r in results if r["reward"] <= 1e-3]
-    print(f"Found {len(failed_results)} failed trajectories")
-    if args.max_num_failed_results is not None and len(failed_results) > args.max_num_failed_results:
+    # stream the results file and only keep the trajectories that will be analyzed
+    num_results = 0
+    num_failed_results = 0
+    failed_results = []
+    for r in iter_records(args.results_path):
+        num_results += 1
+        if r["reward"] > 1e-3:
+            continue
+        num_failed_results += 1
+        if args.max_num_failed_results is None or len(failed_results) < args.max_num_failed_results:
+            failed_results.append(r)
+    print(f"Loaded {num_results} results")
+    print(f"Found {num_failed_results} failed trajectories")
+    if len(failed_results) < num_failed_results:
         print(f"Limiting to {args.max_num_failed_results} failed trajectories")
-        failed_results = failed_results[:args.max_num_failed_results]
     original_results = []
     for result in failed_results:
         task_id: int = result["task_id"]
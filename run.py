@@ -2,12 +2,16 @@
 
 import argparse
 from tau_bench.types import RunConfig
-from tau_bench.run import run
+from tau_bench.run import parse_target, run
 from litellm import provider_list
 from tau_bench.envs.user import UserStrategy
+from tau_bench.rate_limit import parse_rate_limit
+from tau_bench.concurrency import parse_call_limit
+from tau_bench.scheduling import SchedulePolicy
+from tau_bench.cassette import CassetteMode
 
 
-def parse_args() -> RunConfig:
+def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument("--num-trials", type=int, default=1)
     parser.add_argument(
@@ -55,6 +59,12 @@ def parse_args() -> RunConfig:
         choices=["train", "test", "dev"],
         help="The split of tasks to run (only applies to the retail domain for now",
     )
+    parser.add_argument(
+        "--targets",
+        type=str,
+        nargs="+",
+        help="(Optional) run several envs and task splits on one worker pool, as <env>[:<split>] (e.g. airline retail:test), instead of --env and --task-split",
+    )
     parser.add_argument("--start-index", type=int, default=0)
     parser.add_argument("--end-index", type=int, default=-1, help="Run all tasks if -1")
     parser.add_argument("--task-ids", type=int, nargs="+", help="(Optional) run only the tasks with the given IDs")
@@ -65,12 +75,162 @@ def parse_args() -> RunConfig:
         default=1,
         help="Number of tasks to run in parallel",
     )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help="Adjust the number of in-flight tasks and LLM calls from rate-limit feedback, up to --max-concurrency",
+    )
+    parser.add_argument(
+        "--initial-concurrency",
+        type=int,
+        help="(Optional) starting concurrency for --adaptive-concurrency (defaults to --max-concurrency)",
+    )
+    parser.add_argument(
+        "--max-llm-retries",
+        type=int,
+        default=5,
+        help="Number of times a rate-limited or timed out LLM call is retried before the task fails",
+    )
+    parser.add_argument(
+        "--rate-limits",
+        type=str,
+        nargs="+",
+        help="(Optional) request and token budgets per minute shared by the agent and user simulator, as <provider>[/<model>]=<rpm>:<tpm> (e.g. openai=500:300000)",
+    )
+    parser.add_argument(
+        "--call-limits",
+        type=str,
+        nargs="+",
+        help="(Optional) max in-flight LLM calls per role or endpoint, as <agent|user|provider[/model]>=<n> (e.g. agent=64 user=8 openai=16); calls wait for a free slot in both their role's and their endpoint's pool",
+    )
+    parser.add_argument(
+        "--schedule-from",
+        type=str,
+        nargs="+",
+        help="(Optional) prior result files used to estimate how long each task takes",
+    )
+    parser.add_argument(
+        "--schedule-policy",
+        type=str,
+        default="longest-first",
+        choices=[item.value for item in SchedulePolicy],
+        help="The order in which to start tasks when --schedule-from is given",
+    )
+    parser.add_argument(
+        "--telemetry-interval",
+        type=float,
+        default=30.0,
+        help="Seconds between live progress lines and rewrites of the run's metrics JSON file (0 to disable)",
+    )
+    parser.add_argument(
+        "--max-cost",
+        type=float,
+        help="(Optional) stop starting tasks, and cancel running ones, once the agent and user simulator have spent this many dollars",
+    )
+    parser.add_argument(
+        "--max-cost-per-episode",
+        type=float,
+        help="(Optional) cancel a task once its agent and user simulator have spent this many dollars",
+    )
+    parser.add_argument(
+        "--episode-timeout",
+        type=float,
+        help="(Optional) wall-clock seconds after which a task is cancelled and recorded with outcome 'timeout'",
+    )
+    parser.add_argument(
+        "--llm-call-timeout",
+        type=float,
+        help="(Optional) timeout in seconds for each LLM call",
+    )
+    parser.add_argument(
+        "--results-db",
+        type=str,
+        help="(Optional) path to a SQLite result store to also write every episode to (see tau_bench/store.py)",
+    )
     parser.add_argument("--seed", type=int, default=10)
     parser.add_argument("--shuffle", type=int, default=0)
     parser.add_argument("--user-strategy", type=str, default="llm", choices=[item.value for item in UserStrategy])
     parser.add_argument("--few-shot-displays-path", type=str, help="Path to a jsonlines file containing few shot displays")
-    args = parser.parse_args()
-    print(args)
+    parser.add_argument(
+        "--queue-path",
+        type=str,
+        help="(Optional) path to a shared SQLite work queue; workers started with the same path split the tasks between them",
+    )
+    parser.add_argument(
+        "--queue-lease-seconds",
+        type=float,
+        default=300.0,
+        help="Seconds without a heartbeat after which a claimed task is handed to another worker",
+    )
+    parser.add_argument(
+        "--queue-max-attempts",
+        type=int,
+        default=3,
+        help="Times a queued task is claimed without a result before it is marked failed",
+    )
+    parser.add_argument(
+        "--sample-fraction",
+        type=float,
+        help="(Optional) run a stratified sample of this fraction of the tasks and estimate the full-suite metrics",
+    )
+    parser.add_argument(
+        "--sample-strata-from",
+        type=str,
+        nargs="+",
+        help="(Optional) prior result files whose per-task rewards are used to stratify the sample by difficulty",
+    )
+    parser.add_argument(
+        "--cassette",
+        type=str,
+        help="(Optional) path to a cassette file of recorded LLM requests and responses",
+    )
+    parser.add_argument(
+        "--cassette-mode",
+        type=str,
+        default="record",
+        choices=[item.value for item in CassetteMode],
+        help="Record every response to the cassette, replay from it (a miss fails the episode), or replay and record misses",
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        help="(Optional) keep the agent's conversation under this many tokens by eliding stale tool outputs (keeping the ids they mention)",
+    )
+    parser.add_argument(
+        "--completion-cache",
+        type=str,
+        help="(Optional) path to a SQLite cache of agent completions; requests made before at temperature 0 are served from it",
+    )
+    parser.add_argument(
+        "--completion-cache-max-mb",
+        type=float,
+        default=1024.0,
+        help="Evict the least recently used completions once the cache is larger than this",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream agent completions and act as soon as the action is complete (tool-calling, act and react agents)",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        help="(Optional) write spans of the run, episodes, steps, LLM calls, tool calls and rewards to this Chrome trace file (open it in https://ui.perfetto.dev)",
+    )
+    return parser
+
+
+def config_from_args(args: argparse.Namespace) -> RunConfig:
+    rate_limits = None
+    if args.rate_limits:
+        rate_limits = {}
+        for spec in args.rate_limits:
+            rate_limits.update(parse_rate_limit(spec))
+    call_limits = None
+    if args.call_limits:
+        call_limits = {}
+        for spec in args.call_limits:
+            call_limits.update(parse_call_limit(spec))
     return RunConfig(
         model_provider=args.model_provider,
         user_model_provider=args.user_model_provider,
@@ -90,9 +250,41 @@ def parse_args() -> RunConfig:
         shuffle=args.shuffle,
         user_strategy=args.user_strategy,
         few_shot_displays_path=args.few_shot_displays_path,
+        queue_path=args.queue_path,
+        queue_lease_seconds=args.queue_lease_seconds,
+        queue_max_attempts=args.queue_max_attempts,
+        adaptive_concurrency=args.adaptive_concurrency,
+        initial_concurrency=args.initial_concurrency,
+        max_llm_retries=args.max_llm_retries,
+        rate_limits=rate_limits,
+        call_limits=call_limits,
+        schedule_from=args.schedule_from,
+        schedule_policy=args.schedule_policy,
+        telemetry_interval=args.telemetry_interval,
+        max_cost=args.max_cost,
+        max_cost_per_episode=args.max_cost_per_episode,
+        episode_timeout=args.episode_timeout,
+        llm_call_timeout=args.llm_call_timeout,
+        results_db=args.results_db,
+        sample_fraction=args.sample_fraction,
+        sample_strata_from=args.sample_strata_from,
+        cassette_path=args.cassette,
+        cassette_mode=args.cassette_mode,
+        trace_path=args.trace,
+        context_budget=args.context_budget,
+        completion_cache_path=args.completion_cache,
+        completion_cache_max_mb=args.completion_cache_max_mb,
+        stream=args.stream,
+        targets=[parse_target(spec) for spec in args.targets] if args.targets else None,
     )
 
 
+def parse_args() -> RunConfig:
+    args = get_parser().parse_args()
+    print(args)
+    return config_from_args(args)
+
+
 def main():
     config = parse_args()
     run(config)
@@ -19,4 +19,9 @@ setup(
         "numpy>=1.26.4",
         "litellm>=1.41.0",
     ],
+    entry_points={
+        "console_scripts": [
+            "tau-bench=tau_bench.cli:main",
+        ],
+    },
 )
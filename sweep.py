@@ -0,0 +1,57 @@
+# Copyright Sierra
+
+from run import config_from_args, get_parser
+from tau_bench.sweep import expand_grid, parse_model, parse_provider_concurrency, run_sweep
+
+
+def main():
+    parser = get_parser()
+    parser.description = (
+        "Runs a grid of models, temperatures and agent strategies in one process; "
+        "the run arguments set everything else"
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        nargs="+",
+        help="Agent models as <provider>/<model>, e.g. openai/gpt-4o anthropic/claude-3-5-sonnet-20241022 (default: --model-provider/--model)",
+    )
+    parser.add_argument(
+        "--temperatures",
+        type=float,
+        nargs="+",
+        help="Agent sampling temperatures (default: --temperature)",
+    )
+    parser.add_argument(
+        "--agent-strategies",
+        type=str,
+        nargs="+",
+        choices=["tool-calling", "act", "react", "few-shot"],
+        help="Agent strategies (default: --agent-strategy)",
+    )
+    parser.add_argument(
+        "--provider-concurrency",
+        type=str,
+        nargs="+",
+        help="Workers per agent model provider as <provider>=<n>, e.g. openai=20 anthropic=5 (default: --max-concurrency for each)",
+    )
+    args = parser.parse_args()
+    print(args)
+    models = [parse_model(spec) for spec in args.models] if args.models else []
+    if args.model is None and len(models) > 0:
+        args.model_provider, args.model = models[0]
+    provider_concurrency = {}
+    for spec in args.provider_concurrency or []:
+        provider_concurrency.update(parse_provider_concurrency(spec))
+    config = config_from_args(args)
+    points = expand_grid(
+        config,
+        models=models,
+        temperatures=args.temperatures,
+        agent_strategies=args.agent_strategies,
+    )
+    run_sweep(config, points, provider_concurrency=provider_concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,19 @@
 # Copyright Sierra
 
-from tau_bench.envs.base import Env as Env
-from tau_bench.agents.base import Agent as Agent
+from typing import Any
+
+# `Env` and `Agent` are imported on first use, so that importing any tau_bench module
+# does not pull in the envs, the agents and litellm (which alone takes seconds)
+__all__ = ["Env", "Agent"]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "Env":
+        from tau_bench.envs.base import Env
+
+        return Env
+    if name == "Agent":
+        from tau_bench.agents.base import Agent
+
+        return Agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
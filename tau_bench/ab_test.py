@@ -0,0 +1,231 @@
+# Copyright Sierra
+
+import os
+import json
+import math
+import random
+import multiprocessing
+from enum import Enum
+from datetime import datetime
+from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel
+
+from tau_bench.envs import get_env
+from tau_bench.env_pool import EnvPool
+from tau_bench.agents.base import Agent
+from tau_bench.types import EnvRunResult, RunConfig
+from tau_bench.run import (
+    agent_factory,
+    check_config,
+    display_metrics,
+    env_factory,
+    run_context,
+    run_episode,
+    save_checkpoint,
+    task_indices,
+)
+
+
+class Decision(Enum):
+    CONTINUE = "continue"
+    B_BETTER = "b-better"
+    A_BETTER = "a-better"
+    NEGLIGIBLE = "negligible"
+    INCONCLUSIVE = "inconclusive"
+
+
+class ConfidenceSequence(object):
+    """An anytime-valid confidence sequence for the mean paired difference in reward
+    (B minus A, in [-1, 1]).
+
+    It uses the normal-mixture boundary for sub-Gaussian increments (Howard et al.,
+    "Time-uniform, nonparametric, nonasymptotic confidence sequences", 2021), so it
+    can be checked after every batch without inflating the error rate. `rho` sets the
+    number of pairs at which the boundary is tightest.
+    """
+
+    # a difference of two rewards in [0, 1] is 1-sub-Gaussian
+    VARIANCE_PROXY = 1.0
+
+    def __init__(self, confidence: float = 0.95, rho: float = 100.0) -> None:
+        self.alpha = 1 - confidence
+        self.rho = rho
+        self.n = 0
+        self.total = 0.0
+
+    def update(self, diffs: List[float]) -> None:
+        self.n += len(diffs)
+        self.total += sum(diffs)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n > 0 else 0.0
+
+    def radius(self) -> float:
+        if self.n == 0:
+            return math.inf
+        v = self.VARIANCE_PROXY * self.n + self.rho
+        # two-sided: alpha / 2 on each side
+        return math.sqrt(v * math.log(v / (self.rho * (self.alpha / 2) ** 2))) / self.n
+
+    def interval(self) -> Tuple[float, float]:
+        r = self.radius()
+        return max(-1.0, self.mean - r), min(1.0, self.mean + r)
+
+    def decide(self, min_effect: float) -> Decision:
+        low, high = self.interval()
+        if low > 0:
+            return Decision.B_BETTER
+        if high < 0:
+            return Decision.A_BETTER
+        if -min_effect < low and high < min_effect:
+            return Decision.NEGLIGIBLE
+        return Decision.CONTINUE
+
+
+class ABTestResult(BaseModel):
+    decision: str
+    num_pairs: int
+    mean_diff: float
+    low: float
+    high: float
+    avg_reward_a: Optional[float]
+    avg_reward_b: Optional[float]
+    ckpt_path_a: str
+    ckpt_path_b: str
+
+
+def _build_agent(config: RunConfig) -> Tuple[Agent, EnvPool, int]:
+    env = get_env(
+        config.env,
+        user_strategy=config.user_strategy,
+        user_model=config.user_model,
+        user_provider=config.user_model_provider,
+        task_split=config.task_split,
+    )
+    agent = agent_factory(tools_info=env.tools_info, wiki=env.wiki, config=config)
+    return agent, EnvPool(env_factory(config), [env]), len(env.tasks)
+
+
+def run_ab_test(
+    config_a: RunConfig,
+    config_b: RunConfig,
+    confidence: float = 0.95,
+    min_effect: float = 0.05,
+    batch_size: Optional[int] = None,
+) -> ABTestResult:
+    """Runs A and B on the same (task, trial) pairs, batch by batch, until the paired
+    difference in reward is significant, clearly smaller than `min_effect`, or
+    `config_a.num_trials` sweeps over the tasks are done.
+
+    Each sweep visits the tasks in a fresh random order. The process-wide settings
+    (concurrency, rate limits, cost budget, retries) are taken from `config_a`.
+    """
+    check_config(config_a)
+    check_config(config_b)
+    assert config_a.env == config_b.env, "A and B must run on the same env"
+    if not os.path.exists(config_a.log_dir):
+        os.makedirs(config_a.log_dir)
+    time_str = datetime.now().strftime("%m%d%H%M%S")
+    ckpt_path_a = f"{config_a.log_dir}/ab_{time_str}_a.json"
+    ckpt_path_b = f"{config_a.log_dir}/ab_{time_str}_b.json"
+    lock = multiprocessing.Lock()
+
+    with run_context(config_a):
+        agent_a, env_pool_a, num_tasks = _build_agent(config_a)
+        agent_b, env_pool_b, _ = _build_agent(config_b)
+        tasks = task_indices(config_a, num_tasks)
+        batch_size = batch_size if batch_size is not None else max(1, config_a.max_concurrency // 2)
+        sequence = ConfidenceSequence(confidence=confidence, rho=float(len(tasks)))
+        max_pairs = len(tasks) * config_a.num_trials
+        print(
+            f"A/B test on {len(tasks)} tasks, up to {config_a.num_trials} trials "
+            f"({2 * max_pairs} episodes at most), batches of {batch_size} pairs"
+        )
+        print(f"A/B results: {ckpt_path_a} (A) and {ckpt_path_b} (B)")
+        results_a: List[EnvRunResult] = []
+        results_b: List[EnvRunResult] = []
+        decision = Decision.CONTINUE
+        pairs = [
+            (idx, trial)
+            for trial in range(config_a.num_trials)
+            for idx in random.sample(tasks, len(tasks))
+        ]
+
+        def _run(
+            config: RunConfig, agent: Agent, env_pool: EnvPool, idx: int, trial: int, path: str
+        ) -> Optional[EnvRunResult]:
+            result = run_episode(
+                config=config, agent=agent, task_index=idx, trial=trial, env_pool=env_pool
+            )
+            if result is not None:
+                save_checkpoint(path, result, lock)
+            return result
+
+        with ThreadPoolExecutor(max_workers=config_a.max_concurrency) as executor:
+            for start in range(0, len(pairs), batch_size):
+                batch = pairs[start : start + batch_size]
+                # interleave A and B so that both see the same provider conditions
+                futures = [
+                    (
+                        executor.submit(_run, config_a, agent_a, env_pool_a, idx, trial, ckpt_path_a),
+                        executor.submit(_run, config_b, agent_b, env_pool_b, idx, trial, ckpt_path_b),
+                    )
+                    for idx, trial in batch
+                ]
+                diffs = []
+                skipped = False
+                for future_a, future_b in futures:
+                    result_a, result_b = future_a.result(), future_b.result()
+                    if result_a is None or result_b is None:
+                        # out of budget: an unpaired episode says nothing about the difference
+                        skipped = True
+                        continue
+                    results_a.append(result_a)
+                    results_b.append(result_b)
+                    diffs.append(result_b.reward - result_a.reward)
+                sequence.update(diffs)
+                decision = sequence.decide(min_effect)
+                low, high = sequence.interval()
+                print(
+                    f"🔬 {sequence.n} pairs: B - A = {sequence.mean:+.4f} "
+                    f"({confidence:.0%} CS {low:+.4f} to {high:+.4f}) -> {decision.value}"
+                )
+                if decision != Decision.CONTINUE or skipped:
+                    break
+    if decision == Decision.CONTINUE:
+        decision = Decision.INCONCLUSIVE
+    low, high = sequence.interval()
+    result = ABTestResult(
+        decision=decision.value,
+        num_pairs=sequence.n,
+        mean_diff=sequence.mean,
+        low=low,
+        high=high,
+        avg_reward_a=sum(r.reward for r in results_a) / len(results_a) if results_a else None,
+        avg_reward_b=sum(r.reward for r in results_b) / len(results_b) if results_b else None,
+        ckpt_path_a=ckpt_path_a,
+        ckpt_path_b=ckpt_path_b,
+    )
+    for name, results in [("A", results_a), ("B", results_b)]:
+        if len(results) > 0:
+            print(f"--- {name} ---")
+            display_metrics(results)
+    print(
+        f"\n🧪 Decision: {result.decision} after {result.num_pairs} pairs "
+        f"({2 * result.num_pairs} of at most {2 * max_pairs} episodes)"
+    )
+    with open(f"{config_a.log_dir}/ab_{time_str}.json", "w") as f:
+        json.dump(
+            {
+                "config_a": config_a.model_dump(),
+                "config_b": config_b.model_dump(),
+                "confidence": confidence,
+                "min_effect": min_effect,
+                **result.model_dump(),
+            },
+            f,
+            indent=2,
+        )
+    return result
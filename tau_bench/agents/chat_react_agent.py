@@ -1,10 +1,15 @@
 # Copyright Sierra
 
 import json
-from litellm import completion
+from tau_bench.llm import completion
 
 from tau_bench.agents.base import Agent
 from tau_bench.envs.base import Env
+from tau_bench.episode import track_messages
+from tau_bench.tracing import span
+from tau_bench.prompt_cache import cache_prefix
+from tau_bench.compaction import ContextCompactor
+from tau_bench.streaming import react_action_ready
 from tau_bench.types import (
     Action,
     SolveResult,
@@ -23,6 +28,8 @@ class ChatReActAgent(Agent):
         provider: str,
         use_reasoning: bool = True,
         temperature: float = 0.0,
+        context_budget: Optional[int] = None,
+        stream: bool = False,
     ) -> None:
         instruction = REACT_INSTRUCTION if use_reasoning else ACT_INSTRUCTION
         self.prompt = (
@@ -32,6 +39,8 @@ class ChatReActAgent(Agent):
         self.provider = provider
         self.temperature = temperature
         self.use_reasoning = use_reasoning
+        self.context_budget = context_budget
+        self.stream = stream
         self.tools_info = tools_info
 
     def generate_next_step(
@@ -40,8 +49,10 @@ class ChatReActAgent(Agent):
         res = completion(
             model=self.model,
             custom_llm_provider=self.provider,
-            messages=messages,
+            messages=cache_prefix(messages, self.model, self.provider),
             temperature=self.temperature,
+            # stop reading once the action is complete
+            stream_until=react_action_ready if self.stream else None,
         )
         message = res.choices[0].message
         action_str = message.content.split("Action:")[-1].strip()
@@ -67,29 +78,41 @@ class ChatReActAgent(Agent):
             {"role": "system", "content": self.prompt},
             {"role": "user", "content": response.observation},
         ]
+        track_messages(messages)
         total_cost = 0.0
         info = {}
-        for _ in range(max_num_steps):
-            message, action, cost = self.generate_next_step(messages)
-            response = env.step(action)
-            obs = response.observation
-            reward = response.reward
-            info = {**info, **response.info.model_dump()}
-            if action.name != RESPOND_ACTION_NAME:
-                obs = "API output: " + obs
-            messages.extend(
-                [
-                    message,
-                    {"role": "user", "content": obs},
-                ]
-            )
-            total_cost += cost
-            if response.done:
-                break
+        compactor = (
+            ContextCompactor(self.context_budget, self.model, self.provider)
+            if self.context_budget is not None
+            else None
+        )
+        for step in range(max_num_steps):
+            with span("agent.step", "agent", step=step):
+                message, action, cost = self.generate_next_step(
+                    compactor.compact(messages) if compactor is not None else messages
+                )
+                response = env.step(action)
+                obs = response.observation
+                reward = response.reward
+                info = {**info, **response.info.model_dump()}
+                if action.name != RESPOND_ACTION_NAME:
+                    obs = "API output: " + obs
+                messages.extend(
+                    [
+                        message,
+                        {"role": "user", "content": obs},
+                    ]
+                )
+                total_cost += cost
+                if response.done:
+                    break
+        if compactor is not None:
+            info["compaction"] = compactor.stats()
         return SolveResult(
             messages=messages,
             reward=reward,
             info=info,
+            total_cost=total_cost,
         )
 
 
@@ -2,11 +2,15 @@
 
 import json
 import random
-from litellm import completion
+from tau_bench.llm import completion
 from typing import List, Optional, Dict, Any
 
 from tau_bench.agents.base import Agent
 from tau_bench.envs.base import Env
+from tau_bench.episode import track_messages
+from tau_bench.tracing import span
+from tau_bench.prompt_cache import cache_prefix
+from tau_bench.compaction import ContextCompactor
 from tau_bench.types import SolveResult, Action, RESPOND_ACTION_NAME
 
 
@@ -20,6 +24,7 @@ class FewShotToolCallingAgent(Agent):
         few_shot_displays: List[str],
         temperature: float = 0.0,
         num_few_shots: int = 5,
+        context_budget: Optional[int] = None,
     ):
         self.tools_info = tools_info
         self.wiki = wiki
@@ -32,6 +37,7 @@ class FewShotToolCallingAgent(Agent):
         self.few_shot_displays = few_shot_displays
         self.temperature = temperature
         self.num_few_shots = num_few_shots
+        self.context_budget = context_budget
     def solve(
         self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
     ) -> SolveResult:
@@ -46,42 +52,52 @@ class FewShotToolCallingAgent(Agent):
             {"role": "system", "content": f"{self.wiki}\n\n{few_shots}"},
             {"role": "user", "content": obs},
         ]
-        for _ in range(max_num_steps):
-            res = completion(
-                messages=messages,
-                model=self.model,
-                custom_llm_provider=self.provider,
-                tools=self.tools_info,
-                temperature=self.temperature,
-            )
-            next_message = res.choices[0].message.model_dump()
-            total_cost += res._hidden_params["response_cost"]
-            action = message_to_action(next_message)
-            env_response = env.step(action)
-            reward = env_response.reward
-            info = {**info, **env_response.info.model_dump()}
-            if action.name != RESPOND_ACTION_NAME:
-                next_message["tool_calls"] = next_message["tool_calls"][:1]
-                messages.extend(
-                    [
-                        next_message,
-                        {
-                            "role": "tool",
-                            "tool_call_id": next_message["tool_calls"][0]["id"],
-                            "name": next_message["tool_calls"][0]["function"]["name"],
-                            "content": env_response.observation,
-                        },
-                    ]
-                )
-            else:
-                messages.extend(
-                    [
-                        next_message,
-                        {"role": "user", "content": env_response.observation},
-                    ]
+        track_messages(messages)
+        compactor = (
+            ContextCompactor(self.context_budget, self.model, self.provider)
+            if self.context_budget is not None
+            else None
+        )
+        for step in range(max_num_steps):
+            with span("agent.step", "agent", step=step):
+                request_messages = compactor.compact(messages) if compactor is not None else messages
+                res = completion(
+                    messages=cache_prefix(request_messages, self.model, self.provider),
+                    model=self.model,
+                    custom_llm_provider=self.provider,
+                    tools=self.tools_info,
+                    temperature=self.temperature,
                 )
-            if env_response.done:
-                break
+                next_message = res.choices[0].message.model_dump()
+                total_cost += res._hidden_params["response_cost"]
+                action = message_to_action(next_message)
+                env_response = env.step(action)
+                reward = env_response.reward
+                info = {**info, **env_response.info.model_dump()}
+                if action.name != RESPOND_ACTION_NAME:
+                    next_message["tool_calls"] = next_message["tool_calls"][:1]
+                    messages.extend(
+                        [
+                            next_message,
+                            {
+                                "role": "tool",
+                                "tool_call_id": next_message["tool_calls"][0]["id"],
+                                "name": next_message["tool_calls"][0]["function"]["name"],
+                                "content": env_response.observation,
+                            },
+                        ]
+                    )
+                else:
+                    messages.extend(
+                        [
+                            next_message,
+                            {"role": "user", "content": env_response.observation},
+                        ]
+                    )
+                if env_response.done:
+                    break
+        if compactor is not None:
+            info["compaction"] = compactor.stats()
         return SolveResult(
             reward=reward,
             info=info,
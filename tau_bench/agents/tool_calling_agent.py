@@ -1,11 +1,16 @@
 # Copyright Sierra
 
 import json
-from litellm import completion
+from tau_bench.llm import completion
 from typing import List, Optional, Dict, Any
 
 from tau_bench.agents.base import Agent
 from tau_bench.envs.base import Env
+from tau_bench.episode import track_messages
+from tau_bench.tracing import span
+from tau_bench.prompt_cache import cache_prefix
+from tau_bench.compaction import ContextCompactor
+from tau_bench.streaming import first_tool_call_ready
 from tau_bench.types import SolveResult, Action, RESPOND_ACTION_NAME
 
 
@@ -17,12 +22,16 @@ class ToolCallingAgent(Agent):
         model: str,
         provider: str,
         temperature: float = 0.0,
+        context_budget: Optional[int] = None,
+        stream: bool = False,
     ):
         self.tools_info = tools_info
         self.wiki = wiki
         self.model = model
         self.provider = provider
         self.temperature = temperature
+        self.context_budget = context_budget
+        self.stream = stream
 
     def solve(
         self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
@@ -36,42 +45,54 @@ class ToolCallingAgent(Agent):
             {"role": "system", "content": self.wiki},
             {"role": "user", "content": obs},
         ]
-        for _ in range(max_num_steps):
-            res = completion(
-                messages=messages,
-                model=self.model,
-                custom_llm_provider=self.provider,
-                tools=self.tools_info,
-                temperature=self.temperature,
-            )
-            next_message = res.choices[0].message.model_dump()
-            total_cost += res._hidden_params["response_cost"] or 0
-            action = message_to_action(next_message)
-            env_response = env.step(action)
-            reward = env_response.reward
-            info = {**info, **env_response.info.model_dump()}
-            if action.name != RESPOND_ACTION_NAME:
-                next_message["tool_calls"] = next_message["tool_calls"][:1]
-                messages.extend(
-                    [
-                        next_message,
-                        {
-                            "role": "tool",
-                            "tool_call_id": next_message["tool_calls"][0]["id"],
-                            "name": next_message["tool_calls"][0]["function"]["name"],
-                            "content": env_response.observation,
-                        },
-                    ]
-                )
-            else:
-                messages.extend(
-                    [
-                        next_message,
-                        {"role": "user", "content": env_response.observation},
-                    ]
+        track_messages(messages)
+        compactor = (
+            ContextCompactor(self.context_budget, self.model, self.provider)
+            if self.context_budget is not None
+            else None
+        )
+        for step in range(max_num_steps):
+            with span("agent.step", "agent", step=step):
+                request_messages = compactor.compact(messages) if compactor is not None else messages
+                res = completion(
+                    messages=cache_prefix(request_messages, self.model, self.provider),
+                    model=self.model,
+                    custom_llm_provider=self.provider,
+                    tools=self.tools_info,
+                    temperature=self.temperature,
+                    # stop reading once the first tool call is complete
+                    stream_until=first_tool_call_ready if self.stream else None,
                 )
-            if env_response.done:
-                break
+                next_message = res.choices[0].message.model_dump()
+                total_cost += res._hidden_params["response_cost"] or 0
+                action = message_to_action(next_message)
+                env_response = env.step(action)
+                reward = env_response.reward
+                info = {**info, **env_response.info.model_dump()}
+                if action.name != RESPOND_ACTION_NAME:
+                    next_message["tool_calls"] = next_message["tool_calls"][:1]
+                    messages.extend(
+                        [
+                            next_message,
+                            {
+                                "role": "tool",
+                                "tool_call_id": next_message["tool_calls"][0]["id"],
+                                "name": next_message["tool_calls"][0]["function"]["name"],
+                                "content": env_response.observation,
+                            },
+                        ]
+                    )
+                else:
+                    messages.extend(
+                        [
+                            next_message,
+                            {"role": "user", "content": env_response.observation},
+                        ]
+                    )
+                if env_response.done:
+                    break
+        if compactor is not None:
+            info["compaction"] = compactor.stats()
         return SolveResult(
             reward=reward,
             info=info,
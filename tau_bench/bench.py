@@ -0,0 +1,420 @@
+# Copyright Sierra
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import tempfile
+import resource
+import functools
+import threading
+import subprocess
+import contextlib
+import urllib.request
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import tau_bench.run as run_module
+from tau_bench.envs.base import Env
+from tau_bench.agents.base import Agent
+from tau_bench.types import (
+    RESPOND_ACTION_FIELD_NAME,
+    RESPOND_ACTION_NAME,
+    Action,
+    EnvRunResult,
+    RunConfig,
+    SolveResult,
+)
+
+# where the exclusive time of an episode goes; the rest is agent and harness code
+CATEGORIES = ["env_setup", "env_reset", "env_step", "reward", "llm_wait", "serialization", "checkpoint_io"]
+
+# modules timed by `--imports`; none of them may import litellm, which is only
+# imported once a completion is made
+IMPORT_MODULES = [
+    "tau_bench",
+    "tau_bench.types",
+    "tau_bench.metrics",
+    "tau_bench.store",
+    "tau_bench.work_queue",
+    "tau_bench.run",
+    "tau_bench.envs.retail",
+    "tau_bench.envs.airline",
+    "tau_bench.envs.retail.tasks_train",
+]
+
+
+class OracleAgent(Agent):
+    """Calls the task's ground-truth actions and responds with its outputs, without
+    any LLM calls of its own, so the benchmark measures the harness and env."""
+
+    def solve(
+        self, env: Env, task_index: Optional[int] = None, max_num_steps: int = 30
+    ) -> SolveResult:
+        response = env.reset(task_index=task_index)
+        messages = [{"role": "user", "content": response.observation}]
+        reward = 0.0
+        info: Dict[str, Any] = {}
+        outputs = ", ".join(env.task.outputs)
+        for action in list(env.task.actions) + [
+            Action(name=RESPOND_ACTION_NAME, kwargs={RESPOND_ACTION_FIELD_NAME: f"All done. {outputs} [mock done]"})
+        ]:
+            response = env.step(action)
+            messages.append({"role": "assistant", "content": json.dumps(action.model_dump())})
+            messages.append({"role": "user", "content": response.observation})
+            reward = response.reward
+            info = {**info, **response.info.model_dump()}
+            if response.done:
+                break
+        return SolveResult(reward=reward, messages=messages, info=info, total_cost=0.0)
+
+
+class Timers(object):
+    """Exclusive time per category: time spent in a nested timed call is charged to the
+    inner category only."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.totals: Dict[str, float] = {category: 0.0 for category in CATEGORIES}
+        self._local = threading.local()
+
+    def wrap(self, category: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            stack = getattr(self._local, "stack", None)
+            if stack is None:
+                stack = self._local.stack = []
+            start = time.perf_counter()
+            stack.append(0.0)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                with self.lock:
+                    self.totals[category] += elapsed - nested
+                if len(stack) > 0:
+                    stack[-1] += elapsed
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator[None]:
+        import litellm
+
+        patches: List[Tuple[Any, str, str]] = [
+            (run_module, "get_env", "env_setup"),
+            (Env, "reset", "env_reset"),
+            (Env, "step", "env_step"),
+            (Env, "calculate_reward", "reward"),
+            (litellm, "completion", "llm_wait"),
+            (EnvRunResult, "model_dump", "serialization"),
+            (run_module, "save_checkpoint", "checkpoint_io"),
+        ]
+        originals = []
+        for owner, name, category in patches:
+            # inherited methods are restored by deleting the patched attribute
+            originals.append((owner, name, vars(owner).get(name)))
+            setattr(owner, name, self.wrap(category, getattr(owner, name)))
+        try:
+            yield
+        finally:
+            for owner, name, original in reversed(originals):
+                if original is None:
+                    delattr(owner, name)
+                else:
+                    setattr(owner, name, original)
+
+
+def _subprocess_env() -> Dict[str, str]:
+    # make the package importable in subprocesses even when it is not installed
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pythonpath = os.pathsep.join(p for p in [package_root, os.environ.get("PYTHONPATH")] if p)
+    return {**os.environ, "PYTHONPATH": pythonpath}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mock_llm_server(env: str, latency_mean: float, latency: str) -> Iterator[str]:
+    """Runs `tau_bench.mock_server` in a subprocess, so that its CPU time is not
+    counted against the harness, and points the openai provider at it."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "tau_bench.mock_server",
+            "--env", env,
+            "--port", str(port),
+            "--latency", latency,
+            "--latency-mean", str(latency_mean),
+        ],
+        stdout=subprocess.DEVNULL,
+        env=_subprocess_env(),
+    )
+    url = f"http://127.0.0.1:{port}/v1"
+    previous = {key: os.environ.get(key) for key in ("OPENAI_API_BASE", "OPENAI_API_KEY")}
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                urllib.request.urlopen(f"{url}/stats", timeout=1).read()
+                break
+            except OSError:
+                if time.time() > deadline or process.poll() is not None:
+                    raise RuntimeError("The mock LLM server did not start")
+                time.sleep(0.1)
+        os.environ["OPENAI_API_BASE"] = url
+        os.environ["OPENAI_API_KEY"] = "mock"
+        yield url
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        process.terminate()
+        process.wait()
+
+
+def import_time(module: str, repeat: int = 3) -> Dict[str, Any]:
+    """The best of `repeat` import times of `module` in a fresh interpreter, and
+    whether it imported litellm."""
+    code = (
+        "import sys, time, json; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(json.dumps([time.perf_counter() - start, 'litellm' in sys.modules]))"
+    )
+    seconds = []
+    imports_litellm = False
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=_subprocess_env(),
+        ).stdout
+        elapsed, imports_litellm = json.loads(output.strip().splitlines()[-1])
+        seconds.append(elapsed)
+    return {"module": module, "seconds": min(seconds), "imports_litellm": imports_litellm}
+
+
+def import_benchmark(max_seconds: Optional[float]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Times the imports of `IMPORT_MODULES` and returns them with the regressions: a
+    module that imports litellm or takes longer than `max_seconds`."""
+    results = []
+    regressions = []
+    for module in IMPORT_MODULES:
+        result = import_time(module)
+        results.append(result)
+        print(
+            f"📦 import {module}: {result['seconds'] * 1000:.0f}ms"
+            + (" (imports litellm)" if result["imports_litellm"] else ""),
+            flush=True,
+        )
+        if result["imports_litellm"]:
+            regressions.append(f"{module} imports litellm")
+        if max_seconds is not None and result["seconds"] > max_seconds:
+            regressions.append(f"{module} took {result['seconds']:.2f}s to import (limit {max_seconds:.2f}s)")
+    return results, regressions
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_level(
+    env: str,
+    agent_strategy: str,
+    concurrency: int,
+    num_episodes: int,
+    log_dir: str,
+    cassette_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Runs one workload at one concurrency level and measures it.
+
+    `peak_rss_mb` is the peak RSS of the whole process, so each level should run in a
+    fresh one (see `run_level_in_subprocess`).
+    """
+    config = RunConfig(
+        model_provider="openai",
+        user_model_provider="openai",
+        model="gpt-4o",
+        user_model="gpt-4o",
+        env=env,
+        agent_strategy=agent_strategy if agent_strategy != "oracle" else "tool-calling",
+        max_concurrency=concurrency,
+        log_dir=log_dir,
+        telemetry_interval=0,
+        cassette_path=cassette_path,
+        cassette_mode="replay" if cassette_path is not None else "record",
+    )
+    timers = Timers()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), run_module.run_context(config):
+        probe = run_module.get_env(
+            env, user_strategy=config.user_strategy, user_model=config.user_model,
+            task_split=config.task_split, user_provider=config.user_model_provider,
+        )
+        # the first completion imports the provider client's modules, which takes a second or
+        # so; make it (through the simulated user) before the timed episodes
+        probe.reset(task_index=0)
+        if agent_strategy == "oracle":
+            agent = OracleAgent()
+        else:
+            agent = run_module.agent_factory(tools_info=probe.tools_info, wiki=probe.wiki, config=config)
+        items = [(idx % len(probe.tasks), idx // len(probe.tasks)) for idx in range(num_episodes)]
+        ckpt_path = run_module.get_ckpt_path(config, time_str=f"bench-{env}-{agent_strategy}-{concurrency}")
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        with timers.installed():
+            results = run_module._run_items(
+                config=config,
+                agent=agent,
+                items=items,
+                order=list(range(len(items))),
+                ckpt_path=ckpt_path,
+                expected=None,
+                unit="s",
+            )
+        wall = time.perf_counter() - start
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    episode_seconds = sum(r.duration or 0.0 for r in results)
+    breakdown = dict(timers.totals)
+    breakdown["other"] = max(0.0, episode_seconds - sum(breakdown.values()))
+    return {
+        "env": env,
+        "agent": agent_strategy,
+        "llm": "replay" if cassette_path is not None else "mock",
+        "concurrency": concurrency,
+        "num_episodes": len(results),
+        "num_errors": sum(1 for r in results if r.outcome != "completed"),
+        "avg_reward": sum(r.reward for r in results) / len(results) if results else None,
+        "wall_seconds": wall,
+        "episodes_per_second": len(results) / wall if wall > 0 else None,
+        "cpu_seconds_per_episode": cpu / len(results) if results else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "checkpoint_io_seconds": breakdown["checkpoint_io"],
+        "breakdown_seconds_per_episode": {
+            category: seconds / len(results) if results else None
+            for category, seconds in breakdown.items()
+        },
+    }
+
+
+def run_level_in_subprocess(**kwargs: Any) -> Dict[str, Any]:
+    """`run_level` in a fresh interpreter, so that its peak RSS is not that of the levels
+    run before it."""
+    code = (
+        "import sys, json; from tau_bench.bench import run_level; "
+        "print(json.dumps(run_level(**json.loads(sys.argv[1]))))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code, json.dumps(kwargs)],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+        env=_subprocess_env(),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end harness throughput benchmark")
+    parser.add_argument("--envs", type=str, nargs="+", default=["airline", "retail"], choices=["airline", "retail"])
+    parser.add_argument(
+        "--agent",
+        type=str,
+        default="oracle",
+        choices=["oracle", "tool-calling", "act", "react"],
+        help="The oracle calls the ground-truth actions directly; the others run the real agents against the scripted mock LLM",
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--num-episodes", type=int, default=50, help="Episodes per env and concurrency level")
+    parser.add_argument("--latency", type=str, default="fixed", choices=["fixed", "exponential", "lognormal"])
+    parser.add_argument("--latency-mean", type=float, default=0.0, help="Mean mock LLM latency in seconds")
+    parser.add_argument(
+        "--cassette",
+        type=str,
+        help="Replay the LLM from this cassette instead of the mock server (the workload must match the recording)",
+    )
+    parser.add_argument(
+        "--imports",
+        action="store_true",
+        help="Only time the imports of the package modules in fresh interpreters, and fail if any regressed",
+    )
+    parser.add_argument(
+        "--max-import-seconds",
+        type=float,
+        help="With --imports, the import time above which a module counts as a regression",
+    )
+    parser.add_argument("--output", type=str, default="bench.json")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+        "results": [],
+    }
+    try:
+        from importlib.metadata import version
+
+        report["tau_bench_version"] = version("tau_bench")
+    except Exception:
+        report["tau_bench_version"] = None
+    if args.imports:
+        report["imports"], regressions = import_benchmark(args.max_import_seconds)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Import times saved to {args.output}")
+        if len(regressions) > 0:
+            print("❌ Import time regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        return
+    with tempfile.TemporaryDirectory() as log_dir:
+        for env in args.envs:
+            server = (
+                mock_llm_server(env, args.latency_mean, args.latency)
+                if args.cassette is None
+                else contextlib.nullcontext()
+            )
+            with server:
+                for concurrency in args.concurrency:
+                    result = run_level_in_subprocess(
+                        env=env,
+                        agent_strategy=args.agent,
+                        concurrency=concurrency,
+                        num_episodes=args.num_episodes,
+                        log_dir=log_dir,
+                        cassette_path=args.cassette,
+                    )
+                    report["results"].append(result)
+                    breakdown = " ".join(
+                        f"{category}={seconds * 1000:.0f}ms"
+                        for category, seconds in result["breakdown_seconds_per_episode"].items()
+                    )
+                    print(
+                        f"🏁 {env} {args.agent} x{concurrency}: {result['episodes_per_second']:.2f} eps/s, "
+                        f"{result['cpu_seconds_per_episode'] * 1000:.0f}ms CPU/episode, "
+                        f"peak RSS {result['peak_rss_mb']:.0f} MB, avg reward {result['avg_reward']:.2f} | {breakdown}",
+                        flush=True,
+                    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Benchmark results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
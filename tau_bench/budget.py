@@ -0,0 +1,100 @@
+# Copyright Sierra
+
+import threading
+from typing import Dict, Optional
+
+from tau_bench.episode import EpisodeAborted
+from tau_bench.types import EpisodeOutcome
+
+
+class CostBudget(object):
+    """A spending cap for a whole run, shared by every worker thread.
+
+    New episodes are only admitted while the spend so far plus the expected cost of the
+    episodes in flight (and the new one) fits in the budget; otherwise they wait for
+    running episodes to finish and are skipped if it still does not fit. The expected
+    cost is the average of finished episodes, or the per-episode cap before any have
+    finished. Without a per-episode cap, nothing is known about the cost until an
+    episode finishes, so only one episode is admitted until then. Once the budget is
+    spent, the next LLM call of every running episode raises `EpisodeAborted`. Calls
+    already in flight may overshoot the cap by their own cost.
+    """
+
+    def __init__(
+        self, max_cost: Optional[float], max_cost_per_episode: Optional[float] = None
+    ) -> None:
+        self.max_cost = max_cost
+        self.max_cost_per_episode = max_cost_per_episode
+        self.spent = 0.0
+        self.num_in_flight = 0
+        self.num_finished = 0
+        self.finished_cost = 0.0
+        self.num_skipped = 0
+        self.lock = threading.Lock()
+        self._finished = threading.Condition(self.lock)
+
+    def expected_episode_cost(self) -> Optional[float]:
+        """The expected cost of an episode, or None before there is anything to go by."""
+        if self.num_finished > 0:
+            return self.finished_cost / self.num_finished
+        return self.max_cost_per_episode
+
+    def _fits(self) -> bool:
+        expected = self.expected_episode_cost()
+        if expected is None:
+            return self.spent < self.max_cost and self.num_in_flight == 0
+        projected = self.spent + (self.num_in_flight + 1) * expected
+        return self.spent < self.max_cost and projected <= self.max_cost
+
+    def try_start(self) -> bool:
+        with self.lock:
+            if self.max_cost is not None:
+                self._finished.wait_for(lambda: self._fits() or self.num_in_flight == 0)
+                if not self._fits():
+                    self.num_skipped += 1
+                    return False
+            self.num_in_flight += 1
+            return True
+
+    def finish(self, episode_cost: float) -> None:
+        with self.lock:
+            self.num_in_flight -= 1
+            self.num_finished += 1
+            self.finished_cost += episode_cost
+            self._finished.notify_all()
+
+    def add_cost(self, cost: float) -> None:
+        with self.lock:
+            self.spent += cost
+
+    def check(self) -> None:
+        with self.lock:
+            if self.max_cost is not None and self.spent >= self.max_cost:
+                raise EpisodeAborted(
+                    EpisodeOutcome.BUDGET_EXHAUSTED,
+                    f"Run cost ${self.spent:.4f} reached the limit of ${self.max_cost:.4f}",
+                )
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "max_cost": self.max_cost,
+                "spent": self.spent,
+                "num_finished": self.num_finished,
+                "num_skipped": self.num_skipped,
+            }
+
+
+COST_BUDGET: Optional[CostBudget] = None
+_COST_BUDGET_LOCK = threading.Lock()
+
+
+def set_cost_budget(budget: Optional[CostBudget]) -> None:
+    with _COST_BUDGET_LOCK:
+        global COST_BUDGET
+        COST_BUDGET = budget
+
+
+def get_cost_budget() -> Optional[CostBudget]:
+    with _COST_BUDGET_LOCK:
+        return COST_BUDGET
@@ -0,0 +1,146 @@
+# Copyright Sierra
+
+import os
+import json
+import hashlib
+import threading
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from tau_bench.episode import get_episode_context
+
+# request arguments that do not change what the model is asked
+IGNORED_KWARGS = {"timeout", "api_key", "api_base", "num_retries", "metadata"}
+
+
+class CassetteMode(Enum):
+    RECORD = "record"
+    REPLAY = "replay"
+    REPLAY_OR_RECORD = "replay-or-record"
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def _strip_nones(value: Any) -> Any:
+    # responses round-tripped through JSON gain `None` fields (e.g.
+    # `provider_specific_fields`) that must not change the fingerprint of later requests
+    if isinstance(value, dict):
+        return {k: _strip_nones(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_strip_nones(v) for v in value]
+    return value
+
+
+def fingerprint(kwargs: Dict[str, Any]) -> str:
+    request = {k: v for k, v in kwargs.items() if k not in IGNORED_KWARGS}
+    canonical = json.dumps(_strip_nones(request), sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class Cassette(object):
+    """An on-disk record of LLM requests and their responses (one JSON line each).
+
+    A request is keyed by its episode (task and trial), its fingerprint (a hash of the
+    completion arguments) and how many identical requests the episode made before it,
+    so that concurrent episodes replay deterministically. In record mode every
+    response is appended; in replay mode responses are served from the cassette and
+    a miss raises `CassetteMiss` (or, in replay-or-record mode, calls the provider and
+    records the response).
+    """
+
+    def __init__(self, path: str, mode: CassetteMode) -> None:
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_recorded = 0
+        self._counts: Dict[Tuple[str, str], int] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[record["key"]] = record
+        elif mode == CassetteMode.REPLAY:
+            raise FileNotFoundError(f"Cassette {path} does not exist")
+
+    def key(self, role: str, kwargs: Dict[str, Any]) -> str:
+        request_fingerprint = fingerprint(kwargs)
+        episode = get_episode_context()
+        scope = f"{episode.task_id}/{episode.trial}" if episode is not None else "-"
+        with self.lock:
+            if episode is not None:
+                counts = episode.call_counts
+                index = counts.get(request_fingerprint, 0)
+                counts[request_fingerprint] = index + 1
+            else:
+                index = self._counts.get((scope, request_fingerprint), 0)
+                self._counts[(scope, request_fingerprint)] = index + 1
+        return f"{scope}/{role}/{request_fingerprint}/{index}"
+
+    def lookup(self, key: str) -> Optional[Any]:
+        with self.lock:
+            record = self.records.get(key)
+            if record is None:
+                self.num_misses += 1
+            else:
+                self.num_hits += 1
+        if record is None:
+            if self.mode == CassetteMode.REPLAY:
+                raise CassetteMiss(f"No recorded response for request {key} in {self.path}")
+            return None
+        return response_from_record(record)
+
+    def record(self, key: str, role: str, model: str, res: Any, cost: float) -> Any:
+        """Appends the response and returns it as it will be replayed."""
+        record = {
+            "key": key,
+            "role": role,
+            "model": model,
+            "response": res.model_dump(),
+            "cost": cost,
+        }
+        line = json.dumps(record, default=str)
+        with self.lock:
+            self.records[key] = record
+            self.num_recorded += 1
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+        return response_from_record(record)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "mode": self.mode.value,
+                "num_records": len(self.records),
+                "num_hits": self.num_hits,
+                "num_misses": self.num_misses,
+                "num_recorded": self.num_recorded,
+            }
+
+
+def response_from_record(record: Dict[str, Any]) -> Any:
+    import litellm
+
+    res = litellm.ModelResponse(**record["response"])
+    res._hidden_params = {"response_cost": record["cost"], "cassette": True}
+    return res
+
+
+CASSETTE: Optional[Cassette] = None
+_CASSETTE_LOCK = threading.Lock()
+
+
+def set_cassette(cassette: Optional[Cassette]) -> None:
+    with _CASSETTE_LOCK:
+        global CASSETTE
+        CASSETTE = cassette
+
+
+def get_cassette() -> Optional[Cassette]:
+    with _CASSETTE_LOCK:
+        return CASSETTE
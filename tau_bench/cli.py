@@ -0,0 +1,26 @@
+# Copyright Sierra
+
+import sys
+import importlib
+
+# subcommand -> module whose `main()` implements it
+COMMANDS = {
+    "bench": "tau_bench.bench",
+    "metrics": "tau_bench.metrics",
+    "store": "tau_bench.store",
+    "queue": "tau_bench.work_queue",
+    "mock-server": "tau_bench.mock_server",
+}
+
+
+def main() -> None:
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"usage: tau-bench {{{','.join(COMMANDS)}}} ...", file=sys.stderr)
+        sys.exit(0 if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help") else 2)
+    command = sys.argv[1]
+    sys.argv = [f"tau-bench {command}"] + sys.argv[2:]
+    importlib.import_module(COMMANDS[command]).main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Copyright Sierra
+
+import json
+from typing import Any, Dict, List, Optional, Set
+
+# prefix of tool observations in the ReAct agents' conversations
+REACT_OBSERVATION_PREFIX = "API output: "
+# the most recent observations are always sent in full
+KEEP_RECENT = 2
+MAX_IDS = 50
+
+
+def _text(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    text = content if isinstance(content, str) else json.dumps(content) if content else ""
+    if message.get("tool_calls"):
+        text += json.dumps(message["tool_calls"])
+    return text
+
+
+def _tool_output(message: Dict[str, Any]) -> Optional[str]:
+    content = message.get("content")
+    if not isinstance(content, str):
+        return None
+    if message["role"] == "tool":
+        return content
+    if message["role"] == "user" and content.startswith(REACT_OBSERVATION_PREFIX):
+        return content[len(REACT_OBSERVATION_PREFIX):]
+    return None
+
+
+def extract_ids(output: str) -> List[str]:
+    """Identifiers mentioned in a JSON tool output: values of `*id` keys, and keys and
+    values that look like ids (such as order, item, reservation and payment method ids)."""
+    try:
+        data = json.loads(output)
+    except json.JSONDecodeError:
+        return []
+    ids: List[str] = []
+
+    def _is_id(value: Any) -> bool:
+        return (
+            isinstance(value, str)
+            and len(value) <= 64
+            and " " not in value
+            and sum(c.isdigit() for c in value) >= 3
+        )
+
+    def _walk(value: Any, key: Optional[str]) -> None:
+        if isinstance(value, dict):
+            for k, v in value.items():
+                if _is_id(k):
+                    ids.append(k)
+                _walk(v, k)
+        elif isinstance(value, list):
+            for item in value:
+                if _is_id(item):
+                    ids.append(item)
+                else:
+                    _walk(item, key)
+        elif _is_id(value) or (
+            key is not None and key.lower().endswith("id") and isinstance(value, (str, int))
+        ):
+            ids.append(str(value))
+
+    _walk(data, None)
+    return list(dict.fromkeys(ids))[:MAX_IDS]
+
+
+class ContextCompactor(object):
+    """Keeps the conversation an agent sends under a token budget by eliding stale tool
+    outputs, oldest first, down to a stub that keeps the ids they mention.
+
+    One compactor is used per episode. Elided outputs stay elided, so the prefix of the
+    conversation does not change from one step to the next (which keeps it cacheable).
+    """
+
+    def __init__(self, max_tokens: int, model: str, provider: Optional[str] = None) -> None:
+        self.max_tokens = max_tokens
+        self.model = model
+        self.provider = provider
+        self.elided: Set[int] = set()
+        self.dropped: List[Dict[str, Any]] = []
+        self.steps: List[Dict[str, int]] = []
+        self._tokens: List[int] = []
+        self._stubs: Dict[int, Dict[str, Any]] = {}
+
+    def _count(self, text: str) -> int:
+        from litellm import token_counter
+
+        return token_counter(model=self.model, text=text)
+
+    def compact(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the messages to send for this step; `messages` is not modified."""
+        # earlier messages never change, so their token counts are computed once
+        for message in messages[len(self._tokens):]:
+            self._tokens.append(self._count(_text(message)))
+        full_tokens = sum(self._tokens[: len(messages)])
+        tokens = full_tokens - sum(
+            self._tokens[idx] - self._stubs[idx]["tokens"] for idx in self.elided
+        )
+        outputs = [idx for idx, message in enumerate(messages) if _tool_output(message) is not None]
+        for idx in outputs[: max(0, len(outputs) - KEEP_RECENT)]:
+            if tokens <= self.max_tokens:
+                break
+            if idx in self.elided:
+                continue
+            stub = self._stub(messages[idx])
+            if stub["tokens"] >= self._tokens[idx]:
+                continue
+            self.elided.add(idx)
+            self._stubs[idx] = stub
+            self.dropped.append(
+                {"index": idx, "tool": stub["tool"], "tokens": self._tokens[idx], "ids": stub["ids"]}
+            )
+            tokens -= self._tokens[idx] - stub["tokens"]
+        self.steps.append({"tokens": tokens, "full_tokens": full_tokens})
+        if len(self.elided) == 0:
+            return messages
+        return [
+            self._stubs[idx]["message"] if idx in self.elided else message
+            for idx, message in enumerate(messages)
+        ]
+
+    def _stub(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        output = _tool_output(message)
+        assert output is not None
+        name = message.get("name") or "tool"
+        ids = extract_ids(output)
+        summary = f"[elided {name} output of {len(output)} characters to save context"
+        summary += f"; ids: {', '.join(ids)}]" if len(ids) > 0 else "]"
+        if message["role"] != "tool":
+            summary = REACT_OBSERVATION_PREFIX + summary
+        stub_message = {**message, "content": summary}
+        return {
+            "message": stub_message,
+            "tokens": self._count(_text(stub_message)),
+            "tool": name,
+            "ids": ids,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """What was elided, and the conversation tokens sent at each step with and
+        without compaction."""
+        saved_tokens = sum(step["full_tokens"] - step["tokens"] for step in self.steps)
+        from litellm import cost_per_token
+
+        try:
+            saved_cost, _ = cost_per_token(
+                model=self.model, custom_llm_provider=self.provider, prompt_tokens=saved_tokens
+            )
+        except Exception:
+            saved_cost = None
+        return {
+            "max_tokens": self.max_tokens,
+            "dropped": self.dropped,
+            "steps": self.steps,
+            "saved_tokens": saved_tokens,
+            "saved_cost": saved_cost,
+        }
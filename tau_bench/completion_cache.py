@@ -0,0 +1,158 @@
+# Copyright Sierra
+
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used);
+-- running total of the response sizes, so that writes need not sum the whole table
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) SELECT 'total_size', COALESCE(SUM(size), 0) FROM completions;
+CREATE TRIGGER IF NOT EXISTS completions_insert AFTER INSERT ON completions BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE key = 'total_size';
+END;
+CREATE TRIGGER IF NOT EXISTS completions_update AFTER UPDATE OF size ON completions BEGIN
+    UPDATE meta SET value = value + NEW.size - OLD.size WHERE key = 'total_size';
+END;
+CREATE TRIGGER IF NOT EXISTS completions_delete AFTER DELETE ON completions BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE key = 'total_size';
+END;
+"""
+
+
+class CompletionCache(object):
+    """A persistent cache of deterministic (temperature 0) agent completions, keyed by
+    the fingerprint of the request, in a SQLite file.
+
+    Any number of threads and processes can share the file. When it grows past
+    `max_mb`, the least recently used responses are evicted.
+    """
+
+    def __init__(self, path: str, max_mb: float = 1024.0) -> None:
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_stored = 0
+        self.num_evicted = 0
+        self._local = threading.local()
+        # in one transaction, so that the total is counted once, under the triggers
+        self._connection().executescript(f"BEGIN IMMEDIATE;{SCHEMA}COMMIT;")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections cannot be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        import litellm
+
+        conn = self._connection()
+        row = conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+        with self.lock:
+            if row is None:
+                self.num_misses += 1
+            else:
+                self.num_hits += 1
+        if row is None:
+            return None
+        conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+        res = litellm.ModelResponse(**json.loads(row[0]))
+        # a cached response costs nothing
+        res._hidden_params = {"response_cost": 0.0, "completion_cache": True}
+        return res
+
+    def put(self, key: str, model: str, res: Any) -> None:
+        response = json.dumps(res.model_dump(), default=str)
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # an upsert rather than INSERT OR REPLACE, whose implicit delete would not
+            # fire the delete trigger that keeps the total size
+            conn.execute(
+                """INSERT INTO completions (key, model, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    model = excluded.model,
+                    response = excluded.response,
+                    size = excluded.size,
+                    created = excluded.created,
+                    last_used = excluded.last_used""",
+                (key, model, response, len(response), now, now),
+            )
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self.lock:
+            self.num_stored += 1
+            self.num_evicted += evicted
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        excess = self._total_size(conn) - self.max_bytes
+        if excess <= 0:
+            return 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_used"):
+            keys.append(key)
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM completions WHERE key = ?", [(key,) for key in keys])
+        return len(keys)
+
+    def _total_size(self, conn: sqlite3.Connection) -> int:
+        (total,) = conn.execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        (num_entries,) = conn.execute("SELECT COUNT(*) FROM completions").fetchone()
+        size = self._total_size(conn)
+        with self.lock:
+            return {
+                "num_hits": self.num_hits,
+                "num_misses": self.num_misses,
+                "num_stored": self.num_stored,
+                "num_evicted": self.num_evicted,
+                "num_entries": num_entries,
+                "size_mb": round(size / (1024 * 1024), 2),
+            }
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+COMPLETION_CACHE: Optional[CompletionCache] = None
+_COMPLETION_CACHE_LOCK = threading.Lock()
+
+
+def set_completion_cache(cache: Optional[CompletionCache]) -> None:
+    with _COMPLETION_CACHE_LOCK:
+        global COMPLETION_CACHE
+        COMPLETION_CACHE = cache
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    with _COMPLETION_CACHE_LOCK:
+        return COMPLETION_CACHE
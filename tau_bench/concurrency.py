@@ -0,0 +1,249 @@
+# Copyright Sierra
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+class AIMDController(object):
+    """Additive-increase/multiplicative-decrease limit on in-flight work.
+
+    The same window bounds both running episodes and in-flight LLM calls. Every
+    successful call grows the window by about one slot per window's worth of calls;
+    a rate-limit or timeout error halves it, at most once per `cooldown_seconds` so
+    that a burst of 429s from one overload only counts once.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial_limit: Optional[int] = None,
+        min_limit: int = 1,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        cooldown_seconds: float = 5.0,
+    ) -> None:
+        if max_limit < min_limit:
+            raise ValueError(f"max_limit ({max_limit}) must be at least min_limit ({min_limit})")
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self.limit = float(
+            max(min_limit, min(max_limit, initial_limit if initial_limit is not None else max_limit))
+        )
+        self.in_flight_episodes = 0
+        self.in_flight_calls = 0
+        self.num_successes = 0
+        self.num_throttles = 0
+        self.num_decreases = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def window(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @contextmanager
+    def episode(self) -> Iterator[None]:
+        with self._condition:
+            self._condition.wait_for(lambda: self.in_flight_episodes < self.window())
+            self.in_flight_episodes += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight_episodes -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        with self._condition:
+            self._condition.wait_for(lambda: self.in_flight_calls < self.window())
+            self.in_flight_calls += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight_calls -= 1
+                self._condition.notify_all()
+
+    def record_success(self) -> None:
+        with self._condition:
+            self.num_successes += 1
+            self.limit = min(float(self.max_limit), self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+    def record_throttle(self) -> None:
+        with self._condition:
+            self.num_throttles += 1
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown_seconds:
+                return
+            self._last_decrease = now
+            self.num_decreases += 1
+            self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "in_flight_episodes": self.in_flight_episodes,
+                "in_flight_calls": self.in_flight_calls,
+                "num_successes": self.num_successes,
+                "num_throttles": self.num_throttles,
+                "num_decreases": self.num_decreases,
+            }
+
+
+# call pool keys that name a role rather than an endpoint
+ROLES = ("agent", "user")
+
+
+def parse_call_limit(spec: str) -> Dict[str, int]:
+    """Parses `<role or endpoint>=<max in-flight calls>`, where the key is a role (`agent`
+    or `user`) or an endpoint (`<provider>` or `<provider>/<model>`), e.g. `user=8` or
+    `hosted_vllm=64`."""
+    key, sep, limit = spec.partition("=")
+    if sep == "" or key == "" or not limit.isdigit() or int(limit) < 1:
+        raise ValueError(f"Invalid call limit {spec!r}, expected <role or endpoint>=<max in-flight calls>")
+    return {key: int(limit)}
+
+
+class CallPool(object):
+    def __init__(self, key: str, limit: int) -> None:
+        self.key = key
+        self.limit = limit
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.num_calls = 0
+        self.num_queued = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """Waits for a free slot and returns the seconds spent waiting."""
+        start = time.monotonic()
+        with self._condition:
+            queued = self.in_flight >= self.limit
+            self._condition.wait_for(lambda: self.in_flight < self.limit)
+            wait_seconds = time.monotonic() - start
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.num_calls += 1
+            self.num_queued += int(queued)
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        return wait_seconds
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "max_in_flight": self.max_in_flight,
+                "num_calls": self.num_calls,
+                "num_queued": self.num_queued,
+                "total_wait_seconds": self.total_wait_seconds,
+                "avg_wait_seconds": self.total_wait_seconds / self.num_calls if self.num_calls > 0 else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+class CallPools(object):
+    """In-flight limits on LLM calls, separately per role (agent or user simulator) and
+    per endpoint, so that e.g. a local agent server can be saturated without
+    overrunning the quota of the user model.
+
+    A call takes a slot in its role's pool and one in its endpoint's pool (keyed by
+    `<provider>/<model>`, with a fallback to `<provider>`, like the rate limits), when
+    these are configured. Slots are always taken in that order, so calls waiting on
+    two pools cannot deadlock.
+    """
+
+    def __init__(self, limits: Dict[str, int]) -> None:
+        self.pools = {key: CallPool(key, limit) for key, limit in limits.items()}
+
+    def _pools(self, role: str, provider: Optional[str], model: str) -> List[CallPool]:
+        pools = []
+        if role in self.pools:
+            pools.append(self.pools[role])
+        for key in (f"{provider}/{model}", model, provider):
+            if key is not None and key not in ROLES and key in self.pools:
+                pools.append(self.pools[key])
+                break
+        return pools
+
+    @contextmanager
+    def slot(self, role: str, provider: Optional[str], model: str) -> Iterator[float]:
+        """Holds a slot in every pool of the call; yields the seconds spent waiting."""
+        acquired: List[CallPool] = []
+        wait_seconds = 0.0
+        try:
+            for pool in self._pools(role, provider, model):
+                wait_seconds += pool.acquire()
+                acquired.append(pool)
+            yield wait_seconds
+        finally:
+            for pool in reversed(acquired):
+                pool.release()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {key: pool.stats() for key, pool in self.pools.items()}
+
+
+CALL_POOLS: Optional[CallPools] = None
+_CALL_POOLS_LOCK = threading.Lock()
+
+
+def set_call_pools(pools: Optional[CallPools]) -> None:
+    with _CALL_POOLS_LOCK:
+        global CALL_POOLS
+        CALL_POOLS = pools
+
+
+def get_call_pools() -> Optional[CallPools]:
+    with _CALL_POOLS_LOCK:
+        return CALL_POOLS
+
+
+CONCURRENCY_CONTROLLER: Optional[AIMDController] = None
+_CONCURRENCY_CONTROLLER_LOCK = threading.Lock()
+
+
+def set_concurrency_controller(controller: Optional[AIMDController]) -> None:
+    with _CONCURRENCY_CONTROLLER_LOCK:
+        global CONCURRENCY_CONTROLLER
+        CONCURRENCY_CONTROLLER = controller
+
+
+# a controller that overrides the process-wide one for the work started in a context
+_SCOPED_CONTROLLER: contextvars.ContextVar[Optional[AIMDController]] = contextvars.ContextVar(
+    "scoped_concurrency_controller", default=None
+)
+
+
+@contextmanager
+def concurrency_controller_scope(controller: AIMDController) -> Iterator[AIMDController]:
+    """Makes `controller` the concurrency controller of the episodes and calls started in
+    this context (and contexts copied from it), e.g. one controller per provider."""
+    token = _SCOPED_CONTROLLER.set(controller)
+    try:
+        yield controller
+    finally:
+        _SCOPED_CONTROLLER.reset(token)
+
+
+def get_concurrency_controller() -> Optional[AIMDController]:
+    scoped = _SCOPED_CONTROLLER.get()
+    if scoped is not None:
+        return scoped
+    with _CONCURRENCY_CONTROLLER_LOCK:
+        return CONCURRENCY_CONTROLLER
@@ -0,0 +1,49 @@
+# Copyright Sierra
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence
+
+from tau_bench.envs.base import Env
+
+
+class EnvPool(object):
+    """Envs that are reused across the episodes of a run instead of being built for
+    each one.
+
+    An episode takes an idle env (or a new one from `factory` if there is none) and
+    gives it back when it ends, so a run builds about as many envs as it runs episodes
+    at once. Reusing an env is safe because `Env.reset` reloads its data, resets its
+    user and clears its actions for the new task.
+    """
+
+    def __init__(self, factory: Callable[[], Env], envs: Sequence[Env] = ()) -> None:
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.idle: List[Env] = list(envs)
+        self.num_created = len(self.idle)
+        self.num_acquired = 0
+
+    @contextmanager
+    def env(self) -> Iterator[Env]:
+        with self.lock:
+            env = self.idle.pop() if len(self.idle) > 0 else None
+            self.num_acquired += 1
+        if env is None:
+            env = self.factory()
+            with self.lock:
+                self.num_created += 1
+        try:
+            yield env
+        finally:
+            # an env abandoned by a timed out episode comes back once its thread is done
+            with self.lock:
+                self.idle.append(env)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "num_created": self.num_created,
+                "num_acquired": self.num_acquired,
+                "num_idle": len(self.idle),
+            }
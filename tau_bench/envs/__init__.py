@@ -1,8 +1,31 @@
 # Copyright Sierra
 
-from typing import Optional, Union
+from typing import List, Optional, Union
 from tau_bench.envs.base import Env
 from tau_bench.envs.user import UserStrategy
+from tau_bench.types import Task
+
+
+def get_tasks(env_name: str, task_split: str) -> List[Task]:
+    if env_name == "retail":
+        match task_split:
+            case "test":
+                from tau_bench.envs.retail.tasks_test import TASKS_TEST as tasks
+            case "train":
+                from tau_bench.envs.retail.tasks_train import TASKS_TRAIN as tasks
+            case "dev":
+                from tau_bench.envs.retail.tasks_dev import TASKS_DEV as tasks
+            case _:
+                raise ValueError(f"Unknown task split: {task_split}")
+    elif env_name == "airline":
+        match task_split:
+            case "test":
+                from tau_bench.envs.airline.tasks_test import TASKS as tasks
+            case _:
+                raise ValueError(f"Unknown task split: {task_split}")
+    else:
+        raise ValueError(f"Unknown environment: {env_name}")
+    return tasks
 
 
 def get_env(
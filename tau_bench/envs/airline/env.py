@@ -4,6 +4,7 @@ from tau_bench.envs.airline.data import load_data
 from tau_bench.envs.airline.rules import RULES
 from tau_bench.envs.airline.tools import ALL_TOOLS
 from tau_bench.envs.airline.wiki import WIKI
+from tau_bench.envs import get_tasks
 from tau_bench.envs.base import Env
 from typing import Optional, Union
 from tau_bench.envs.user import UserStrategy
@@ -18,11 +19,7 @@ class MockAirlineDomainEnv(Env):
         task_split: str = "test",
         task_index: Optional[int] = None,
     ):
-        match task_split:
-            case "test":
-                from tau_bench.envs.airline.tasks_test import TASKS as tasks
-            case _:
-                raise ValueError(f"Unknown task split: {task_split}")
+        tasks = get_tasks("airline", task_split)
         super().__init__(
             data_load_func=load_data,
             tools=ALL_TOOLS,
@@ -3,6 +3,7 @@
 import random
 from hashlib import sha256
 from tau_bench.envs.tool import Tool
+from tau_bench.tracing import span
 from typing import Any, Callable, Dict, List, Type, Optional, Set, Union, Tuple
 
 from tau_bench.envs.user import load_user, UserStrategy
@@ -82,28 +83,38 @@ class Env(object):
         self.data = self.data_load_func()
         self.task = self.tasks[task_index]
         self.actions = []
-        initial_observation = self.user.reset(instruction=self.task.instruction)
+        with span("user.reset", "user", user=type(self.user).__name__):
+            initial_observation = self.user.reset(instruction=self.task.instruction)
         return EnvResetResponse(
             observation=initial_observation, info=EnvInfo(task=self.task, source="user")
         )
 
     def step(self, action: Action) -> EnvResponse:
+        with span("env.step", "env", action=action.name) as step_span:
+            response = self._step(action)
+            step_span.set(observation_chars=len(response.observation), done=response.done)
+            return response
+
+    def _step(self, action: Action) -> EnvResponse:
         self.actions.append(action)
 
         info = EnvInfo(task=self.task)
         reward = 0
         done = False
         if action.name == RESPOND_ACTION_NAME:
-            observation = self.user.step(action.kwargs["content"])
+            with span("user.step", "user", user=type(self.user).__name__):
+                observation = self.user.step(action.kwargs["content"])
             info.source = "user"
             done = "###STOP###" in observation
         elif action.name in self.tools_map:
-            try:
-                observation = self.tools_map[action.name].invoke(
-                    data=self.data, **action.kwargs
-                )
-            except Exception as e:
-                observation = f"Error: {e}"
+            with span("tool", "tool", tool=action.name) as tool_span:
+                try:
+                    observation = self.tools_map[action.name].invoke(
+                        data=self.data, **action.kwargs
+                    )
+                except Exception as e:
+                    observation = f"Error: {e}"
+                    tool_span.set(error=str(e))
             info.source = action.name
             if action.name in self.terminate_tools:
                 done = True
@@ -122,6 +133,12 @@ class Env(object):
         return consistent_hash(to_hashable(self.data))
 
     def calculate_reward(self) -> RewardResult:
+        with span("reward", "env") as reward_span:
+            result = self._calculate_reward()
+            reward_span.set(reward=result.reward)
+            return result
+
+    def _calculate_reward(self) -> RewardResult:
         data_hash = self.get_data_hash()
         reward = 1.0
         actions = [
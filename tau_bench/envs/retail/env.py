@@ -1,5 +1,6 @@
 # Copyright Sierra
 
+from tau_bench.envs import get_tasks
 from tau_bench.envs.base import Env
 from tau_bench.envs.retail.data import load_data
 from tau_bench.envs.retail.rules import RULES
@@ -18,15 +19,7 @@ class MockRetailDomainEnv(Env):
         task_split: str = "test",
         task_index: Optional[int] = None,
     ):
-        match task_split:
-            case "test":
-                from tau_bench.envs.retail.tasks_test import TASKS_TEST as tasks
-            case "train":
-                from tau_bench.envs.retail.tasks_train import TASKS_TRAIN as tasks
-            case "dev":
-                from tau_bench.envs.retail.tasks_dev import TASKS_DEV as tasks
-            case _:
-                raise ValueError(f"Unknown task split: {task_split}")
+        tasks = get_tasks("retail", task_split)
         super().__init__(
             data_load_func=load_data,
             tools=ALL_TOOLS,
@@ -2,7 +2,7 @@
 
 import abc
 import enum
-from litellm import completion
+from tau_bench.llm import completion
 
 from typing import Optional, List, Dict, Any, Union
 
@@ -41,15 +41,18 @@ class LLMUserSimulationEnv(BaseUserSimulationEnv):
         self.model = model
         self.provider = provider
         self.total_cost = 0.0
-        self.reset()
+        # the conversation starts when the env is reset with a task's instruction
 
     def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
         res = completion(
-            model=self.model, custom_llm_provider=self.provider, messages=messages
+            model=self.model,
+            custom_llm_provider=self.provider,
+            messages=messages,
+            role="user",
         )
         message = res.choices[0].message
         self.messages.append(message.model_dump())
-        self.total_cost = res._hidden_params["response_cost"]
+        self.total_cost += res._hidden_params["response_cost"] or 0.0
         return message.content
 
     def build_system_prompt(self, instruction: Optional[str]) -> str:
@@ -68,6 +71,7 @@ Rules:
 - Try to make the conversation as natural as possible, and stick to the personalities in the instruction."""
 
     def reset(self, instruction: Optional[str] = None) -> str:
+        self.total_cost = 0.0
         self.messages = [
             {
                 "role": "system",
@@ -86,10 +90,6 @@ Rules:
 
 
 class ReactUserSimulationEnv(LLMUserSimulationEnv):
-    def __init__(self, model: str, provider: str) -> None:
-        super().__init__(model=model, provider=provider)
-        self.reset()
-
     def build_system_prompt(self, instruction: Optional[str]) -> str:
         instruction_display = (
             ("\n\nInstruction: " + instruction + "\n")
@@ -116,14 +116,18 @@ User Response:
 
     def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
         res = completion(
-            model=self.model, custom_llm_provider=self.provider, messages=messages
+            model=self.model,
+            custom_llm_provider=self.provider,
+            messages=messages,
+            role="user",
         )
         message = res.choices[0].message
         self.messages.append(message.model_dump())
-        self.total_cost = res._hidden_params["response_cost"]
+        self.total_cost += res._hidden_params["response_cost"] or 0.0
         return self.parse_response(message.content)
 
     def reset(self, instruction: Optional[str] = None) -> str:
+        self.total_cost = 0.0
         self.messages = [
             {
                 "role": "system",
@@ -155,20 +159,21 @@ User Response:
 
 class VerifyUserSimulationEnv(LLMUserSimulationEnv):
     def __init__(self, model: str, provider: str, max_attempts: int = 3) -> None:
-        self.model = model
-        self.provider = provider
+        super().__init__(model=model, provider=provider)
         self.max_attempts = max_attempts
-        self.reset()
 
     def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
         attempts = 0
         cur_message = None
         while attempts < self.max_attempts:
             res = completion(
-                model=self.model, custom_llm_provider=self.provider, messages=messages
+                model=self.model,
+                custom_llm_provider=self.provider,
+                messages=messages,
+                role="user",
             )
             cur_message = res.choices[0].message
-            self.total_cost = res._hidden_params["response_cost"]
+            self.total_cost += res._hidden_params["response_cost"] or 0.0
             if verify(self.model, self.provider, cur_message, messages):
                 self.messages.append(cur_message.model_dump())
                 return cur_message.content
@@ -177,6 +182,7 @@ class VerifyUserSimulationEnv(LLMUserSimulationEnv):
         return cur_message.content
 
     def reset(self, instruction: Optional[str] = None) -> str:
+        self.total_cost = 0.0
         self.messages = [
             {
                 "role": "system",
@@ -228,6 +234,7 @@ Classification:"""
         model=model,
         custom_llm_provider=provider,
         messages=[{"role": "user", "content": prompt}],
+        role="user",
     )
     return "true" in res.choices[0].message.content.lower()
 
@@ -262,6 +269,7 @@ Response:
         model=model,
         custom_llm_provider=provider,
         messages=[{"role": "user", "content": prompt}],
+        role="user",
     )
     _, response = res.choices[0].message.content.split("Response:")
     return response.strip()
@@ -269,10 +277,8 @@ Response:
 
 class ReflectionUserSimulationEnv(LLMUserSimulationEnv):
     def __init__(self, model: str, provider: str, max_attempts: int = 2) -> None:
-        self.model = model
-        self.provider = provider
+        super().__init__(model=model, provider=provider)
         self.max_attempts = max_attempts
-        self.reset()
 
     def generate_next_message(self, messages: List[Dict[str, Any]]) -> str:
         cur_messages = messages.copy()
@@ -292,6 +298,7 @@ class ReflectionUserSimulationEnv(LLMUserSimulationEnv):
         return initial_response
 
     def reset(self, instruction: Optional[str] = None) -> str:
+        self.total_cost = 0.0
         self.messages = [
             {
                 "role": "system",
@@ -0,0 +1,128 @@
+# Copyright Sierra
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from tau_bench.types import EpisodeOutcome
+
+
+class EpisodeAborted(Exception):
+    """Raised inside an episode (from the next LLM call) when it must stop early."""
+
+    def __init__(self, outcome: EpisodeOutcome, message: str) -> None:
+        super().__init__(message)
+        self.outcome = outcome
+
+
+class EpisodeContext(object):
+    """Per-episode state shared by the runner, the agent and the user simulator.
+
+    The runner opens one around every episode; `tau_bench.llm.completion` charges each
+    call to it and checks it before calling the provider.
+    """
+
+    def __init__(
+        self,
+        task_id: int,
+        trial: int,
+        max_cost: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.task_id = task_id
+        self.trial = trial
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.cancelled: Optional[EpisodeAborted] = None
+        self.cost = 0.0
+        self.cost_by_role: Dict[str, float] = {}
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        # prompt and cached prompt tokens of the agent's and the user simulator's calls
+        self.usage_by_role: Dict[str, Dict[str, int]] = {}
+        self.completion_cache_hits = 0
+        self.completion_cache_misses = 0
+        # timings and tokens of streamed completions
+        self.streamed_calls: List[Dict[str, Any]] = []
+        self.messages: List[Dict[str, Any]] = []
+        # occurrences of each request fingerprint, for cassettes
+        self.call_counts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def add_cost(self, role: str, cost: float) -> None:
+        with self.lock:
+            self.cost += cost
+            self.cost_by_role[role] = self.cost_by_role.get(role, 0.0) + cost
+
+    def add_usage(self, role: str, prompt_tokens: int, cached_prompt_tokens: int) -> None:
+        with self.lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_prompt_tokens += cached_prompt_tokens
+            usage = self.usage_by_role.setdefault(role, {"prompt_tokens": 0, "cached_prompt_tokens": 0})
+            usage["prompt_tokens"] += prompt_tokens
+            usage["cached_prompt_tokens"] += cached_prompt_tokens
+
+    def add_cache_lookup(self, hit: bool) -> None:
+        with self.lock:
+            if hit:
+                self.completion_cache_hits += 1
+            else:
+                self.completion_cache_misses += 1
+
+    def add_streamed_call(self, stats: Dict[str, Any]) -> None:
+        with self.lock:
+            self.streamed_calls.append(stats)
+
+    def track_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """Keeps a reference to the agent's (growing) message list, so that an aborted
+        episode can still be recorded with its partial trajectory."""
+        self.messages = messages
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, error: EpisodeAborted) -> None:
+        """Makes the episode's next `check` raise `error`."""
+        self.cancelled = error
+
+    def check(self) -> None:
+        if self.cancelled is not None:
+            raise self.cancelled
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise EpisodeAborted(
+                EpisodeOutcome.TIMEOUT, f"Episode timed out after {self.timeout}s"
+            )
+        if self.max_cost is not None and self.cost >= self.max_cost:
+            raise EpisodeAborted(
+                EpisodeOutcome.OVER_BUDGET,
+                f"Episode cost ${self.cost:.4f} reached the per-episode limit of ${self.max_cost:.4f}",
+            )
+
+
+_CURRENT_EPISODE: contextvars.ContextVar[Optional[EpisodeContext]] = contextvars.ContextVar(
+    "current_episode", default=None
+)
+
+
+@contextmanager
+def episode_context(context: EpisodeContext) -> Iterator[EpisodeContext]:
+    token = _CURRENT_EPISODE.set(context)
+    try:
+        yield context
+    finally:
+        _CURRENT_EPISODE.reset(token)
+
+
+def get_episode_context() -> Optional[EpisodeContext]:
+    return _CURRENT_EPISODE.get()
+
+
+def track_messages(messages: List[Dict[str, Any]]) -> None:
+    context = get_episode_context()
+    if context is not None:
+        context.track_messages(messages)
@@ -0,0 +1,270 @@
+# Copyright Sierra
+
+import time
+import random
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional
+
+from tau_bench.concurrency import get_call_pools, get_concurrency_controller
+from tau_bench.rate_limit import get_rate_limiter
+from tau_bench.telemetry import get_run_telemetry
+from tau_bench.budget import CostBudget, get_cost_budget
+from tau_bench.episode import EpisodeContext, get_episode_context
+from tau_bench.cassette import CassetteMode, fingerprint, get_cassette
+from tau_bench.completion_cache import get_completion_cache
+from tau_bench.tracing import span
+from tau_bench.prompt_cache import cached_prompt_tokens
+from tau_bench.streaming import StreamAssembler, stream_completion
+
+MAX_RETRIES = 5
+INITIAL_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+_RETRY_LOCK = threading.Lock()
+
+CALL_TIMEOUT_SECONDS: Optional[float] = None
+_CALL_TIMEOUT_LOCK = threading.Lock()
+
+
+def set_max_retries(max_retries: int) -> None:
+    with _RETRY_LOCK:
+        global MAX_RETRIES
+        MAX_RETRIES = max_retries
+
+
+def get_max_retries() -> int:
+    with _RETRY_LOCK:
+        return MAX_RETRIES
+
+
+def set_call_timeout(timeout_seconds: Optional[float]) -> None:
+    with _CALL_TIMEOUT_LOCK:
+        global CALL_TIMEOUT_SECONDS
+        CALL_TIMEOUT_SECONDS = timeout_seconds
+
+
+def get_call_timeout() -> Optional[float]:
+    with _CALL_TIMEOUT_LOCK:
+        return CALL_TIMEOUT_SECONDS
+
+
+def completion(
+    role: str = "agent",
+    stream_until: Optional[Callable[[StreamAssembler], bool]] = None,
+    **kwargs: Any,
+) -> Any:
+    """Calls `litellm.completion`, retrying rate-limited and timed out calls.
+
+    Every completion made by the agents and user simulators goes through here so that
+    throttling feedback reaches the process-wide concurrency controller, the calls
+    draw from the process-wide rate limiter and their cost is attributed to `role`
+    ("agent" or "user") in the run telemetry (if these are set). The cost is also
+    charged to the current episode and the run budget; once either is used up, the
+    next call raises `EpisodeAborted` instead of reaching the provider. The same
+    happens when the episode runs past its deadline; each call's timeout is capped by
+    the time the episode has left.
+
+    With a cassette set, responses are recorded to it or replayed from it; replayed
+    calls never reach the provider. With a completion cache set, temperature 0 agent
+    calls are served from it when the same request was made before, at no cost.
+
+    With call pools set, each call first waits for a free slot in the in-flight pools of
+    its role and endpoint; the time it waited is recorded on its span as `queue_wait`.
+
+    With `stream_until`, the completion is streamed and reading stops as soon as it
+    returns True (see `tau_bench.streaming`); the result is still a regular response.
+
+    Each call is recorded as an "llm" span when a tracer is set.
+    """
+    with span(
+        "llm", "llm", role=role, model=kwargs.get("model"), provider=kwargs.get("custom_llm_provider")
+    ) as call_span:
+        res = _completion(role, call_span, stream_until, **kwargs)
+        usage = getattr(res, "usage", None)
+        call_span.set(
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            cached_prompt_tokens=cached_prompt_tokens(res),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            cost=response_cost(res),
+            replayed=(getattr(res, "_hidden_params", None) or {}).get("cassette", False),
+            completion_cache=(getattr(res, "_hidden_params", None) or {}).get("completion_cache", False),
+        )
+        stream = (getattr(res, "_hidden_params", None) or {}).get("stream")
+        if stream is not None:
+            call_span.set(**stream)
+        return res
+
+
+def _completion(
+    role: str,
+    call_span: Any,
+    stream_until: Optional[Callable[[StreamAssembler], bool]],
+    **kwargs: Any,
+) -> Any:
+    # litellm is only imported once it is needed, since importing it takes seconds
+    import litellm
+
+    throttle_errors = (litellm.RateLimitError, litellm.Timeout)
+    controller = get_concurrency_controller()
+    limiter = get_rate_limiter()
+    pools = get_call_pools()
+    budget = get_cost_budget()
+    episode = get_episode_context()
+    max_retries = get_max_retries()
+    cassette = get_cassette()
+    key = None
+    if cassette is not None:
+        key = cassette.key(role, kwargs)
+        if cassette.mode != CassetteMode.RECORD:
+            if budget is not None:
+                budget.check()
+            if episode is not None:
+                episode.check()
+            res = cassette.lookup(key)
+            if res is not None:
+                _charge(role, res, response_cost(res), budget, episode)
+                return res
+    cache = get_completion_cache()
+    cache_key = None
+    if cache is not None and role == "agent" and kwargs.get("temperature") == 0:
+        if budget is not None:
+            budget.check()
+        if episode is not None:
+            episode.check()
+        cache_key = fingerprint(kwargs)
+        res = cache.get(cache_key)
+        if episode is not None:
+            episode.add_cache_lookup(res is not None)
+        if res is not None:
+            if cassette is not None:
+                res = cassette.record(key, role, kwargs["model"], res, 0.0)
+            _charge(role, res, 0.0, budget, episode)
+            return res
+    attempt = 0
+    queue_wait = 0.0
+    while True:
+        if budget is not None:
+            budget.check()
+        if episode is not None:
+            episode.check()
+        timeout = get_call_timeout()
+        remaining = episode.remaining_seconds() if episode is not None else None
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        ticket = None
+        if limiter is not None:
+            ticket = limiter.acquire(
+                provider=kwargs.get("custom_llm_provider"),
+                model=kwargs["model"],
+                messages=kwargs["messages"],
+                tools=kwargs.get("tools"),
+            )
+        slot = (
+            pools.slot(role, kwargs.get("custom_llm_provider"), kwargs["model"])
+            if pools is not None
+            else nullcontext(0.0)
+        )
+        try:
+            with slot as wait_seconds:
+                if pools is not None:
+                    queue_wait += wait_seconds
+                    call_span.set(queue_wait=queue_wait)
+                if controller is not None:
+                    with controller.call():
+                        res = _call(kwargs, stream_until)
+                else:
+                    res = _call(kwargs, stream_until)
+        except throttle_errors as e:
+            if ticket is not None:
+                # a rejected call still counts against the request budget but used no tokens
+                limiter.reconcile(ticket, 0)
+            if episode is not None:
+                # running out of episode time is not a sign of provider overload
+                episode.check()
+            if controller is not None:
+                controller.record_throttle()
+            if attempt >= max_retries:
+                raise
+            time.sleep(backoff_seconds(attempt, e))
+            attempt += 1
+            call_span.set(retries=attempt)
+            continue
+        if controller is not None:
+            controller.record_success()
+        if ticket is not None:
+            limiter.reconcile(ticket, _total_tokens(res))
+        cost = response_cost(res)
+        if cache_key is not None:
+            cache.put(cache_key, kwargs["model"], res)
+        if cassette is not None:
+            res = cassette.record(key, role, kwargs["model"], res, cost)
+        _charge(role, res, cost, budget, episode)
+        return res
+
+
+def _call(kwargs: Dict[str, Any], stream_until: Optional[Callable[[StreamAssembler], bool]]) -> Any:
+    import litellm
+
+    if stream_until is None:
+        return litellm.completion(**kwargs)
+    return stream_completion(kwargs, stream_until)
+
+
+def _charge(
+    role: str,
+    res: Any,
+    cost: float,
+    budget: Optional[CostBudget],
+    episode: Optional[EpisodeContext],
+) -> None:
+    if budget is not None:
+        budget.add_cost(cost)
+    if episode is not None:
+        episode.add_cost(role, cost)
+        usage = getattr(res, "usage", None)
+        episode.add_usage(role, getattr(usage, "prompt_tokens", None) or 0, cached_prompt_tokens(res))
+        stream = (getattr(res, "_hidden_params", None) or {}).get("stream")
+        if stream is not None:
+            episode.add_streamed_call(
+                {"role": role, **stream, "total_tokens": getattr(usage, "total_tokens", None)}
+            )
+    telemetry = get_run_telemetry()
+    if telemetry is not None:
+        telemetry.record_call(role, cost)
+
+
+def response_cost(res: Any) -> float:
+    hidden_params = getattr(res, "_hidden_params", None) or {}
+    return hidden_params.get("response_cost") or 0.0
+
+
+def _total_tokens(res: Any) -> Optional[int]:
+    usage = getattr(res, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def backoff_seconds(attempt: int, error: Optional[Exception] = None) -> float:
+    retry_after = _retry_after_seconds(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, MAX_BACKOFF_SECONDS)
+    # exponential backoff with full jitter
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, INITIAL_BACKOFF_SECONDS * 2**attempt))
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None)
+    if not headers:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after")
+    except AttributeError:
+        return None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
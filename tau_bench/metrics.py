@@ -0,0 +1,287 @@
+# Copyright Sierra
+
+import argparse
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from tau_bench.types import EnvRunResult
+from tau_bench.result_reader import iter_results
+
+
+class SuccessMatrix(BaseModel):
+    """Per-task successes of a run: `successes[i, j]` is whether trial j of `task_ids[i]`
+    succeeded, and `observed[i, j]` whether that trial was run at all."""
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    task_ids: List[int]
+    trials: List[int]
+    successes: np.ndarray
+    observed: np.ndarray
+    rewards: np.ndarray
+
+    @property
+    def num_successes(self) -> np.ndarray:
+        return self.successes.sum(axis=1)
+
+    @property
+    def num_trials(self) -> np.ndarray:
+        return self.observed.sum(axis=1)
+
+
+class Estimate(BaseModel):
+    value: float
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+
+class Comparison(BaseModel):
+    """`b` minus `a` over the tasks both runs share."""
+
+    k: int
+    num_tasks: int
+    a: float
+    b: float
+    diff: Estimate
+    p_value: float
+
+
+def success_matrix(results: Iterable[EnvRunResult]) -> SuccessMatrix:
+    task_ids: List[int] = []
+    trials: List[int] = []
+    cells: List[Tuple[int, int, float]] = []
+    for result in results:
+        task_ids.append(result.task_id)
+        trials.append(result.trial)
+        cells.append((result.task_id, result.trial, result.reward))
+    unique_task_ids = sorted(set(task_ids))
+    unique_trials = sorted(set(trials))
+    rewards = np.full((len(unique_task_ids), len(unique_trials)), np.nan)
+    if len(cells) > 0:
+        cells_array = np.array(cells)
+        rows = np.searchsorted(unique_task_ids, cells_array[:, 0])
+        cols = np.searchsorted(unique_trials, cells_array[:, 1])
+        rewards[rows, cols] = cells_array[:, 2]
+    observed = ~np.isnan(rewards)
+    return SuccessMatrix(
+        task_ids=unique_task_ids,
+        trials=unique_trials,
+        successes=observed & (np.abs(np.nan_to_num(rewards) - 1) <= 1e-6),
+        observed=observed,
+        rewards=rewards,
+    )
+
+
+def task_pass_hat_ks(matrix: SuccessMatrix, max_k: Optional[int] = None) -> np.ndarray:
+    """Unbiased per-task pass^k = C(c, k) / C(n, k) (https://arxiv.org/pdf/2406.12045)
+    for k = 1..max_k, as a (tasks x k) array. Tasks with fewer than k trials are NaN.
+
+    The ratio is built up as a running product of (c - i) / (n - i), which avoids
+    large binomial coefficients.
+    """
+    c = matrix.num_successes.astype(float)
+    n = matrix.num_trials.astype(float)
+    if max_k is None:
+        max_k = int(n.max()) if len(n) > 0 else 0
+    out = np.full((len(c), max_k), np.nan)
+    ratio = np.ones(len(c))
+    for k in range(1, max_k + 1):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = ratio * np.clip(c - (k - 1), 0, None) / (n - (k - 1))
+        out[:, k - 1] = np.where(n >= k, ratio, np.nan)
+    return out
+
+
+def _bootstrap_weights(
+    num_tasks: int, num_bootstrap: int, rng: np.random.Generator
+) -> np.ndarray:
+    # resampling tasks with replacement is the same as multinomial task weights,
+    # which avoids materializing a (bootstrap x tasks x k) array
+    return rng.multinomial(num_tasks, np.full(num_tasks, 1 / num_tasks), size=num_bootstrap)
+
+
+def _nanmean_weighted(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Weighted means of each column of `values` (tasks x k) under each row of
+    `weights` (bootstrap x tasks), ignoring NaNs."""
+    valid = ~np.isnan(values)
+    totals = weights @ np.where(valid, values, 0.0)
+    counts = weights @ valid.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return totals / counts
+
+
+def _interval(
+    values: np.ndarray,
+    method: str,
+    confidence: float,
+    num_bootstrap: int,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Confidence interval of the mean over tasks of each column of `values`."""
+    alpha = 1 - confidence
+    if method == "analytic":
+        valid = ~np.isnan(values)
+        n = valid.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sem = np.nanstd(values, axis=0, ddof=1) / np.sqrt(n)
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        mean = np.nanmean(values, axis=0)
+        return mean - z * sem, mean + z * sem
+    elif method == "bootstrap":
+        weights = _bootstrap_weights(values.shape[0], num_bootstrap, rng)
+        means = _nanmean_weighted(values, weights)
+        return (
+            np.nanquantile(means, alpha / 2, axis=0),
+            np.nanquantile(means, 1 - alpha / 2, axis=0),
+        )
+    raise ValueError(f"Unknown confidence interval method: {method}")
+
+
+def pass_hat_ks(
+    results: Iterable[EnvRunResult],
+    ci: Optional[str] = "bootstrap",
+    confidence: float = 0.95,
+    num_bootstrap: int = 1000,
+    seed: int = 0,
+) -> Dict[int, Estimate]:
+    """pass^k for every k up to the number of trials, with optional confidence intervals
+    ("bootstrap" over tasks, or "analytic" normal approximation)."""
+    values = task_pass_hat_ks(success_matrix(results))
+    if values.shape[0] == 0:
+        return {}
+    with np.errstate(invalid="ignore"):
+        means = np.nanmean(values, axis=0)
+    if ci is None:
+        return {k + 1: Estimate(value=means[k]) for k in range(values.shape[1])}
+    low, high = _interval(values, ci, confidence, num_bootstrap, np.random.default_rng(seed))
+    return {
+        k + 1: Estimate(value=means[k], low=low[k], high=high[k])
+        for k in range(values.shape[1])
+    }
+
+
+def compare(
+    a: Iterable[EnvRunResult],
+    b: Iterable[EnvRunResult],
+    confidence: float = 0.95,
+    num_bootstrap: int = 1000,
+    seed: int = 0,
+) -> List[Comparison]:
+    """Paired comparison of two runs over their common tasks.
+
+    The difference in pass^k gets a paired bootstrap interval (tasks are resampled
+    together in both runs) and a two-sided sign-flip permutation p-value.
+    """
+    matrix_a = success_matrix(a)
+    matrix_b = success_matrix(b)
+    common = sorted(set(matrix_a.task_ids) & set(matrix_b.task_ids))
+    if len(common) == 0:
+        return []
+    rows_a = np.searchsorted(matrix_a.task_ids, common)
+    rows_b = np.searchsorted(matrix_b.task_ids, common)
+    values_a = task_pass_hat_ks(matrix_a)[rows_a]
+    values_b = task_pass_hat_ks(matrix_b)[rows_b]
+    max_k = min(values_a.shape[1], values_b.shape[1])
+    diffs = values_b[:, :max_k] - values_a[:, :max_k]
+    rng = np.random.default_rng(seed)
+    alpha = 1 - confidence
+    boot = _nanmean_weighted(diffs, _bootstrap_weights(len(common), num_bootstrap, rng))
+    signs = rng.choice([-1.0, 1.0], size=(num_bootstrap, len(common)))
+    valid = ~np.isnan(diffs)
+    filled = np.where(valid, diffs, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        observed = filled.sum(axis=0) / valid.sum(axis=0)
+        permuted = (signs @ filled) / valid.sum(axis=0)
+    p_values = (np.sum(np.abs(permuted) >= np.abs(observed) - 1e-12, axis=0) + 1) / (
+        num_bootstrap + 1
+    )
+    comparisons = []
+    for k in range(max_k):
+        comparisons.append(
+            Comparison(
+                k=k + 1,
+                num_tasks=int(valid[:, k].sum()),
+                a=np.nanmean(values_a[:, k]),
+                b=np.nanmean(values_b[:, k]),
+                diff=Estimate(
+                    value=observed[k],
+                    low=np.nanquantile(boot[:, k], alpha / 2),
+                    high=np.nanquantile(boot[:, k], 1 - alpha / 2),
+                ),
+                p_value=p_values[k],
+            )
+        )
+    return comparisons
+
+
+def format_estimate(estimate: Estimate, confidence: float = 0.95) -> str:
+    if estimate.low is None or estimate.high is None:
+        return f"{estimate.value}"
+    return f"{estimate.value} ({confidence:.0%} CI {estimate.low:.4f}-{estimate.high:.4f})"
+
+
+def load(paths: List[str]) -> List[EnvRunResult]:
+    """Loads (and concatenates) result files without their trajectories."""
+    return [
+        result for path in paths for result in iter_results(path, exclude=["traj", "info"])
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pass^k with confidence intervals")
+    parser.add_argument("paths", type=str, nargs="+", help="Result files (JSON or JSONL)")
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Treat the files as shards of one run instead of separate runs",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Paired comparison of the second file against the first",
+    )
+    parser.add_argument("--ci", type=str, default="bootstrap", choices=["bootstrap", "analytic"])
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--num-bootstrap", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.compare:
+        if len(args.paths) != 2:
+            parser.error("--compare takes exactly two result files")
+        print(f"📊 {args.paths[1]} vs {args.paths[0]}")
+        for c in compare(
+            load(args.paths[:1]),
+            load(args.paths[1:]),
+            confidence=args.confidence,
+            num_bootstrap=args.num_bootstrap,
+            seed=args.seed,
+        ):
+            print(
+                f"  k={c.k}: {c.a:.4f} -> {c.b:.4f}, diff {format_estimate(c.diff, args.confidence)},"
+                f" p={c.p_value:.4f} ({c.num_tasks} tasks)"
+            )
+        return
+
+    runs = [args.paths] if args.merge else [[path] for path in args.paths]
+    for paths in runs:
+        results = load(paths)
+        print(f"📈 {', '.join(paths)} ({len(results)} results)")
+        if len(results) == 0:
+            continue
+        print(f"  Average reward: {np.mean([r.reward for r in results])}")
+        for k, estimate in pass_hat_ks(
+            results,
+            ci=args.ci,
+            confidence=args.confidence,
+            num_bootstrap=args.num_bootstrap,
+            seed=args.seed,
+        ).items():
+            print(f"  k={k}: {format_estimate(estimate, args.confidence)}")
+
+
+if __name__ == "__main__":
+    main()
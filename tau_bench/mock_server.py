@@ -0,0 +1,564 @@
+# Copyright Sierra
+
+import re
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from tau_bench.envs import get_tasks
+from tau_bench.types import RESPOND_ACTION_NAME, RESPOND_ACTION_FIELD_NAME, Task
+
+TASK_MARKER = re.compile(r"\[mock task (\d+)\]")
+DONE_MARKER = "[mock done]"
+
+
+class MockConfig(object):
+    def __init__(
+        self,
+        latency: str = "fixed",
+        latency_mean: float = 0.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        rpm: Optional[float] = None,
+        max_inflight: Optional[int] = None,
+        retry_after: float = 1.0,
+        tokens_per_second: Optional[float] = None,
+        trailing_tokens: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        # pace of streamed responses (unpaced if None)
+        self.tokens_per_second = tokens_per_second
+        # filler streamed after the action (a parallel tool call, or text after a ReAct
+        # action) that an agent can stop reading
+        self.trailing_tokens = trailing_tokens
+
+    def sample_latency(self) -> float:
+        if self.latency_mean <= 0:
+            return 0.0
+        if self.latency == "fixed":
+            return self.latency_mean
+        elif self.latency == "exponential":
+            return random.expovariate(1 / self.latency_mean)
+        elif self.latency == "lognormal":
+            # parameterized so that the mean is `latency_mean`
+            mu = math.log(self.latency_mean) - self.latency_sigma**2 / 2
+            return random.lognormvariate(mu, self.latency_sigma)
+        raise ValueError(f"Unknown latency distribution: {self.latency}")
+
+
+class MockLLM(object):
+    """Scripted agent and user simulator replies that solve the tasks.
+
+    The simulated user opens with a marker naming its task (found by its instruction),
+    the agent then calls the task's ground-truth actions one by one and finally
+    responds with the expected outputs, after which the user stops. A correct harness
+    therefore scores (nearly) every task as solved.
+    """
+
+    def __init__(self, tasks: List[Task]) -> None:
+        self.tasks = tasks
+        self.task_by_instruction = {}
+        for idx, task in enumerate(tasks):
+            self.task_by_instruction.setdefault(task.instruction.strip(), idx)
+
+    def reply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        messages = request.get("messages") or []
+        system = ""
+        if len(messages) > 0 and messages[0].get("role") == "system":
+            system = _text(messages[0].get("content"))
+        if "Instruction: " in system:
+            return self._user_reply(system, messages)
+        if len(messages) == 1 and "Classification:" in _text(messages[0].get("content")):
+            # verification step of the verify/reflection user strategies
+            return {"role": "assistant", "content": "true"}
+        return self._agent_reply(request, messages)
+
+    def _user_reply(self, system: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        instruction = system.split("Instruction: ", 1)[1].rsplit("\nRules:", 1)[0].strip()
+        task_idx = self.task_by_instruction.get(instruction)
+        last = _text(messages[-1].get("content"))
+        if DONE_MARKER in last:
+            content = "###STOP###"
+        elif task_idx is not None:
+            content = f"Hi, I need help with something. [mock task {task_idx}]"
+        else:
+            content = "Hi, I need help with something."
+        if "User Response:" in system:
+            content = f"User Response:\n{content}"
+        return {"role": "assistant", "content": content}
+
+    def _agent_reply(self, request: Dict[str, Any], messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        task = None
+        for message in messages:
+            match = TASK_MARKER.search(_text(message.get("content")))
+            if match is not None and int(match.group(1)) < len(self.tasks):
+                task = self.tasks[int(match.group(1))]
+                break
+        num_calls = sum(1 for message in messages if _is_tool_call(message))
+        if task is not None and num_calls < len(task.actions):
+            action = task.actions[num_calls]
+            name, arguments = action.name, action.kwargs
+        else:
+            outputs = ", ".join(task.outputs) if task is not None else ""
+            name = RESPOND_ACTION_NAME
+            arguments = {RESPOND_ACTION_FIELD_NAME: f"All done. {outputs} {DONE_MARKER}".strip()}
+        if request.get("tools") and name != RESPOND_ACTION_NAME:
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{uuid.uuid4().hex[:24]}",
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)},
+                    }
+                ],
+            }
+        if request.get("tools"):
+            return {"role": "assistant", "content": arguments[RESPOND_ACTION_FIELD_NAME]}
+        action_json = json.dumps({"name": name, "arguments": arguments})
+        return {"role": "assistant", "content": f"Thought:\nFollowing the script.\nAction:\n{action_json}"}
+
+
+def _is_tool_call(message: Dict[str, Any]) -> bool:
+    if message.get("role") != "assistant":
+        return False
+    if message.get("tool_calls"):
+        return True
+    content = _text(message.get("content"))
+    if "Action:" not in content:
+        return False
+    try:
+        action = json.loads(content.split("Action:")[-1].strip())
+    except json.JSONDecodeError:
+        return False
+    return isinstance(action, dict) and action.get("name") != RESPOND_ACTION_NAME
+
+
+def _text(content: Any) -> str:
+    """The text of a message content, which may be a list of content blocks."""
+    if isinstance(content, list):
+        return "".join(block.get("text") or "" for block in content if isinstance(block, dict))
+    return content or ""
+
+
+def _has_cache_control(content: Any) -> bool:
+    if isinstance(content, list):
+        return any(isinstance(block, dict) and "cache_control" in block for block in content)
+    return isinstance(content, dict) and "cache_control" in content
+
+
+def from_anthropic(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts an Anthropic Messages request into the chat completions request that
+    `MockLLM` reads."""
+    messages: List[Dict[str, Any]] = []
+    if request.get("system"):
+        messages.append({"role": "system", "content": _text(request["system"])})
+    for message in request.get("messages") or []:
+        content = message.get("content")
+        if not isinstance(content, list):
+            messages.append({"role": message["role"], "content": content or ""})
+            continue
+        for block in content:
+            if block.get("type") == "tool_result":
+                messages.append(
+                    {"role": "tool", "tool_call_id": block.get("tool_use_id"), "content": _text(block.get("content"))}
+                )
+        text = "".join(block.get("text") or "" for block in content if block.get("type") == "text")
+        tool_uses = [block for block in content if block.get("type") == "tool_use"]
+        if len(tool_uses) > 0:
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": text or None,
+                    "tool_calls": [
+                        {
+                            "id": block["id"],
+                            "type": "function",
+                            "function": {"name": block["name"], "arguments": json.dumps(block.get("input") or {})},
+                        }
+                        for block in tool_uses
+                    ],
+                }
+            )
+        elif text or not any(block.get("type") == "tool_result" for block in content):
+            messages.append({"role": message["role"], "content": text})
+    return {"model": request.get("model"), "messages": messages, "tools": request.get("tools")}
+
+
+class _Server(ThreadingHTTPServer):
+    # a deep listen backlog so that bursts of connections are not refused
+    request_queue_size = 4096
+
+
+class MockServer(object):
+    """An OpenAI-compatible chat completions server backed by `MockLLM`, with
+    injected latency, errors and rate limiting. It also serves the Anthropic Messages
+    API (`/v1/messages`, without streaming), so that requests with explicit
+    `cache_control` breakpoints can be checked against it."""
+
+    def __init__(self, llm: MockLLM, config: MockConfig, host: str = "127.0.0.1", port: int = 8000) -> None:
+        self.llm = llm
+        self.config = config
+        self.lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            "num_requests": 0,
+            "num_ok": 0,
+            "num_rate_limited": 0,
+            "num_errors": 0,
+            "inflight": 0,
+            "max_inflight": 0,
+            "num_cache_hits": 0,
+            "num_cache_breakpoints": 0,
+            "num_streams_cancelled": 0,
+        }
+        self._window: List[float] = []
+        self._prefixes: Set[str] = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path.rstrip("/").endswith("/stats"):
+                    with server.lock:
+                        self._send(200, dict(server.stats))
+                else:
+                    self._send(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                path = self.path.rstrip("/")
+                if path.endswith("/chat/completions"):
+                    api = "chat"
+                elif path.endswith("/messages"):
+                    api = "messages"
+                else:
+                    self._send(404, {"error": {"message": "Not found"}})
+                    return
+                request = json.loads(body or b"{}")
+                if api == "messages" and request.get("stream"):
+                    self._send(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "Streaming is only mocked for chat completions"}})
+                    return
+                status, payload, headers = server.handle(request, api)
+                if status == 200 and request.get("stream"):
+                    self._send_stream(server.stream_chunks(payload, request))
+                else:
+                    self._send(status, payload, headers)
+
+            def _send_stream(self, chunks: Iterator[Dict[str, Any]]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client stopped reading early
+                    with server.lock:
+                        server.stats["num_streams_cancelled"] += 1
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = _Server((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _rejection(self) -> Optional[Tuple[int, Dict[str, Any], Dict[str, str]]]:
+        config = self.config
+        rate_limited = {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}}
+        retry_after = {"Retry-After": str(config.retry_after)}
+        now = time.monotonic()
+        with self.lock:
+            if config.max_inflight is not None and self.stats["inflight"] > config.max_inflight:
+                return 429, rate_limited, retry_after
+            if config.rpm is not None:
+                self._window = [t for t in self._window if now - t < 60.0]
+                if len(self._window) >= config.rpm:
+                    return 429, rate_limited, {"Retry-After": f"{60.0 - (now - self._window[0]):.2f}"}
+                self._window.append(now)
+        if random.random() < config.rate_limit_rate:
+            return 429, rate_limited, retry_after
+        if random.random() < config.error_rate:
+            return 500, {"error": {"message": "Internal error (mock)", "type": "server_error"}}, {}
+        return None
+
+    def _cache(self, segments: List[Tuple[Any, bool]]) -> Tuple[int, int]:
+        """Simulates prompt caching and returns the prompt tokens read from and written
+        to the cache.
+
+        `segments` are the parts of the prompt in order (tool schemas, system prompt,
+        messages), each flagged if it holds a `cache_control` breakpoint. With
+        breakpoints, like Anthropic's explicit caching, the prefix up to each breakpoint
+        is cached and the longest one cached before is read. Without, like OpenAI's
+        automatic caching, the prefix of the tool schemas and system prompt is. Only
+        prefixes of at least 1024 tokens are cached.
+        """
+        breakpoints = [end + 1 for end, (_, marked) in enumerate(segments) if marked]
+        with self.lock:
+            if len(breakpoints) > 0:
+                self.stats["num_cache_breakpoints"] += len(breakpoints)
+            else:
+                breakpoints = [min(2, len(segments))]
+            read = written = 0
+            for end in breakpoints:
+                prefix = json.dumps([segment for segment, _ in segments[:end]], sort_keys=True)
+                tokens = len(prefix) // 4
+                if tokens < 1024:
+                    continue
+                if prefix in self._prefixes:
+                    read = max(read, tokens)
+                else:
+                    self._prefixes.add(prefix)
+                    written = max(written, tokens)
+            if read > 0:
+                self.stats["num_cache_hits"] += 1
+        return read, max(0, written - read)
+
+    def handle(self, request: Dict[str, Any], api: str = "chat") -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """Answers a chat completions (`api="chat"`) or Anthropic Messages
+        (`api="messages"`) request."""
+        with self.lock:
+            self.stats["num_requests"] += 1
+            self.stats["inflight"] += 1
+            self.stats["max_inflight"] = max(self.stats["max_inflight"], self.stats["inflight"])
+        try:
+            rejection = self._rejection()
+            if rejection is not None:
+                with self.lock:
+                    self.stats["num_rate_limited" if rejection[0] == 429 else "num_errors"] += 1
+                return rejection
+            time.sleep(self.config.sample_latency())
+            if api == "messages":
+                payload = self._messages_reply(request)
+            else:
+                payload = self._chat_reply(request)
+            with self.lock:
+                self.stats["num_ok"] += 1
+            return 200, payload, {}
+        finally:
+            with self.lock:
+                self.stats["inflight"] -= 1
+
+    def _chat_reply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        message = self.llm.reply(request)
+        messages = request.get("messages") or []
+        prompt_tokens = len(json.dumps(messages)) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        tools = request.get("tools")
+        cached_tokens, _ = self._cache(
+            [(tools, any(_has_cache_control(tool) for tool in tools or []))]
+            + [(m, _has_cache_control(m.get("content"))) for m in messages]
+        )
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": min(cached_tokens, prompt_tokens)},
+            },
+        }
+
+    def _messages_reply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        message = self.llm.reply(from_anthropic(request))
+        tools = request.get("tools")
+        system = request.get("system")
+        messages = request.get("messages") or []
+        read, written = self._cache(
+            [(tools, any(_has_cache_control(tool) for tool in tools or [])), (system, _has_cache_control(system))]
+            + [(m, _has_cache_control(m.get("content"))) for m in messages]
+        )
+        prompt_tokens = len(json.dumps([tools, system, messages])) // 4
+        content: List[Dict[str, Any]] = []
+        if message.get("content"):
+            content.append({"type": "text", "text": message["content"]})
+        for call in message.get("tool_calls") or []:
+            content.append(
+                {
+                    "type": "tool_use",
+                    "id": call["id"].replace("call_", "toolu_", 1),
+                    "name": call["function"]["name"],
+                    "input": json.loads(call["function"]["arguments"]),
+                }
+            )
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "mock"),
+            "content": content,
+            "stop_reason": "tool_use" if message.get("tool_calls") else "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                # like Anthropic's, input tokens exclude those read from or written to the cache
+                "input_tokens": max(0, prompt_tokens - read - written),
+                "output_tokens": len(json.dumps(message)) // 4,
+                "cache_read_input_tokens": read,
+                "cache_creation_input_tokens": written,
+            },
+        }
+
+    def stream_chunks(self, payload: Dict[str, Any], request: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Splits a completion into streamed chunks of about 4 tokens, paced at
+        `tokens_per_second`, followed by the configured trailing tokens."""
+        message = payload["choices"][0]["message"]
+        base = {key: payload[key] for key in ("id", "created", "model")}
+        base["object"] = "chat.completion.chunk"
+        tokens_per_second = self.config.tokens_per_second
+        filler = " ".join(["filler"] * self.config.trailing_tokens)
+        tool_calls = list(message.get("tool_calls") or [])
+        content = message.get("content") or ""
+        if self.config.trailing_tokens > 0:
+            if len(tool_calls) > 0:
+                tool_calls.append(
+                    {
+                        "id": f"call_{uuid.uuid4().hex[:24]}",
+                        "type": "function",
+                        "function": {"name": "think", "arguments": json.dumps({"thought": filler})},
+                    }
+                )
+            else:
+                content += f"\nObservation: {filler}"
+
+        def _chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        def _pieces(text: str) -> Iterator[str]:
+            for start in range(0, len(text), 16):
+                if tokens_per_second is not None:
+                    time.sleep(4 / tokens_per_second)
+                yield text[start : start + 16]
+
+        yield _chunk({"role": "assistant", "content": ""})
+        for piece in _pieces(content):
+            yield _chunk({"content": piece})
+        for idx, call in enumerate(tool_calls):
+            yield _chunk(
+                {
+                    "tool_calls": [
+                        {
+                            "index": idx,
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["function"]["name"], "arguments": ""},
+                        }
+                    ]
+                }
+            )
+            for piece in _pieces(call["function"]["arguments"]):
+                yield _chunk({"tool_calls": [{"index": idx, "function": {"arguments": piece}}]})
+        yield _chunk({}, payload["choices"][0]["finish_reason"])
+        if (request.get("stream_options") or {}).get("include_usage"):
+            usage = dict(payload["usage"])
+            usage["completion_tokens"] += self.config.trailing_tokens
+            usage["total_tokens"] += self.config.trailing_tokens
+            yield {**base, "choices": [], "usage": usage}
+
+    def start(self) -> "MockServer":
+        """Serves on a background thread (for use from the same process)."""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Local OpenAI-compatible LLM server that scripts tau-bench tasks, for load testing"
+    )
+    parser.add_argument("--env", type=str, choices=["retail", "airline"], default="retail")
+    parser.add_argument("--task-split", type=str, default="test", choices=["train", "test", "dev"])
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=str, default="fixed", choices=["fixed", "exponential", "lognormal"])
+    parser.add_argument("--latency-mean", type=float, default=0.0, help="Mean latency of a completion in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Sigma of the lognormal latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests rejected with a 429")
+    parser.add_argument("--rpm", type=float, help="Requests per minute above which requests get a 429")
+    parser.add_argument("--max-inflight", type=int, help="Concurrent requests above which requests get a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--tokens-per-second", type=float, help="Pace of streamed responses")
+    parser.add_argument(
+        "--trailing-tokens",
+        type=int,
+        default=0,
+        help="Filler tokens streamed after the action (a parallel tool call, or text after a ReAct action)",
+    )
+    args = parser.parse_args()
+
+    server = MockServer(
+        MockLLM(get_tasks(args.env, args.task_split)),
+        MockConfig(
+            latency=args.latency,
+            latency_mean=args.latency_mean,
+            latency_sigma=args.latency_sigma,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            rpm=args.rpm,
+            max_inflight=args.max_inflight,
+            retry_after=args.retry_after,
+            tokens_per_second=args.tokens_per_second,
+            trailing_tokens=args.trailing_tokens,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Mock LLM server for {args.env} ({args.task_split}) at {server.url}; stats at {server.url}/stats")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
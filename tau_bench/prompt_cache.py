@@ -0,0 +1,54 @@
+# Copyright Sierra
+
+from typing import Any, Dict, List, Optional
+
+# providers that only cache prompt prefixes marked with `cache_control`; others (e.g.
+# OpenAI) cache long prefixes automatically, as long as they do not change between calls
+CACHE_CONTROL_PROVIDERS = {"anthropic", "bedrock", "vertex_ai"}
+
+
+def uses_cache_control(model: str, provider: Optional[str]) -> bool:
+    if provider == "anthropic":
+        return True
+    return provider in CACHE_CONTROL_PROVIDERS and "claude" in model
+
+
+def cache_prefix(
+    messages: List[Dict[str, Any]], model: str, provider: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Marks the system prompt (and, ahead of it in the prompt, the tool schemas) as a
+    cacheable prefix for providers that need explicit cache breakpoints.
+
+    Returns a copy of `messages` for the request, so the trajectory keeps plain string
+    contents. Other providers get `messages` unchanged: their caching only needs the
+    prefix to be stable, which it is since agents never edit earlier messages.
+    """
+    if not uses_cache_control(model, provider) or len(messages) == 0:
+        return messages
+    first = messages[0]
+    if first["role"] != "system" or not isinstance(first["content"], str):
+        return messages
+    system = {
+        "role": "system",
+        "content": [
+            {
+                "type": "text",
+                "text": first["content"],
+                "cache_control": {"type": "ephemeral"},
+            }
+        ],
+    }
+    return [system] + messages[1:]
+
+
+def cached_prompt_tokens(res: Any) -> int:
+    """Prompt tokens of a response that were read from the provider's prompt cache."""
+    usage = getattr(res, "usage", None)
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        # Anthropic's own usage field, in case it is not mapped to the OpenAI one
+        cached = getattr(usage, "cache_read_input_tokens", None)
+    return cached or 0
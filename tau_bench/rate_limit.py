@@ -0,0 +1,181 @@
+# Copyright Sierra
+
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+from tau_bench.types import RateLimit
+
+
+def parse_rate_limit(spec: str) -> Dict[str, RateLimit]:
+    """Parses `<provider>[/<model>]=<rpm>:<tpm>`, where either budget may be left empty.
+
+    For example `openai=500:300000` or `anthropic/claude-3-5-sonnet-20241022=:80000`.
+    """
+    if "=" not in spec:
+        raise ValueError(f"Invalid rate limit {spec!r}, expected <provider>[/<model>]=<rpm>:<tpm>")
+    key, budgets = spec.split("=", 1)
+    rpm, _, tpm = budgets.partition(":")
+    return {
+        key: RateLimit(
+            rpm=float(rpm) if rpm else None,
+            tpm=float(tpm) if tpm else None,
+        )
+    }
+
+
+class TokenBucket(object):
+    """A bucket refilled continuously at `rate_per_minute`, holding up to one minute of budget.
+
+    The level may go negative when a call turns out to cost more than was estimated;
+    later callers then wait until the debt is paid off.
+    """
+
+    def __init__(self, rate_per_minute: float) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float) -> float:
+        """Blocks until `amount` can be taken and returns the time spent waiting."""
+        start = time.monotonic()
+        # a single request larger than the bucket is let through once the bucket is full
+        needed = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.level >= needed:
+                    self.level -= amount
+                    return now - start
+                wait = (needed - self.level) / self.rate
+            time.sleep(min(wait, 1.0))
+
+    def adjust(self, delta: float) -> None:
+        with self.lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level - delta)
+
+
+class _Budget(object):
+    def __init__(self, key: str, limit: RateLimit) -> None:
+        self.key = key
+        self.requests = TokenBucket(limit.rpm) if limit.rpm is not None else None
+        self.tokens = TokenBucket(limit.tpm) if limit.tpm is not None else None
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "num_requests": self.num_requests,
+                "estimated_tokens": self.estimated_tokens,
+                "actual_tokens": self.actual_tokens,
+                "total_wait_seconds": self.total_wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+class RateLimitTicket(BaseModel):
+    key: Optional[str]
+    estimated_tokens: int
+    wait_seconds: float
+
+
+class ProviderRateLimiter(object):
+    """Request and token budgets shared by every LLM call in the process.
+
+    Limits are keyed by `<provider>/<model>` with a fallback to `<provider>`, so the agent
+    and the user simulator draw from the same budget when they hit the same provider.
+    """
+
+    def __init__(self, limits: Dict[str, RateLimit]) -> None:
+        self.budgets = {key: _Budget(key, limit) for key, limit in limits.items()}
+
+    def _budget(self, provider: Optional[str], model: str) -> Optional[_Budget]:
+        if provider is not None and f"{provider}/{model}" in self.budgets:
+            return self.budgets[f"{provider}/{model}"]
+        if model in self.budgets:
+            return self.budgets[model]
+        if provider is not None and provider in self.budgets:
+            return self.budgets[provider]
+        return None
+
+    def acquire(
+        self,
+        provider: Optional[str],
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> RateLimitTicket:
+        budget = self._budget(provider, model)
+        if budget is None:
+            return RateLimitTicket(key=None, estimated_tokens=0, wait_seconds=0.0)
+        estimated_tokens = estimate_tokens(model, messages, tools)
+        wait_seconds = 0.0
+        if budget.requests is not None:
+            wait_seconds += budget.requests.acquire(1)
+        if budget.tokens is not None:
+            wait_seconds += budget.tokens.acquire(estimated_tokens)
+        with budget.lock:
+            budget.num_requests += 1
+            budget.estimated_tokens += estimated_tokens
+            budget.total_wait_seconds += wait_seconds
+            budget.max_wait_seconds = max(budget.max_wait_seconds, wait_seconds)
+        return RateLimitTicket(
+            key=budget.key, estimated_tokens=estimated_tokens, wait_seconds=wait_seconds
+        )
+
+    def reconcile(self, ticket: RateLimitTicket, actual_tokens: Optional[int]) -> None:
+        """Charges the difference between the estimate and the tokens actually used."""
+        if ticket.key is None or actual_tokens is None:
+            return
+        budget = self.budgets[ticket.key]
+        if budget.tokens is not None:
+            budget.tokens.adjust(actual_tokens - ticket.estimated_tokens)
+        with budget.lock:
+            budget.actual_tokens += actual_tokens
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {key: budget.stats() for key, budget in self.budgets.items()}
+
+
+def estimate_tokens(
+    model: str,
+    messages: List[Dict[str, Any]],
+    tools: Optional[List[Dict[str, Any]]] = None,
+) -> int:
+    try:
+        from litellm import token_counter
+
+        return token_counter(model=model, messages=messages, tools=tools)
+    except Exception:
+        # roughly four characters per token
+        return len(json.dumps(messages)) // 4 + (len(json.dumps(tools)) // 4 if tools else 0)
+
+
+RATE_LIMITER: Optional[ProviderRateLimiter] = None
+_RATE_LIMITER_LOCK = threading.Lock()
+
+
+def set_rate_limiter(limiter: Optional[ProviderRateLimiter]) -> None:
+    with _RATE_LIMITER_LOCK:
+        global RATE_LIMITER
+        RATE_LIMITER = limiter
+
+
+def get_rate_limiter() -> Optional[ProviderRateLimiter]:
+    with _RATE_LIMITER_LOCK:
+        return RATE_LIMITER
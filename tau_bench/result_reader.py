@@ -0,0 +1,101 @@
+# Copyright Sierra
+
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from tau_bench.types import EnvRunResult
+
+CHUNK_SIZE = 1 << 20
+
+# what an excluded field is replaced with when validating an `EnvRunResult`
+EMPTY_VALUES: Dict[str, Any] = {"traj": [], "info": {}}
+
+
+def iter_records(
+    path: str,
+    fields: Optional[Iterable[str]] = None,
+    where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """Streams the records of a result file one at a time.
+
+    Both the JSON array written by the runner and JSONL (one record per line) are
+    supported. Only the current record and a read buffer are held in memory, so memory
+    stays flat however large the file is. `where` is applied to the full record; then
+    only `fields` (if given) are kept.
+    """
+    keep = set(fields) if fields is not None else None
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        while True:
+            # skip whitespace and separators between records
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] in ",[]"):
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    return
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = len(buf) == 0
+                continue
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # the record continues past the buffer: read more, in growing chunks so
+                # that very long records are not re-parsed too often
+                more = f.read(max(chunk_size, len(buf) - pos))
+                buf = buf[pos:] + more
+                pos = 0
+                eof = len(more) == 0
+                continue
+            pos = end
+            if not isinstance(record, dict):
+                raise ValueError(f"Expected a JSON object in {path}, got {type(record).__name__}")
+            if where is not None and not where(record):
+                continue
+            if keep is not None:
+                record = {k: v for k, v in record.items() if k in keep}
+            yield record
+
+
+def iter_results(
+    path: str,
+    exclude: Optional[Iterable[str]] = None,
+    task_ids: Optional[Iterable[int]] = None,
+    successful: Optional[bool] = None,
+    where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> Iterator[EnvRunResult]:
+    """Streams the `EnvRunResult`s of a result file.
+
+    Excluded fields (e.g. `exclude=["traj"]` for metrics over a huge run) are dropped
+    as soon as each record is parsed and come back empty. `task_ids` and `successful`
+    filter on the task and on whether the reward is 1.
+    """
+    excluded = set(exclude) if exclude is not None else set()
+    task_id_set = set(task_ids) if task_ids is not None else None
+
+    def _where(record: Dict[str, Any]) -> bool:
+        if task_id_set is not None and record.get("task_id") not in task_id_set:
+            return False
+        if successful is not None and is_successful(record.get("reward", 0.0)) != successful:
+            return False
+        return where is None or where(record)
+
+    for record in iter_records(path, where=_where):
+        for field in excluded:
+            if field in record:
+                record[field] = EMPTY_VALUES.get(field)
+        yield EnvRunResult.model_validate(record)
+
+
+def load_results(path: str, **kwargs: Any) -> List[EnvRunResult]:
+    return list(iter_results(path, **kwargs))
+
+
+def is_successful(reward: float) -> bool:
+    return (1 - 1e-6) <= reward <= (1 + 1e-6)
@@ -2,32 +2,171 @@
 
 import os
 import json
+import time
 import random
 import traceback
-from math import comb
+import threading
+import contextvars
 import multiprocessing
-from typing import List, Dict, Any
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
 from tau_bench.envs import get_env
+from tau_bench.envs.base import Env
+from tau_bench.env_pool import EnvPool
 from tau_bench.agents.base import Agent
-from tau_bench.types import EnvRunResult, RunConfig
-from litellm import provider_list
+from tau_bench.types import EnvRunResult, EpisodeOutcome, RunConfig, RunTarget, Task
 from tau_bench.envs.user import UserStrategy
+from tau_bench.llm import set_call_timeout, set_max_retries
+from tau_bench.scheduling import (
+    SchedulePolicy,
+    estimate_costs,
+    expected_makespan,
+    load_episode_estimates,
+    schedule,
+)
+from tau_bench.store import ResultStore
+from tau_bench.metrics import format_estimate, pass_hat_ks
+from tau_bench.sampling import SamplePlan, display_estimates, load_difficulty, sample_tasks
+from tau_bench.cassette import Cassette, CassetteMode, get_cassette, set_cassette
+from tau_bench.tracing import Tracer, get_tracer, set_tracer, span
+from tau_bench.completion_cache import (
+    CompletionCache,
+    get_completion_cache,
+    set_completion_cache,
+)
+from tau_bench.budget import CostBudget, get_cost_budget, set_cost_budget
+from tau_bench.episode import (
+    EpisodeAborted,
+    EpisodeContext,
+    episode_context,
+    get_episode_context,
+)
+from tau_bench.telemetry import RunTelemetry, get_run_telemetry, set_run_telemetry
+from tau_bench.rate_limit import (
+    ProviderRateLimiter,
+    get_rate_limiter,
+    set_rate_limiter,
+)
+from tau_bench.concurrency import (
+    AIMDController,
+    CallPools,
+    get_call_pools,
+    get_concurrency_controller,
+    set_call_pools,
+    set_concurrency_controller,
+)
 
 
 def run(config: RunConfig) -> List[EnvRunResult]:
+    check_config(config)
+    with run_context(config), span(
+        "run", "run", env=config.env, agent_strategy=config.agent_strategy, model=config.model
+    ):
+        if config.targets:
+            return _run_targets(config)
+        return _run_with_config(config)
+
+
+def check_config(config: RunConfig) -> None:
+    from litellm import provider_list
+
     assert config.env in ["retail", "airline"], "Only retail and airline envs are supported"
     assert config.model_provider in provider_list, "Invalid model provider"
     assert config.user_model_provider in provider_list, "Invalid user model provider"
     assert config.agent_strategy in ["tool-calling", "act", "react", "few-shot"], "Invalid agent strategy"
     assert config.task_split in ["train", "test", "dev"], "Invalid task split"
     assert config.user_strategy in [item.value for item in UserStrategy], "Invalid user strategy"
+    assert config.queue_max_attempts >= 1, "Queue max attempts must be at least 1"
+    if config.targets:
+        for target in config.targets:
+            assert target.env in ["retail", "airline"], f"Invalid target {target.env}:{target.task_split}"
+            assert target.task_split in ["train", "test", "dev"], f"Invalid target {target.env}:{target.task_split}"
+        assert len({(t.env, t.task_split) for t in config.targets}) == len(config.targets), "Duplicate targets"
+        # work queue items and scheduling estimates are keyed by task id, which is per env and split
+        assert config.queue_path is None, "Multi-target runs do not support a work queue"
+        assert not config.schedule_from, "Multi-target runs do not support scheduling from prior results"
+
+
+def parse_target(spec: str) -> RunTarget:
+    """Parses `<env>[:<task split>]`, such as `airline` or `retail:dev`."""
+    env, _, task_split = spec.partition(":")
+    return RunTarget(env=env, task_split=task_split or "test")
+
+
+def target_config(config: RunConfig, target: RunTarget) -> RunConfig:
+    return config.model_copy(
+        update={"env": target.env, "task_split": target.task_split, "targets": None}
+    )
 
+
+@contextmanager
+def run_context(config: RunConfig) -> Iterator[None]:
+    """Sets up the process-wide retry, timeout, concurrency, call pool, rate limit, cost,
+    cassette, completion cache and tracing settings of a run, and prints their stats and resets them when it ends."""
     random.seed(config.seed)
-    time_str = datetime.now().strftime("%m%d%H%M%S")
-    ckpt_path = f"{config.log_dir}/{config.agent_strategy}-{config.model.split('/')[-1]}-{config.temperature}_range_{config.start_index}-{config.end_index}_user-{config.user_model}-{config.user_strategy}_{time_str}.json"
+    set_max_retries(config.max_llm_retries)
+    set_call_timeout(config.llm_call_timeout)
+    if config.adaptive_concurrency:
+        set_concurrency_controller(
+            AIMDController(
+                max_limit=config.max_concurrency,
+                initial_limit=config.initial_concurrency,
+            )
+        )
+    if config.call_limits:
+        set_call_pools(CallPools(config.call_limits))
+    if config.rate_limits:
+        set_rate_limiter(ProviderRateLimiter(config.rate_limits))
+    if config.max_cost is not None:
+        set_cost_budget(CostBudget(config.max_cost, config.max_cost_per_episode))
+    if config.cassette_path is not None:
+        set_cassette(Cassette(config.cassette_path, CassetteMode(config.cassette_mode)))
+    if config.completion_cache_path is not None:
+        set_completion_cache(
+            CompletionCache(config.completion_cache_path, config.completion_cache_max_mb)
+        )
+    if config.trace_path is not None:
+        set_tracer(Tracer(config.trace_path))
+    try:
+        yield
+    finally:
+        controller = get_concurrency_controller()
+        if controller is not None:
+            print(f"🚦 Adaptive concurrency: {controller.stats()}")
+        pools = get_call_pools()
+        if pools is not None:
+            print(f"🏊 Call pools: {pools.stats()}")
+        limiter = get_rate_limiter()
+        if limiter is not None:
+            print(f"🪣 Rate limits: {limiter.stats()}")
+        budget = get_cost_budget()
+        if budget is not None:
+            print(f"💰 Cost budget: {budget.stats()}")
+        cassette = get_cassette()
+        if cassette is not None:
+            print(f"📼 Cassette {cassette.path}: {cassette.stats()}")
+        cache = get_completion_cache()
+        if cache is not None:
+            print(f"🗄️  Completion cache {cache.path}: {cache.stats()}")
+            cache.close()
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.close()
+            print(f"🔍 Wrote {tracer.num_spans} spans to {tracer.path}")
+        set_concurrency_controller(None)
+        set_call_pools(None)
+        set_rate_limiter(None)
+        set_cost_budget(None)
+        set_cassette(None)
+        set_completion_cache(None)
+        set_tracer(None)
+
+
+def _run_with_config(config: RunConfig) -> List[EnvRunResult]:
+    ckpt_path = get_ckpt_path(config)
     if not os.path.exists(config.log_dir):
         os.makedirs(config.log_dir)
 
@@ -47,77 +186,566 @@ def run(config: RunConfig) -> List[EnvRunResult]:
     end_index = (
         len(env.tasks) if config.end_index == -1 else min(config.end_index, len(env.tasks))
     )
-    results: List[EnvRunResult] = []
-    lock = multiprocessing.Lock()
     if config.task_ids and len(config.task_ids) > 0:
         print(f"Running tasks {config.task_ids} (checkpoint path: {ckpt_path})")
     else:
         print(
             f"Running tasks {config.start_index} to {end_index} (checkpoint path: {ckpt_path})"
     )
+    items, plan = select_items(config, env.tasks)
+    order = list(range(len(items)))
+    expected = None
+    unit = "s"
+    if config.schedule_from:
+        estimates = load_episode_estimates(config.schedule_from)
+        costs, unit = estimate_costs(sorted({idx for idx, _ in items}), estimates)
+        order = schedule(items, costs, SchedulePolicy(config.schedule_policy))
+        expected = expected_makespan(
+            [items[pos] for pos in order], costs, config.max_concurrency
+        )
+        print(
+            f"Scheduling {len(items)} episodes {config.schedule_policy} from {len(estimates)} task estimates (expected makespan: {expected:.1f} {unit})"
+        )
+
+    telemetry = RunTelemetry(
+        total=len(items) if config.queue_path is None else None,
+        metrics_path=f"{os.path.splitext(ckpt_path)[0]}_metrics.json",
+        interval_seconds=config.telemetry_interval,
+    )
+    set_run_telemetry(telemetry)
+    telemetry.start()
+    try:
+        results = _run_items(
+            config=config,
+            agent=agent,
+            items=items,
+            order=order,
+            ckpt_path=ckpt_path,
+            expected=expected,
+            unit=unit,
+            # the env built for the tools and wiki serves the first episode
+            env_pool=EnvPool(env_factory(config), [env]),
+        )
+    finally:
+        telemetry.stop()
+        set_run_telemetry(None)
+    if plan is not None and len(results) > 0:
+        display_estimates(plan, results)
+    return results
+
+
+def _run_targets(config: RunConfig) -> List[EnvRunResult]:
+    """Runs the episodes of every target on one worker pool, with one checkpoint file
+    and one set of metrics per target. Returns the results of all targets in order.
+
+    The targets' episodes are interleaved (see `interleave`), so their tails overlap
+    instead of adding up.
+    """
+    assert config.targets
+    if not os.path.exists(config.log_dir):
+        os.makedirs(config.log_dir)
+    time_str = datetime.now().strftime("%m%d%H%M%S")
+    lock = multiprocessing.Lock()
+    store = ResultStore(config.results_db) if config.results_db is not None else None
+    print(f"Loading user with strategy: {config.user_strategy}")
+    targets: List[TargetRun] = []
+    for target in config.targets:
+        tconfig = target_config(config, target)
+        env = get_env(
+            tconfig.env,
+            user_strategy=tconfig.user_strategy,
+            user_model=tconfig.user_model,
+            user_provider=tconfig.user_model_provider,
+            task_split=tconfig.task_split,
+        )
+        agent = agent_factory(tools_info=env.tools_info, wiki=env.wiki, config=tconfig)
+        items, plan = select_items(tconfig, env.tasks)
+        ckpt_path = os.path.join(
+            config.log_dir,
+            f"{target.env}-{target.task_split}_{os.path.basename(get_ckpt_path(tconfig, time_str))}",
+        )
+        print(f"🎯 {target.env} ({target.task_split}): {len(items)} episodes (checkpoint path: {ckpt_path})")
+        targets.append(
+            TargetRun(
+                config=tconfig,
+                agent=agent,
+                items=items,
+                ckpt_path=ckpt_path,
+                lock=lock,
+                store=store,
+                env_pool=EnvPool(env_factory(tconfig), [env]),
+                plan=plan,
+            )
+        )
+    jobs = interleave(targets)
+
+    telemetry = RunTelemetry(
+        total=len(jobs),
+        metrics_path=os.path.join(config.log_dir, f"targets_{time_str}_metrics.json"),
+        interval_seconds=config.telemetry_interval,
+    )
+    set_run_telemetry(telemetry)
+    telemetry.start()
+    start_time = time.time()
+    try:
+        outcomes = run_jobs(config.max_concurrency, jobs)
+    finally:
+        telemetry.stop()
+        set_run_telemetry(None)
+    print(f"⏱️  Makespan: {time.time() - start_time:.1f} s for {len(jobs)} episodes")
+
+    all_results: List[EnvRunResult] = []
+    for target in targets:
+        # each target's jobs kept their relative order
+        results = [
+            result
+            for (job_target, _, _), result in zip(jobs, outcomes)
+            if job_target is target and result is not None
+        ]
+        print(f"\n🎯 {target.config.env} ({target.config.task_split})")
+        print(f"♻️  Env pool: {target.env_pool.stats()}")
+        if len(results) > 0:
+            display_metrics(results)
+            if target.plan is not None:
+                display_estimates(target.plan, results)
+        target.write_results(results)
+        all_results.extend(results)
+    return all_results
+
+
+def select_items(
+    config: RunConfig, tasks: List[Task]
+) -> Tuple[List[Tuple[int, int]], Optional[SamplePlan]]:
+    """The (task_id, trial) episodes of a run, and its sample plan when it runs a sample."""
+    plan = None
+    if config.sample_fraction is not None:
+        difficulty = (
+            load_difficulty(config.sample_strata_from) if config.sample_strata_from else None
+        )
+        plan = sample_tasks(
+            task_indices(config, len(tasks)),
+            tasks,
+            config.sample_fraction,
+            difficulty=difficulty,
+            seed=config.seed,
+        )
+        print(
+            f"Sampled {len(plan.task_ids)} of {plan.num_tasks} tasks from {len(plan.strata)} strata: {plan.task_ids}"
+        )
+    trial_idxs: List[List[int]] = []
     for i in range(config.num_trials):
-        if config.task_ids and len(config.task_ids) > 0:
-            idxs = config.task_ids
-        else:
-            idxs = list(range(config.start_index, end_index))
+        idxs = list(plan.task_ids) if plan is not None else task_indices(config, len(tasks))
         if config.shuffle:
             random.shuffle(idxs)
+        trial_idxs.append(idxs)
 
-        def _run(idx: int) -> EnvRunResult:
-            isolated_env = get_env(
-                config.env,
-                user_strategy=config.user_strategy,
-                user_model=config.user_model,
-                task_split=config.task_split,
-                user_provider=config.user_model_provider,
-                task_index=idx,
-            )
+    # all trials share one pool, so a slow task in one trial does not hold up the next
+    return [(idx, trial) for trial, idxs in enumerate(trial_idxs) for idx in idxs], plan
 
-            print(f"Running task {idx}")
-            try:
-                res = agent.solve(
-                    env=isolated_env,
-                    task_index=idx,
-                )
-                result = EnvRunResult(
-                    task_id=idx,
-                    reward=res.reward,
-                    info=res.info,
-                    traj=res.messages,
-                    trial=i,
+
+def _run_items(
+    config: RunConfig,
+    agent: Agent,
+    items: List[Tuple[int, int]],
+    order: List[int],
+    ckpt_path: str,
+    expected: Optional[float],
+    unit: str,
+    env_pool: Optional[EnvPool] = None,
+) -> List[EnvRunResult]:
+    lock = multiprocessing.Lock()
+    store = ResultStore(config.results_db) if config.results_db is not None else None
+    target = TargetRun(
+        config=config,
+        agent=agent,
+        items=items,
+        ckpt_path=ckpt_path,
+        lock=lock,
+        store=store,
+        env_pool=env_pool,
+    )
+
+    if config.queue_path is not None:
+        results = run_from_queue(
+            config=config,
+            agent=agent,
+            items=[items[pos] for pos in order],
+            save=target.save,
+            lock=lock,
+            env_pool=target.env_pool,
+        )
+        print(f"♻️  Env pool: {target.env_pool.stats()}")
+        if len(results) > 0:
+            display_metrics(results)
+        return results
+
+    start_time = time.time()
+    outcomes = run_jobs(config.max_concurrency, [(target, *items[pos]) for pos in order])
+    by_pos = dict(zip(order, outcomes))
+    # episodes skipped by the cost budget have no result
+    results = [by_pos[pos] for pos in range(len(items)) if by_pos[pos] is not None]
+    makespan = time.time() - start_time
+    if expected is not None:
+        print(f"⏱️  Makespan: expected {expected:.1f} {unit}, actual {makespan:.1f} s")
+    print(f"♻️  Env pool: {target.env_pool.stats()}")
+
+    display_metrics(results)
+    target.write_results(results)
+    return results
+
+
+class TargetRun(object):
+    """The agent, envs, episodes and result files of one env and task split in a run."""
+
+    def __init__(
+        self,
+        config: RunConfig,
+        agent: Agent,
+        items: List[Tuple[int, int]],
+        ckpt_path: str,
+        lock: Any,
+        store: Optional[ResultStore] = None,
+        env_pool: Optional[EnvPool] = None,
+        plan: Optional[SamplePlan] = None,
+    ) -> None:
+        self.config = config
+        self.agent = agent
+        self.items = items
+        self.ckpt_path = ckpt_path
+        self.lock = lock
+        self.store = store
+        self.env_pool = env_pool if env_pool is not None else EnvPool(env_factory(config))
+        self.plan = plan
+        self.run_id = None
+        if store is not None:
+            # sharded workers share one run, named after the queue
+            run_name = config.queue_path if config.queue_path is not None else ckpt_path
+            self.run_id = store.add_run(os.path.abspath(run_name), config=config)
+            print(f"Writing episodes to run {self.run_id} of {config.results_db}")
+
+    def save(self, result: EnvRunResult) -> None:
+        save_checkpoint(self.ckpt_path, result, self.lock)
+        if self.store is not None:
+            self.store.add_episode(self.run_id, result)
+
+    def write_results(self, results: List[EnvRunResult]) -> None:
+        with open(self.ckpt_path, "w") as f:
+            json.dump([result.model_dump() for result in results], f, indent=2)
+            print(f"\n📄 Results saved to {self.ckpt_path}\n")
+
+
+def interleave(targets: List[TargetRun]) -> List[Tuple[TargetRun, int, int]]:
+    """The (target, task_id, trial) episodes of all targets, interleaved in proportion
+    to their number so that every target progresses at about the same rate."""
+    ranked = [
+        ((pos + 0.5) / len(target.items), rank, pos)
+        for rank, target in enumerate(targets)
+        for pos in range(len(target.items))
+    ]
+    return [(targets[rank], *targets[rank].items[pos]) for _, rank, pos in sorted(ranked)]
+
+
+def run_jobs(
+    max_concurrency: int, jobs: List[Tuple[TargetRun, int, int]]
+) -> List[Optional[EnvRunResult]]:
+    """Runs (target, task_id, trial) episodes on one worker pool, starting them in the
+    given order, and returns their results (None for skipped episodes) in that order."""
+
+    def _run(job: Tuple[TargetRun, int, int]) -> Optional[EnvRunResult]:
+        target, idx, trial = job
+        result = run_episode(
+            config=target.config,
+            agent=target.agent,
+            task_index=idx,
+            trial=trial,
+            env_pool=target.env_pool,
+        )
+        if result is not None:
+            target.save(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        # copied contexts parent the episode spans to the run span
+        futures = [executor.submit(contextvars.copy_context().run, _run, job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def task_indices(config: RunConfig, num_tasks: int) -> List[int]:
+    if config.task_ids and len(config.task_ids) > 0:
+        return list(config.task_ids)
+    end_index = num_tasks if config.end_index == -1 else min(config.end_index, num_tasks)
+    return list(range(config.start_index, end_index))
+
+
+def env_factory(config: RunConfig) -> Callable[[], Env]:
+    """Builds envs for the episodes of `config`'s run (see `EnvPool`)."""
+
+    def _build() -> Env:
+        # every episode resets the env to its own task
+        return get_env(
+            config.env,
+            user_strategy=config.user_strategy,
+            user_model=config.user_model,
+            task_split=config.task_split,
+            user_provider=config.user_model_provider,
+            task_index=0,
+        )
+
+    return _build
+
+
+def get_ckpt_path(config: RunConfig, time_str: Optional[str] = None) -> str:
+    if time_str is None:
+        time_str = datetime.now().strftime("%m%d%H%M%S")
+    return f"{config.log_dir}/{config.agent_strategy}-{config.model.split('/')[-1]}-{config.temperature}_range_{config.start_index}-{config.end_index}_user-{config.user_model}-{config.user_strategy}_{time_str}.json"
+
+
+def run_episode(
+    config: RunConfig,
+    agent: Agent,
+    task_index: int,
+    trial: int,
+    env_pool: Optional[EnvPool] = None,
+) -> Optional[EnvRunResult]:
+    """Runs one episode, or returns None if the run's cost budget does not allow it.
+
+    The episode runs on an env from `env_pool`, or on a new env without one.
+    """
+    if env_pool is None:
+        env_pool = EnvPool(env_factory(config))
+    controller = get_concurrency_controller()
+    telemetry = get_run_telemetry()
+    budget = get_cost_budget()
+    with controller.episode() if controller is not None else nullcontext():
+        if budget is not None and not budget.try_start():
+            print(f"Skipping task {task_index} (trial {trial}): the cost budget is nearly used")
+            return None
+        if telemetry is not None:
+            telemetry.episode_started()
+        context = EpisodeContext(
+            task_id=task_index,
+            trial=trial,
+            max_cost=config.max_cost_per_episode,
+            timeout=config.episode_timeout,
+        )
+        start_time = time.time()
+        with episode_context(context), span(
+            "episode", "episode", task_id=task_index, trial=trial
+        ) as episode_span:
+            if config.episode_timeout is None:
+                result = _run_episode(
+                    config=config, agent=agent, task_index=task_index, trial=trial, env_pool=env_pool
                 )
-            except Exception as e:
-                result = EnvRunResult(
-                    task_id=idx,
-                    reward=0.0,
-                    info={"error": str(e), "traceback": traceback.format_exc()},
-                    traj=[],
-                    trial=i,
+            else:
+                result = _run_episode_with_timeout(
+                    config=config,
+                    agent=agent,
+                    task_index=task_index,
+                    trial=trial,
+                    context=context,
+                    env_pool=env_pool,
                 )
-            print(
-                "✅" if result.reward == 1 else "❌",
-                f"task_id={idx}",
-                result.info,
+            episode_span.set(reward=result.reward, outcome=result.outcome, cost=context.cost)
+        result.duration = time.time() - start_time
+        result.cost = context.cost
+        result.prompt_tokens = context.prompt_tokens
+        result.cached_prompt_tokens = context.cached_prompt_tokens
+        with context.lock:
+            result.usage_by_role = {role: dict(usage) for role, usage in context.usage_by_role.items()}
+        if get_completion_cache() is not None:
+            result.completion_cache_hits = context.completion_cache_hits
+            result.completion_cache_misses = context.completion_cache_misses
+        if len(context.streamed_calls) > 0:
+            result.info["streaming"] = list(context.streamed_calls)
+        if budget is not None:
+            budget.finish(context.cost)
+        if telemetry is not None:
+            telemetry.episode_finished(result)
+        return result
+
+
+def _run_episode(
+    config: RunConfig, agent: Agent, task_index: int, trial: int, env_pool: EnvPool
+) -> EnvRunResult:
+    print(f"Running task {task_index}")
+    try:
+        with env_pool.env() as isolated_env:
+            res = agent.solve(
+                env=isolated_env,
+                task_index=task_index,
             )
-            print("-----")
-            with lock:
-                data = []
-                if os.path.exists(ckpt_path):
-                    with open(ckpt_path, "r") as f:
-                        data = json.load(f)
-                with open(ckpt_path, "w") as f:
-                    json.dump(data + [result.model_dump()], f, indent=2)
-            return result
+        result = EnvRunResult(
+            task_id=task_index,
+            reward=res.reward,
+            info=res.info,
+            traj=res.messages,
+            trial=trial,
+        )
+    except EpisodeAborted as e:
+        result = _aborted_result(task_index, trial, get_episode_context(), e)
+    except Exception as e:
+        result = EnvRunResult(
+            task_id=task_index,
+            reward=0.0,
+            info={"error": str(e), "traceback": traceback.format_exc()},
+            traj=[],
+            trial=trial,
+            outcome=EpisodeOutcome.ERROR.value,
+        )
+    context = get_episode_context()
+    if context is not None and context.cancelled is not None:
+        # abandoned at its deadline: the worker already recorded and printed the timeout
+        return result
+    print(
+        "✅" if result.reward == 1 else "❌",
+        f"task_id={task_index}",
+        result.info,
+    )
+    print("-----")
+    return result
 
-        with ThreadPoolExecutor(max_workers=config.max_concurrency) as executor:
-            res = list(executor.map(_run, idxs))
-            results.extend(res)
 
-    display_metrics(results)
+def _run_episode_with_timeout(
+    config: RunConfig,
+    agent: Agent,
+    task_index: int,
+    trial: int,
+    context: EpisodeContext,
+    env_pool: EnvPool,
+) -> EnvRunResult:
+    """Runs the episode on its own thread and gives up on it at the deadline.
+
+    The abandoned thread is cancelled through its episode context, so it stops at its
+    next LLM call (whose timeout is already capped by the deadline), while the calling
+    worker is free to start the next episode right away. Only the worker reports the
+    timed out episode; the abandoned thread's own result is discarded silently, and
+    its env goes back to the pool once that call returns.
+    """
+    outcome: List[EnvRunResult] = []
+    # the copied context carries the episode context into the new thread
+    thread_context = contextvars.copy_context()
+    thread = threading.Thread(
+        target=lambda: outcome.append(
+            thread_context.run(
+                _run_episode,
+                config=config,
+                agent=agent,
+                task_index=task_index,
+                trial=trial,
+                env_pool=env_pool,
+            )
+        ),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(context.remaining_seconds())
+    if len(outcome) > 0:
+        return outcome[0]
+    error = EpisodeAborted(
+        EpisodeOutcome.TIMEOUT, f"Episode timed out after {config.episode_timeout}s"
+    )
+    context.cancel(error)
+    result = _aborted_result(task_index, trial, context, error)
+    print("⏰", f"task_id={task_index}", result.info)
+    print("-----")
+    return result
+
+
+def _aborted_result(
+    task_index: int, trial: int, context: EpisodeContext, error: EpisodeAborted
+) -> EnvRunResult:
+    with context.lock:
+        cost_by_role = dict(context.cost_by_role)
+    return EnvRunResult(
+        task_id=task_index,
+        reward=0.0,
+        info={"error": str(error), "cost_by_role": cost_by_role},
+        # copied, since an abandoned episode thread may still be appending to it
+        traj=list(context.messages),
+        trial=trial,
+        outcome=error.outcome.value,
+    )
+
+
+def save_checkpoint(ckpt_path: str, result: EnvRunResult, lock: Any) -> None:
+    with lock:
+        data = []
+        if os.path.exists(ckpt_path):
+            with open(ckpt_path, "r") as f:
+                data = json.load(f)
+        with open(ckpt_path, "w") as f:
+            json.dump(data + [result.model_dump()], f, indent=2)
+
+
+def run_from_queue(
+    config: RunConfig,
+    agent: Agent,
+    items: List[Tuple[int, int]],
+    save: Callable[[EnvRunResult], None],
+    lock: Any,
+    env_pool: Optional[EnvPool] = None,
+) -> List[EnvRunResult]:
+    """Runs episodes claimed from the shared work queue at `config.queue_path`.
+
+    Every worker enqueues the full set of (env, task, trial) items (duplicates are
+    ignored), then claims items until none are left. Results are stored in the queue
+    and in this worker's own checkpoint; `tau_bench.work_queue merge` combines them.
+    """
+    from tau_bench.work_queue import WorkQueue
+
+    queue = WorkQueue(
+        config.queue_path,
+        lease_seconds=config.queue_lease_seconds,
+        max_attempts=config.queue_max_attempts,
+    )
+    added = queue.enqueue(
+        [(config.env, idx, trial) for idx, trial in items],
+        config=config,
+    )
+    print(f"Worker {queue.worker_id} joined queue {config.queue_path} ({added} new items)")
+    results: List[EnvRunResult] = []
+
+    def _work() -> None:
+        while True:
+            item = queue.claim()
+            if item is None:
+                return
+            try:
+                result = run_episode(
+                    config=config,
+                    agent=agent,
+                    task_index=item.task_id,
+                    trial=item.trial,
+                    env_pool=env_pool,
+                )
+            except BaseException:
+                queue.release(item)
+                raise
+            if result is None:
+                # out of budget: leave the item for a later run
+                queue.release(item, attempted=False)
+                return
+            if queue.complete(item, result):
+                save(result)
+                with lock:
+                    results.append(result)
 
-    with open(ckpt_path, "w") as f:
-        json.dump([result.model_dump() for result in results], f, indent=2)
-        print(f"\n📄 Results saved to {ckpt_path}\n")
+    try:
+        with ThreadPoolExecutor(max_workers=config.max_concurrency) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, _work)
+                for _ in range(config.max_concurrency)
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        counts = queue.counts()
+        queue.close()
+    print(
+        f"Worker {queue.worker_id} finished {len(results)} items; queue status: {counts}"
+    )
+    if counts["pending"] == 0 and counts["leased"] == 0:
+        print(f"Queue is drained; merge it with `python -m tau_bench.work_queue merge --queue-path {config.queue_path}`")
     return results
 
 
@@ -134,6 +762,8 @@ def agent_factory(
             model=config.model,
             provider=config.model_provider,
             temperature=config.temperature,
+            context_budget=config.context_budget,
+            stream=config.stream,
         )
     elif config.agent_strategy == "act":
         # `act` from https://arxiv.org/abs/2210.03629
@@ -146,6 +776,8 @@ def agent_factory(
             provider=config.model_provider,
             use_reasoning=False,
             temperature=config.temperature,
+            context_budget=config.context_budget,
+            stream=config.stream,
         )
     elif config.agent_strategy == "react":
         # `react` from https://arxiv.org/abs/2210.03629
@@ -158,6 +790,8 @@ def agent_factory(
             provider=config.model_provider,
             use_reasoning=True,
             temperature=config.temperature,
+            context_budget=config.context_budget,
+            stream=config.stream,
         )
     elif config.agent_strategy == "few-shot":
         from tau_bench.agents.few_shot_agent import FewShotToolCallingAgent
@@ -172,32 +806,49 @@ def agent_factory(
             provider=config.model_provider,
             few_shot_displays=few_shot_displays,
             temperature=config.temperature,
+            context_budget=config.context_budget,
         )
     else:
         raise ValueError(f"Unknown agent strategy: {config.agent_strategy}")
 
 
 def display_metrics(results: List[EnvRunResult]) -> None:
-    def is_successful(reward: float) -> bool:
-        return (1 - 1e-6) <= reward <= (1 + 1e-6)
-
-    num_trials = len(set([r.trial for r in results]))
     rewards = [r.reward for r in results]
     avg_reward = sum(rewards) / len(rewards)
-    # c from https://arxiv.org/pdf/2406.12045
-    c_per_task_id: dict[int, int] = {}
+    outcome_counts: dict[str, int] = {}
     for result in results:
-        if result.task_id not in c_per_task_id:
-            c_per_task_id[result.task_id] = 1 if is_successful(result.reward) else 0
-        else:
-            c_per_task_id[result.task_id] += 1 if is_successful(result.reward) else 0
-    pass_hat_ks: dict[int, float] = {}
-    for k in range(1, num_trials + 1):
-        sum_task_pass_hat_k = 0
-        for c in c_per_task_id.values():
-            sum_task_pass_hat_k += comb(c, k) / comb(num_trials, k)
-        pass_hat_ks[k] = sum_task_pass_hat_k / len(c_per_task_id)
+        outcome_counts[result.outcome] = outcome_counts.get(result.outcome, 0) + 1
+    if any(outcome != EpisodeOutcome.COMPLETED.value for outcome in outcome_counts):
+        print(f"⚠️  Outcomes (unfinished episodes count as reward 0): {outcome_counts}")
     print(f"🏆 Average reward: {avg_reward}")
+    for role in ["agent", "user"]:
+        usages = [(r.usage_by_role or {}).get(role) for r in results]
+        prompt_tokens = sum(usage["prompt_tokens"] for usage in usages if usage is not None)
+        if prompt_tokens > 0:
+            cached = sum(usage["cached_prompt_tokens"] for usage in usages if usage is not None)
+            print(
+                f"🧊 Prompt cache ({role}): {cached}/{prompt_tokens} prompt tokens cached ({cached / prompt_tokens:.1%})"
+            )
+    streamed = [call for r in results for call in r.info.get("streaming", []) if call["role"] == "agent"]
+    if len(streamed) > 0:
+        actions = [call["time_to_action"] for call in streamed if call["time_to_action"] is not None]
+        print(
+            f"🌊 Streaming: {sum(call['seconds'] for call in streamed) / len(streamed):.2f}s per agent call, "
+            f"action ready after {sum(actions) / len(actions) if actions else float('nan'):.2f}s, "
+            f"{sum(call['stopped_early'] for call in streamed)}/{len(streamed)} stopped early, "
+            f"{sum(call['total_tokens'] or 0 for call in streamed) / len(streamed):.0f} tokens per call"
+        )
+    compactions = [r.info["compaction"] for r in results if "compaction" in r.info]
+    if len(compactions) > 0:
+        steps = [step for c in compactions for step in c["steps"]]
+        sent = sum(step["tokens"] for step in steps)
+        full = sum(step["full_tokens"] for step in steps)
+        saved_costs = [c["saved_cost"] for c in compactions if c["saved_cost"] is not None]
+        print(
+            f"✂️  Context compaction: {sent / len(steps):.0f} conversation tokens per step instead of {full / len(steps):.0f}, "
+            f"{sum(len(c['dropped']) for c in compactions)} tool outputs elided, "
+            f"{full - sent} agent prompt tokens saved (${sum(saved_costs):.4f})"
+        )
     print("📈 Pass^k")
-    for k, pass_hat_k in pass_hat_ks.items():
-        print(f"  k={k}: {pass_hat_k}")
+    for k, pass_hat_k in pass_hat_ks(results).items():
+        print(f"  k={k}: {format_estimate(pass_hat_k)}")
@@ -0,0 +1,210 @@
+# Copyright Sierra
+
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from tau_bench.types import EnvRunResult, Task
+from tau_bench.metrics import success_matrix, task_pass_hat_ks
+from tau_bench.result_reader import iter_results
+
+# tools that only read or compute do not distinguish what a task asks for
+READ_TOOL_PREFIXES = ("get_", "find_", "search_", "list_", "calculate", "think")
+
+
+class Stratum(BaseModel):
+    key: str
+    task_ids: List[int]
+    sampled_task_ids: List[int]
+
+
+class SamplePlan(BaseModel):
+    """A stratified sample of tasks and the weight of each stratum in the full suite."""
+
+    fraction: float
+    num_tasks: int
+    strata: List[Stratum]
+
+    @property
+    def task_ids(self) -> List[int]:
+        return sorted(idx for stratum in self.strata for idx in stratum.sampled_task_ids)
+
+
+class Estimate(BaseModel):
+    value: float
+    stderr: float
+    low: float
+    high: float
+
+
+def _actions_bucket(num_actions: int) -> str:
+    if num_actions <= 1:
+        return f"{num_actions} actions"
+    if num_actions <= 3:
+        return "2-3 actions"
+    return "4+ actions"
+
+
+def task_features(task: Task, difficulty: Optional[float] = None) -> List[str]:
+    """Stratification features of a task, most important first."""
+    features = []
+    if difficulty is not None:
+        features.append(
+            "hard" if difficulty < 1 / 3 else "medium" if difficulty < 2 / 3 else "easy"
+        )
+    features.append(_actions_bucket(len(task.actions)))
+    features.append("outputs" if len(task.outputs) > 0 else "no outputs")
+    tools = sorted(
+        {a.name for a in task.actions if not a.name.startswith(READ_TOOL_PREFIXES)}
+    )
+    features.append("+".join(tools) if tools else "read only")
+    return features
+
+
+def load_difficulty(paths: List[str]) -> Dict[int, float]:
+    """Average reward of each task over prior result files."""
+    totals: Dict[int, List[float]] = {}
+    for path in paths:
+        for result in iter_results(path, exclude=["traj", "info"]):
+            totals.setdefault(result.task_id, []).append(result.reward)
+    return {task_id: sum(rewards) / len(rewards) for task_id, rewards in totals.items()}
+
+
+def stratify(
+    task_ids: List[int],
+    tasks: List[Task],
+    min_size: int,
+    difficulty: Optional[Dict[int, float]] = None,
+) -> Dict[str, List[int]]:
+    """Groups tasks by their features, dropping the least important features of the
+    tasks whose stratum would have fewer than `min_size` tasks."""
+    features = {
+        idx: task_features(
+            tasks[idx],
+            difficulty.get(idx) if difficulty is not None else None,
+        )
+        for idx in task_ids
+    }
+    strata: Dict[str, List[int]] = {}
+    remaining = list(task_ids)
+    num_levels = max((len(f) for f in features.values()), default=0)
+    for level in range(num_levels, 0, -1):
+        groups: Dict[str, List[int]] = {}
+        for idx in remaining:
+            groups.setdefault(" / ".join(features[idx][:level]), []).append(idx)
+        remaining = []
+        for key, idxs in groups.items():
+            if len(idxs) >= min_size:
+                strata[key] = idxs
+            else:
+                remaining.extend(idxs)
+    if len(remaining) > 0:
+        strata["other"] = remaining
+    return strata
+
+
+def sample_tasks(
+    task_ids: List[int],
+    tasks: List[Task],
+    fraction: float,
+    difficulty: Optional[Dict[int, float]] = None,
+    seed: int = 10,
+) -> SamplePlan:
+    """Proportionally allocates `fraction` of the tasks over the strata (at least one
+    per stratum) and samples them at random within each stratum."""
+    assert 0 < fraction <= 1, "The sample fraction must be in (0, 1]"
+    rng = random.Random(seed)
+    # strata of at least 2 / fraction tasks get two samples, so their variance is known
+    strata = stratify(task_ids, tasks, math.ceil(2 / fraction), difficulty)
+    plan = []
+    for key, idxs in sorted(strata.items()):
+        n = min(len(idxs), max(1, round(fraction * len(idxs))))
+        plan.append(Stratum(key=key, task_ids=sorted(idxs), sampled_task_ids=sorted(rng.sample(idxs, n))))
+    return SamplePlan(fraction=fraction, num_tasks=len(task_ids), strata=plan)
+
+
+def stratified_estimate(
+    plan: SamplePlan, values: Dict[int, float], confidence: float = 0.95
+) -> Estimate:
+    """The stratified estimate of the full-suite mean of a per-task value, with a
+    t confidence interval. The variance uses the finite population correction;
+    strata with a single sampled task borrow the pooled within-stratum variance."""
+    stats: List[Tuple[float, int, int, Optional[float]]] = []
+    pooled = []
+    for stratum in plan.strata:
+        observed = [values[idx] for idx in stratum.sampled_task_ids if idx in values]
+        if len(observed) == 0:
+            continue
+        variance = float(np.var(observed, ddof=1)) if len(observed) > 1 else None
+        if variance is not None:
+            pooled.append(variance)
+        stats.append((float(np.mean(observed)), len(observed), len(stratum.task_ids), variance))
+    population = sum(size for _, _, size, _ in stats)
+    if population == 0:
+        return Estimate(value=math.nan, stderr=math.nan, low=math.nan, high=math.nan)
+    pooled_variance = float(np.mean(pooled)) if len(pooled) > 0 else 0.0
+    value = 0.0
+    variance = 0.0
+    for mean, n, size, stratum_variance in stats:
+        weight = size / population
+        value += weight * mean
+        s2 = stratum_variance if stratum_variance is not None else pooled_variance
+        variance += weight**2 * (1 - n / size) * s2 / n
+    stderr = math.sqrt(variance)
+    # samples are small, so use Student's t with n - (number of strata) degrees of freedom
+    df = max(1, sum(n for _, n, _, _ in stats) - len(stats))
+    t = t_quantile(1 - (1 - confidence) / 2, df)
+    return Estimate(value=value, stderr=stderr, low=value - t * stderr, high=value + t * stderr)
+
+
+def t_quantile(q: float, df: int) -> float:
+    """Student's t quantile, from the normal quantile by the Cornish-Fisher expansion
+    (within 1% of the exact value for df >= 3)."""
+    z = NormalDist().inv_cdf(q)
+    return (
+        z
+        + (z**3 + z) / (4 * df)
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3)
+    )
+
+
+def full_suite_estimates(
+    plan: SamplePlan, results: Iterable[EnvRunResult], confidence: float = 0.95
+) -> Dict[str, Estimate]:
+    """Estimates the full-suite average reward and pass^k from a sampled run."""
+    results = list(results)
+    rewards: Dict[int, List[float]] = {}
+    for result in results:
+        rewards.setdefault(result.task_id, []).append(result.reward)
+    estimates = {
+        "avg_reward": stratified_estimate(
+            plan, {idx: sum(r) / len(r) for idx, r in rewards.items()}, confidence
+        )
+    }
+    matrix = success_matrix(results)
+    pass_hat_ks = task_pass_hat_ks(matrix)
+    for k in range(pass_hat_ks.shape[1]):
+        values = {
+            idx: float(pass_hat_ks[i, k])
+            for i, idx in enumerate(matrix.task_ids)
+            if not np.isnan(pass_hat_ks[i, k])
+        }
+        estimates[f"pass^{k + 1}"] = stratified_estimate(plan, values, confidence)
+    return estimates
+
+
+def display_estimates(plan: SamplePlan, results: List[EnvRunResult]) -> None:
+    print(
+        f"🎯 Full-suite estimates from {len(plan.task_ids)}/{plan.num_tasks} tasks "
+        f"in {len(plan.strata)} strata (95% CI)"
+    )
+    for name, estimate in full_suite_estimates(plan, results).items():
+        print(
+            f"  {name}: {estimate.value:.4f} ± {estimate.high - estimate.value:.4f} "
+            f"({estimate.low:.4f}-{estimate.high:.4f})"
+        )
@@ -0,0 +1,103 @@
+# Copyright Sierra
+
+import heapq
+from enum import Enum
+from statistics import mean, median
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+from tau_bench.types import EnvRunResult
+from tau_bench.result_reader import iter_results
+
+
+class SchedulePolicy(Enum):
+    FIFO = "fifo"
+    LONGEST_FIRST = "longest-first"
+
+
+class EpisodeEstimate(BaseModel):
+    task_id: int
+    num_runs: int
+    steps: float
+    duration: Optional[float] = None
+
+
+def count_steps(result: EnvRunResult) -> int:
+    return sum(1 for message in result.traj if message.get("role") == "assistant")
+
+
+def load_episode_estimates(paths: List[str]) -> Dict[int, EpisodeEstimate]:
+    """Averages the step count (and wall-clock duration, when recorded) of each task
+    over every result in the given result files."""
+    steps: Dict[int, List[int]] = {}
+    durations: Dict[int, List[float]] = {}
+    for path in paths:
+        for result in iter_results(path):
+            if len(result.traj) == 0:
+                # errored episodes say nothing about how long the task takes
+                continue
+            steps.setdefault(result.task_id, []).append(count_steps(result))
+            if result.duration is not None:
+                durations.setdefault(result.task_id, []).append(result.duration)
+    return {
+        task_id: EpisodeEstimate(
+            task_id=task_id,
+            num_runs=len(task_steps),
+            steps=mean(task_steps),
+            duration=mean(durations[task_id]) if task_id in durations else None,
+        )
+        for task_id, task_steps in steps.items()
+    }
+
+
+def estimate_costs(
+    task_ids: List[int], estimates: Dict[int, EpisodeEstimate]
+) -> Tuple[Dict[int, float], str]:
+    """Returns the expected cost of each task and its unit ("s" or "steps").
+
+    Durations are used when the prior results recorded them; missing durations are
+    filled in from the step count at the median seconds-per-step. Tasks that were never
+    seen get the average cost of the known tasks.
+    """
+    timed = [e for e in estimates.values() if e.duration is not None and e.steps > 0]
+    if len(timed) > 0:
+        seconds_per_step = median([e.duration / e.steps for e in timed])
+        known = {
+            task_id: e.duration if e.duration is not None else e.steps * seconds_per_step
+            for task_id, e in estimates.items()
+        }
+        unit = "s"
+    else:
+        known = {task_id: e.steps for task_id, e in estimates.items()}
+        unit = "steps"
+    default = mean(known.values()) if len(known) > 0 else 1.0
+    return {task_id: known.get(task_id, default) for task_id in task_ids}, unit
+
+
+def schedule(
+    items: List[Tuple[int, int]],
+    costs: Dict[int, float],
+    policy: SchedulePolicy,
+) -> List[int]:
+    """Returns the positions of the (task_id, trial) items in the order they should start.
+
+    Longest-first is the LPT rule for list scheduling, which keeps the makespan within
+    4/3 of the optimum.
+    """
+    positions = list(range(len(items)))
+    if policy == SchedulePolicy.FIFO:
+        return positions
+    elif policy == SchedulePolicy.LONGEST_FIRST:
+        # stable, so ties keep their original (possibly shuffled) order
+        return sorted(positions, key=lambda pos: -costs[items[pos][0]])
+    raise ValueError(f"Unknown schedule policy: {policy}")
+
+
+def expected_makespan(
+    items: List[Tuple[int, int]], costs: Dict[int, float], num_workers: int
+) -> float:
+    """Simulates greedy list scheduling of the items over `num_workers` workers."""
+    workers = [0.0] * max(1, num_workers)
+    for task_id, _ in items:
+        heapq.heappush(workers, heapq.heappop(workers) + costs[task_id])
+    return max(workers)
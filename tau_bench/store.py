@@ -0,0 +1,397 @@
+# Copyright Sierra
+
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from math import comb
+from typing import Any, Dict, Iterable, List, Optional
+
+from tau_bench.types import (
+    EnvRunResult,
+    RunConfig,
+    RESPOND_ACTION_NAME,
+)
+from tau_bench.result_reader import iter_results
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    env TEXT,
+    model TEXT,
+    model_provider TEXT,
+    user_model TEXT,
+    user_model_provider TEXT,
+    agent_strategy TEXT,
+    temperature REAL,
+    task_split TEXT,
+    user_strategy TEXT,
+    config TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model);
+CREATE INDEX IF NOT EXISTS runs_env ON runs (env);
+
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    task_id INTEGER NOT NULL,
+    trial INTEGER NOT NULL,
+    reward REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    cost REAL,
+    user_cost REAL,
+    duration REAL,
+    num_steps INTEGER NOT NULL,
+    error TEXT,
+    info TEXT NOT NULL,
+    UNIQUE (run_id, task_id, trial)
+);
+CREATE INDEX IF NOT EXISTS episodes_task_id ON episodes (task_id);
+CREATE INDEX IF NOT EXISTS episodes_trial ON episodes (trial);
+CREATE INDEX IF NOT EXISTS episodes_reward ON episodes (reward);
+
+CREATE TABLE IF NOT EXISTS steps (
+    episode_id INTEGER NOT NULL REFERENCES episodes (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT,
+    message TEXT NOT NULL,
+    PRIMARY KEY (episode_id, idx)
+);
+
+CREATE TABLE IF NOT EXISTS tool_calls (
+    episode_id INTEGER NOT NULL REFERENCES episodes (id) ON DELETE CASCADE,
+    step_idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    arguments TEXT,
+    PRIMARY KEY (episode_id, step_idx)
+);
+CREATE INDEX IF NOT EXISTS tool_calls_name ON tool_calls (name);
+"""
+
+RUN_CONFIG_COLUMNS = [
+    "env",
+    "model",
+    "model_provider",
+    "user_model",
+    "user_model_provider",
+    "agent_strategy",
+    "temperature",
+    "task_split",
+    "user_strategy",
+]
+
+# the checkpoint naming scheme of `tau_bench.run.get_ckpt_path`
+CKPT_NAME_PATTERN = re.compile(
+    r"^(?P<agent_strategy>[a-z\-]+?)-(?P<model>.+)-(?P<temperature>[0-9.]+)"
+    r"_range_(?P<start_index>-?\d+)-(?P<end_index>-?\d+)"
+    r"_user-(?P<user_model>.+)-(?P<user_strategy>[a-z]+)_(?P<time_str>\d+)$"
+)
+
+
+def tool_call_of(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Returns the tool call made by an assistant message, for both native tool calls
+    and ReAct-style `Action:` JSON."""
+    if message.get("role") != "assistant":
+        return None
+    tool_calls = message.get("tool_calls")
+    if tool_calls and tool_calls[0].get("function") is not None:
+        function = tool_calls[0]["function"]
+        return {"name": function["name"], "arguments": function.get("arguments")}
+    content = message.get("content") or ""
+    if "Action:" in content:
+        try:
+            action = json.loads(content.split("Action:")[-1].strip())
+        except json.JSONDecodeError:
+            return None
+        if isinstance(action, dict) and action.get("name") not in (None, RESPOND_ACTION_NAME):
+            return {"name": action["name"], "arguments": json.dumps(action.get("arguments"))}
+    return None
+
+
+def infer_env(results: Iterable[EnvRunResult]) -> Optional[str]:
+    for result in results:
+        for message in result.traj:
+            if message.get("role") == "system":
+                content = (message.get("content") or "").lower()
+                if "airline agent policy" in content:
+                    return "airline"
+                if "retail agent policy" in content:
+                    return "retail"
+                return None
+    return None
+
+
+def metadata_from_path(path: str) -> Dict[str, Any]:
+    """Recovers what it can of the run config from a checkpoint file name."""
+    match = CKPT_NAME_PATTERN.match(os.path.splitext(os.path.basename(path))[0])
+    if match is None:
+        return {}
+    metadata: Dict[str, Any] = match.groupdict()
+    metadata["temperature"] = float(metadata["temperature"])
+    return metadata
+
+
+class ResultStore(object):
+    """A SQLite database of runs, episodes, steps and tool calls.
+
+    The runner writes episodes as they finish; existing result files can be imported.
+    Connections are per thread, so one store can be shared by the runner's workers.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add_run(
+        self, name: str, config: Optional[RunConfig] = None, **metadata: Any
+    ) -> int:
+        """Creates a run (or returns the id of the run with this name)."""
+        values: Dict[str, Any] = {}
+        if config is not None:
+            values.update(
+                {k: v for k, v in config.model_dump().items() if k in RUN_CONFIG_COLUMNS}
+            )
+        values.update({k: v for k, v in metadata.items() if k in RUN_CONFIG_COLUMNS and v is not None})
+        conn = self._connection()
+        with conn:
+            row = conn.execute("SELECT id FROM runs WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                return row["id"]
+            columns = ["name", "config", "created_at"] + list(values.keys())
+            cur = conn.execute(
+                f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [name, config.model_dump_json() if config is not None else None, time.time()]
+                + list(values.values()),
+            )
+            return cur.lastrowid
+
+    def add_episode(self, run_id: int, result: EnvRunResult) -> None:
+        self.add_episodes(run_id, [result])
+
+    def add_episodes(self, run_id: int, results: Iterable[EnvRunResult]) -> int:
+        """Inserts (or replaces) episodes and their steps and tool calls in one transaction."""
+        conn = self._connection()
+        num_added = 0
+        with conn:
+            for result in results:
+                user_cost = result.info.get("user_cost") if isinstance(result.info, dict) else None
+                conn.execute(
+                    "DELETE FROM episodes WHERE run_id = ? AND task_id = ? AND trial = ?",
+                    (run_id, result.task_id, result.trial),
+                )
+                cur = conn.execute(
+                    """INSERT INTO episodes
+                    (run_id, task_id, trial, reward, outcome, cost, user_cost, duration, num_steps, error, info)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        run_id,
+                        result.task_id,
+                        result.trial,
+                        result.reward,
+                        result.outcome,
+                        result.cost,
+                        user_cost,
+                        result.duration,
+                        sum(1 for message in result.traj if message.get("role") == "assistant"),
+                        result.info.get("error"),
+                        json.dumps(result.info),
+                    ),
+                )
+                episode_id = cur.lastrowid
+                conn.executemany(
+                    "INSERT INTO steps (episode_id, idx, role, content, message) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (episode_id, idx, message.get("role", ""), message.get("content"), json.dumps(message))
+                        for idx, message in enumerate(result.traj)
+                    ],
+                )
+                tool_calls = []
+                for idx, message in enumerate(result.traj):
+                    tool_call = tool_call_of(message)
+                    if tool_call is not None:
+                        tool_calls.append((episode_id, idx, tool_call["name"], tool_call["arguments"]))
+                conn.executemany(
+                    "INSERT INTO tool_calls (episode_id, step_idx, name, arguments) VALUES (?, ?, ?, ?)",
+                    tool_calls,
+                )
+                num_added += 1
+        return num_added
+
+    def import_result_file(
+        self, path: str, name: Optional[str] = None, **metadata: Any
+    ) -> int:
+        """Imports a result file written by the runner (or a historical trajectory file).
+
+        Run metadata is taken from the checkpoint naming scheme where possible and can be
+        overridden with keyword arguments (e.g. `env="airline"`).
+        """
+        inferred = metadata_from_path(path)
+        if metadata.get("env") is None:
+            # stops at the first system prompt, so this rarely reads past the first record
+            inferred["env"] = infer_env(iter_results(path))
+        inferred.update({k: v for k, v in metadata.items() if v is not None})
+        run_id = self.add_run(name if name is not None else os.path.abspath(path), **inferred)
+        self.add_episodes(run_id, iter_results(path))
+        return run_id
+
+    def query(self, sql: str, params: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._connection().execute(sql, tuple(params)).fetchall()]
+
+    def list_runs(
+        self, model: Optional[str] = None, env: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        where, params = _filters(model=model, env=env)
+        return self.query(
+            f"""SELECT runs.id, runs.name, runs.env, runs.model, runs.agent_strategy, runs.user_model,
+                COUNT(episodes.id) AS num_episodes, AVG(episodes.reward) AS avg_reward,
+                SUM(episodes.cost) AS total_cost
+            FROM runs LEFT JOIN episodes ON episodes.run_id = runs.id
+            {where}
+            GROUP BY runs.id ORDER BY runs.id""",
+            params,
+        )
+
+    def pass_hat_ks(self, run_id: int) -> Dict[int, float]:
+        """pass^k (https://arxiv.org/pdf/2406.12045) of a run, for k up to its number of trials."""
+        rows = self.query(
+            """SELECT task_id, COUNT(*) AS n, SUM(reward BETWEEN 1 - 1e-6 AND 1 + 1e-6) AS c
+            FROM episodes WHERE run_id = ? GROUP BY task_id""",
+            (run_id,),
+        )
+        if len(rows) == 0:
+            return {}
+        num_trials = self.query(
+            "SELECT COUNT(DISTINCT trial) AS n FROM episodes WHERE run_id = ?", (run_id,)
+        )[0]["n"]
+        return {
+            k: sum(comb(row["c"], k) / comb(num_trials, k) for row in rows) / len(rows)
+            for k in range(1, num_trials + 1)
+        }
+
+    def cost_summary(
+        self, model: Optional[str] = None, env: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        where, params = _filters(model=model, env=env)
+        return self.query(
+            f"""SELECT runs.model, runs.env, runs.agent_strategy,
+                COUNT(episodes.id) AS num_episodes, SUM(episodes.cost) AS total_cost,
+                AVG(episodes.cost) AS avg_cost, SUM(episodes.user_cost) AS user_cost,
+                AVG(episodes.reward) AS avg_reward
+            FROM episodes JOIN runs ON episodes.run_id = runs.id
+            {where}
+            GROUP BY runs.model, runs.env, runs.agent_strategy
+            ORDER BY total_cost DESC""",
+            params,
+        )
+
+    def failures_by_outcome(self, run_id: int) -> List[Dict[str, Any]]:
+        return self.query(
+            """SELECT outcome, COUNT(*) AS num_failures FROM episodes
+            WHERE run_id = ? AND NOT (reward BETWEEN 1 - 1e-6 AND 1 + 1e-6)
+            GROUP BY outcome ORDER BY num_failures DESC""",
+            (run_id,),
+        )
+
+    def failures_by_tool(self, run_id: int) -> List[Dict[str, Any]]:
+        """Failure rate of the episodes that called each tool."""
+        return self.query(
+            """SELECT tool_calls.name AS tool,
+                COUNT(DISTINCT episodes.id) AS num_episodes,
+                COUNT(DISTINCT CASE WHEN NOT (episodes.reward BETWEEN 1 - 1e-6 AND 1 + 1e-6)
+                    THEN episodes.id END) AS num_failures
+            FROM tool_calls JOIN episodes ON tool_calls.episode_id = episodes.id
+            WHERE episodes.run_id = ?
+            GROUP BY tool_calls.name ORDER BY num_failures DESC""",
+            (run_id,),
+        )
+
+    def failed_tasks(self, run_id: int) -> List[Dict[str, Any]]:
+        """Tasks that failed in at least one trial, hardest first."""
+        return self.query(
+            """SELECT task_id, COUNT(*) AS num_trials,
+                SUM(NOT (reward BETWEEN 1 - 1e-6 AND 1 + 1e-6)) AS num_failures
+            FROM episodes WHERE run_id = ?
+            GROUP BY task_id HAVING num_failures > 0
+            ORDER BY num_failures DESC, task_id""",
+            (run_id,),
+        )
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _filters(**filters: Optional[str]) -> tuple:
+    clauses = [f"runs.{column} = ?" for column, value in filters.items() if value is not None]
+    params = [value for value in filters.values() if value is not None]
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import and query a SQLite result store")
+    parser.add_argument("--db", type=str, required=True, help="Path to the SQLite database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import result files")
+    import_parser.add_argument("paths", type=str, nargs="+")
+    import_parser.add_argument("--env", type=str, choices=["retail", "airline"])
+    import_parser.add_argument("--model", type=str)
+    import_parser.add_argument("--agent-strategy", type=str)
+    runs_parser = subparsers.add_parser("runs", help="List runs")
+    runs_parser.add_argument("--model", type=str)
+    runs_parser.add_argument("--env", type=str)
+    pass_parser = subparsers.add_parser("pass-k", help="Print pass^k of a run")
+    pass_parser.add_argument("--run-id", type=int, required=True)
+    cost_parser = subparsers.add_parser("cost", help="Print cost per model, env and strategy")
+    cost_parser.add_argument("--model", type=str)
+    cost_parser.add_argument("--env", type=str)
+    failures_parser = subparsers.add_parser("failures", help="Print failure slices of a run")
+    failures_parser.add_argument("--run-id", type=int, required=True)
+    args = parser.parse_args()
+
+    store = ResultStore(args.db)
+    if args.command == "import":
+        for path in args.paths:
+            run_id = store.import_result_file(
+                path, env=args.env, model=args.model, agent_strategy=args.agent_strategy
+            )
+            print(f"Imported {path} as run {run_id}")
+    elif args.command == "runs":
+        for row in store.list_runs(model=args.model, env=args.env):
+            print(row)
+    elif args.command == "pass-k":
+        for k, pass_hat_k in store.pass_hat_ks(args.run_id).items():
+            print(f"  k={k}: {pass_hat_k}")
+    elif args.command == "cost":
+        for row in store.cost_summary(model=args.model, env=args.env):
+            print(row)
+    elif args.command == "failures":
+        print("By outcome:")
+        for row in store.failures_by_outcome(args.run_id):
+            print(f"  {row}")
+        print("By tool:")
+        for row in store.failures_by_tool(args.run_id):
+            print(f"  {row}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# Copyright Sierra
+
+import json
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+_DECODER = json.JSONDecoder()
+
+
+class StreamAssembler(object):
+    """Assembles an assistant message from streamed completion chunks."""
+
+    def __init__(self) -> None:
+        self.content = ""
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Any] = None
+
+    def add(self, chunk: Any) -> None:
+        usage = getattr(chunk, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.usage = usage
+        for choice in chunk.choices:
+            if choice.index != 0:
+                continue
+            delta = choice.delta
+            if delta.content:
+                self.content += delta.content
+            for call in delta.tool_calls or []:
+                idx = call.index or 0
+                while len(self.tool_calls) <= idx:
+                    self.tool_calls.append(
+                        {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
+                    )
+                entry = self.tool_calls[idx]
+                if call.id:
+                    entry["id"] = call.id
+                if call.function is not None:
+                    if call.function.name:
+                        entry["function"]["name"] += call.function.name
+                    if call.function.arguments:
+                        entry["function"]["arguments"] += call.function.arguments
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+
+    def message(self) -> Dict[str, Any]:
+        message: Dict[str, Any] = {"role": "assistant", "content": self.content or None}
+        if len(self.tool_calls) > 0:
+            message["tool_calls"] = self.tool_calls
+        return message
+
+
+def _is_complete_object(text: str) -> bool:
+    text = text.strip()
+    if not text.endswith("}"):
+        return False
+    try:
+        return isinstance(json.loads(text), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+def first_tool_call_ready(assembler: StreamAssembler) -> bool:
+    """True once the first tool call has a name and complete JSON arguments (the
+    tool calling agents only act on the first call)."""
+    if len(assembler.tool_calls) == 0:
+        return False
+    function = assembler.tool_calls[0]["function"]
+    return function["name"] != "" and _is_complete_object(function["arguments"])
+
+
+def react_action_ready(assembler: StreamAssembler) -> bool:
+    """True once the content has an `Action:` followed by a complete JSON object;
+    anything streamed after the object is dropped."""
+    head, sep, tail = assembler.content.rpartition("Action:")
+    if sep == "":
+        return False
+    stripped = tail.lstrip()
+    if not stripped.startswith("{"):
+        return False
+    try:
+        _, end = _DECODER.raw_decode(stripped)
+    except json.JSONDecodeError:
+        return False
+    assembler.content = head + sep + tail[: len(tail) - len(stripped) + end]
+    return True
+
+
+def _close(stream: Any) -> None:
+    # closing the provider's HTTP response stops the generation
+    for obj in (getattr(stream, "completion_stream", None), stream):
+        close = getattr(obj, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+            return
+
+
+def stream_completion(kwargs: Dict[str, Any], ready: Callable[[StreamAssembler], bool]) -> Any:
+    """Calls `litellm.completion` with streaming and stops reading as soon as `ready`
+    says the message holds a complete action.
+
+    Returns the assembled message as a regular (non-streamed) response. When the
+    stream was cut short, its usage is counted from the prompt (tool schemas
+    included) and the text that was received. The
+    timings are in `_hidden_params["stream"]`.
+    """
+    import litellm
+
+    start = time.perf_counter()
+    stream = litellm.completion(**kwargs, stream=True, stream_options={"include_usage": True})
+    assembler = StreamAssembler()
+    time_to_first_token = None
+    time_to_action = None
+    stopped_early = False
+    try:
+        for chunk in stream:
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+            assembler.add(chunk)
+            if time_to_action is None and ready(assembler):
+                time_to_action = time.perf_counter() - start
+                if assembler.finish_reason is None:
+                    stopped_early = True
+                    break
+    finally:
+        _close(stream)
+    seconds = time.perf_counter() - start
+    message = assembler.message()
+    if assembler.usage is not None and not stopped_early:
+        usage = assembler.usage.model_dump() if hasattr(assembler.usage, "model_dump") else dict(assembler.usage)
+    else:
+        # Some providers send the prompt usage before the stream ends; prefer it over
+        # counting locally, which must include the tool schemas to match the bill.
+        prompt_tokens = getattr(assembler.usage, "prompt_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = litellm.token_counter(
+                model=kwargs["model"],
+                messages=kwargs["messages"],
+                tools=kwargs.get("tools"),
+            )
+        completion_tokens = litellm.token_counter(
+            model=kwargs["model"],
+            text=(assembler.content or "") + json.dumps(assembler.tool_calls),
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+    finish_reason = assembler.finish_reason or ("tool_calls" if len(assembler.tool_calls) > 0 else "stop")
+    res = litellm.ModelResponse(
+        id=f"chatcmpl-{uuid.uuid4().hex}",
+        model=kwargs["model"],
+        choices=[{"index": 0, "message": message, "finish_reason": finish_reason}],
+        usage=usage,
+    )
+    try:
+        cost = litellm.completion_cost(
+            completion_response=res,
+            model=kwargs["model"],
+            custom_llm_provider=kwargs.get("custom_llm_provider"),
+        )
+    except Exception:
+        cost = 0.0
+    res._hidden_params = {
+        "response_cost": cost,
+        "stream": {
+            "time_to_first_token": time_to_first_token,
+            "time_to_action": time_to_action,
+            "seconds": seconds,
+            "stopped_early": stopped_early,
+        },
+    }
+    return res
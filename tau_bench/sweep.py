@@ -0,0 +1,270 @@
+# Copyright Sierra
+
+import os
+import json
+import contextvars
+import multiprocessing
+from datetime import datetime
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+from tau_bench.envs import get_env
+from tau_bench.concurrency import AIMDController, concurrency_controller_scope
+from tau_bench.envs.base import Env
+from tau_bench.env_pool import EnvPool
+from tau_bench.store import ResultStore
+from tau_bench.metrics import pass_hat_ks
+from tau_bench.tracing import span
+from tau_bench.telemetry import RunTelemetry, set_run_telemetry
+from tau_bench.types import EnvRunResult, EpisodeOutcome, RunConfig, RunTarget
+from tau_bench.run import (
+    TargetRun,
+    agent_factory,
+    check_config,
+    env_factory,
+    get_ckpt_path,
+    interleave,
+    run_context,
+    run_jobs,
+    select_items,
+    target_config,
+)
+
+
+class SweepRow(BaseModel):
+    model_provider: str
+    model: str
+    temperature: float
+    agent_strategy: str
+    env: str
+    task_split: str
+    num_episodes: int
+    num_unfinished: int
+    avg_reward: Optional[float]
+    pass_hat_ks: Dict[int, float]
+    cost: float
+    avg_duration: Optional[float]
+    ckpt_path: str
+
+
+def parse_model(spec: str) -> Tuple[str, str]:
+    """Parses `<provider>/<model>`, such as `openai/gpt-4o`; the model name may contain
+    slashes itself (`together_ai/meta-llama/Llama-3-70b-chat-hf`)."""
+    provider, _, model = spec.partition("/")
+    if provider == "" or model == "":
+        raise ValueError(f"Invalid model {spec!r}, expected <provider>/<model>")
+    return provider, model
+
+
+def parse_provider_concurrency(spec: str) -> Dict[str, int]:
+    """Parses `<provider>=<max concurrency>`, such as `anthropic=5`."""
+    provider, sep, limit = spec.partition("=")
+    if sep == "" or not limit.isdigit():
+        raise ValueError(f"Invalid provider concurrency {spec!r}, expected <provider>=<max concurrency>")
+    return {provider: int(limit)}
+
+
+def expand_grid(
+    config: RunConfig,
+    models: Optional[List[Tuple[str, str]]] = None,
+    temperatures: Optional[List[float]] = None,
+    agent_strategies: Optional[List[str]] = None,
+) -> List[RunConfig]:
+    """One config per combination of (provider, model), temperature and agent strategy.
+    Dimensions that are not given keep the value of `config`."""
+    return [
+        config.model_copy(
+            update={
+                "model_provider": provider,
+                "model": model,
+                "temperature": temperature,
+                "agent_strategy": agent_strategy,
+            }
+        )
+        for (provider, model), temperature, agent_strategy in product(
+            models or [(config.model_provider, config.model)],
+            temperatures or [config.temperature],
+            agent_strategies or [config.agent_strategy],
+        )
+    ]
+
+
+def run_sweep(
+    config: RunConfig,
+    points: List[RunConfig],
+    provider_concurrency: Optional[Dict[str, int]] = None,
+) -> List[SweepRow]:
+    """Runs every grid point on every target of `config` (or its env and task split) in
+    one process, and returns one comparison row per point and target.
+
+    The points share the run-wide settings of `config` (rate limits, cost budget,
+    cassette, completion cache, tracing) and the envs of each env, split and user
+    simulator. Episodes are grouped by the agent's provider, and each provider gets its
+    own worker pool of `provider_concurrency[provider]` workers (`--max-concurrency` by
+    default), so a slow or throttled provider does not hold up the others. With adaptive
+    concurrency each provider also gets its own controller, so throttling by one
+    provider does not shrink the window of the others.
+    """
+    for point in points:
+        check_config(point)
+    assert config.queue_path is None, "Sweeps do not support a work queue"
+    assert not config.schedule_from, "Sweeps do not support scheduling from prior results"
+    provider_concurrency = provider_concurrency or {}
+    targets = config.targets or [RunTarget(env=config.env, task_split=config.task_split)]
+    time_str = datetime.now().strftime("%m%d%H%M%S")
+    sweep_dir = os.path.join(config.log_dir, f"sweep_{time_str}")
+    os.makedirs(sweep_dir, exist_ok=True)
+    lock = multiprocessing.Lock()
+    store = ResultStore(config.results_db) if config.results_db is not None else None
+
+    # the run-wide controller would cap the episodes of all providers together
+    run_wide = config.model_copy(update={"adaptive_concurrency": False})
+    with run_context(run_wide), span("sweep", "run", num_points=len(points), num_targets=len(targets)):
+        probes: Dict[Tuple[str, ...], Env] = {}
+        env_pools: Dict[Tuple[str, ...], EnvPool] = {}
+        units: List[TargetRun] = []
+        for point, target in product(points, targets):
+            tconfig = target_config(point, target)
+            key = (tconfig.env, tconfig.task_split, tconfig.user_strategy, tconfig.user_model, tconfig.user_model_provider)
+            if key not in probes:
+                probes[key] = get_env(
+                    tconfig.env,
+                    user_strategy=tconfig.user_strategy,
+                    user_model=tconfig.user_model,
+                    user_provider=tconfig.user_model_provider,
+                    task_split=tconfig.task_split,
+                )
+                env_pools[key] = EnvPool(env_factory(tconfig), [probes[key]])
+            env = probes[key]
+            items, _ = select_items(tconfig, env.tasks)
+            ckpt_name = os.path.basename(get_ckpt_path(tconfig, time_str))
+            units.append(
+                TargetRun(
+                    config=tconfig,
+                    agent=agent_factory(tools_info=env.tools_info, wiki=env.wiki, config=tconfig),
+                    items=items,
+                    ckpt_path=os.path.join(
+                        sweep_dir, f"{target.env}-{target.task_split}_{tconfig.model_provider}_{ckpt_name}"
+                    ),
+                    lock=lock,
+                    store=store,
+                    env_pool=env_pools[key],
+                )
+            )
+        by_provider: Dict[str, List[TargetRun]] = {}
+        for unit in units:
+            by_provider.setdefault(unit.config.model_provider, []).append(unit)
+        jobs = {provider: interleave(provider_units) for provider, provider_units in by_provider.items()}
+        controllers = {
+            provider: AIMDController(
+                max_limit=provider_concurrency.get(provider, config.max_concurrency),
+                initial_limit=config.initial_concurrency,
+            )
+            for provider in jobs
+            if config.adaptive_concurrency
+        }
+        print(
+            f"🧹 Sweeping {len(points)} configs x {len(targets)} targets "
+            f"({sum(len(j) for j in jobs.values())} episodes) to {sweep_dir}; workers per provider: "
+            + ", ".join(f"{p}={provider_concurrency.get(p, config.max_concurrency)}" for p in jobs)
+        )
+
+        telemetry = RunTelemetry(
+            total=sum(len(provider_jobs) for provider_jobs in jobs.values()),
+            metrics_path=os.path.join(sweep_dir, "metrics.json"),
+            interval_seconds=config.telemetry_interval,
+        )
+        set_run_telemetry(telemetry)
+        telemetry.start()
+        try:
+            with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+                futures = {
+                    provider: executor.submit(
+                        contextvars.copy_context().run,
+                        _run_provider,
+                        provider_concurrency.get(provider, config.max_concurrency),
+                        provider_jobs,
+                        controllers.get(provider),
+                    )
+                    for provider, provider_jobs in jobs.items()
+                }
+                outcomes = {provider: future.result() for provider, future in futures.items()}
+        finally:
+            telemetry.stop()
+            set_run_telemetry(None)
+            for provider, controller in controllers.items():
+                print(f"🚦 Adaptive concurrency ({provider}): {controller.stats()}")
+
+    rows = []
+    for unit in units:
+        provider = unit.config.model_provider
+        results = [
+            result
+            for (job_unit, _, _), result in zip(jobs[provider], outcomes[provider])
+            if job_unit is unit and result is not None
+        ]
+        unit.write_results(results)
+        rows.append(sweep_row(unit.config, unit.ckpt_path, results))
+    print(format_table(rows))
+    summary_path = os.path.join(sweep_dir, "summary.json")
+    with open(summary_path, "w") as f:
+        json.dump([row.model_dump() for row in rows], f, indent=2)
+    print(f"\n📄 Sweep summary saved to {summary_path}\n")
+    return rows
+
+
+def _run_provider(
+    max_concurrency: int, jobs: List[Tuple[TargetRun, int, int]], controller: Optional[AIMDController]
+) -> List[Optional[EnvRunResult]]:
+    if controller is None:
+        return run_jobs(max_concurrency, jobs)
+    with concurrency_controller_scope(controller):
+        return run_jobs(max_concurrency, jobs)
+
+
+def sweep_row(config: RunConfig, ckpt_path: str, results: List[EnvRunResult]) -> SweepRow:
+    durations = [r.duration for r in results if r.duration is not None]
+    return SweepRow(
+        model_provider=config.model_provider,
+        model=config.model,
+        temperature=config.temperature,
+        agent_strategy=config.agent_strategy,
+        env=config.env,
+        task_split=config.task_split,
+        num_episodes=len(results),
+        num_unfinished=sum(1 for r in results if r.outcome != EpisodeOutcome.COMPLETED.value),
+        avg_reward=sum(r.reward for r in results) / len(results) if len(results) > 0 else None,
+        pass_hat_ks={k: float(e.value) for k, e in pass_hat_ks(results, ci=None).items()},
+        cost=sum(r.cost or 0.0 for r in results),
+        avg_duration=sum(durations) / len(durations) if len(durations) > 0 else None,
+        ckpt_path=ckpt_path,
+    )
+
+
+def format_table(rows: List[SweepRow]) -> str:
+    max_k = max((max(row.pass_hat_ks) for row in rows if len(row.pass_hat_ks) > 0), default=0)
+    header = ["model", "temperature", "agent", "target", "episodes", "reward"]
+    header += [f"pass^{k}" for k in range(1, max_k + 1)]
+    header += ["cost", "s/episode", "unfinished"]
+
+    def _fmt(value: Optional[float], spec: str) -> str:
+        return "-" if value is None else format(value, spec)
+
+    lines = [header]
+    for row in rows:
+        lines.append(
+            [
+                f"{row.model_provider}/{row.model}",
+                f"{row.temperature:g}",
+                row.agent_strategy,
+                f"{row.env}:{row.task_split}",
+                str(row.num_episodes),
+                _fmt(row.avg_reward, ".4f"),
+            ]
+            + [_fmt(row.pass_hat_ks.get(k), ".4f") for k in range(1, max_k + 1)]
+            + [f"${row.cost:.2f}", _fmt(row.avg_duration, ".1f"), str(row.num_unfinished)]
+        )
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in lines)
@@ -0,0 +1,154 @@
+# Copyright Sierra
+
+import os
+import json
+import math
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+from tau_bench.types import EnvRunResult
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if len(sorted_values) == 0:
+        return None
+    # the smallest value with at least a fraction q of the values at or below it
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class RunTelemetry(object):
+    """Live progress of a run: throughput, latency, cost burn, reward and ETA.
+
+    Counters are updated by the runner and by `tau_bench.llm.completion`; a background
+    thread prints a status line and rewrites a metrics JSON file every `interval_seconds`.
+    """
+
+    def __init__(
+        self,
+        total: Optional[int],
+        metrics_path: Optional[str] = None,
+        interval_seconds: float = 30.0,
+    ) -> None:
+        self.total = total
+        self.metrics_path = metrics_path
+        self.interval_seconds = interval_seconds
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+        self.num_started = 0
+        self.num_finished = 0
+        self.num_successes = 0
+        self.num_errors = 0
+        self.total_reward = 0.0
+        self.durations: List[float] = []
+        self.cost_by_role: Dict[str, float] = {}
+        self.calls_by_role: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.start_time = time.time()
+        if self.interval_seconds <= 0:
+            return
+
+        def _report() -> None:
+            while not self._stop.wait(self.interval_seconds):
+                self.report()
+
+        self._thread = threading.Thread(target=_report, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.interval_seconds > 0:
+            self.report()
+
+    def episode_started(self) -> None:
+        with self.lock:
+            self.num_started += 1
+
+    def episode_finished(self, result: EnvRunResult) -> None:
+        with self.lock:
+            self.num_finished += 1
+            self.total_reward += result.reward
+            if (1 - 1e-6) <= result.reward <= (1 + 1e-6):
+                self.num_successes += 1
+            if "error" in result.info:
+                self.num_errors += 1
+            if result.duration is not None:
+                self.durations.append(result.duration)
+
+    def record_call(self, role: str, cost: float) -> None:
+        with self.lock:
+            self.cost_by_role[role] = self.cost_by_role.get(role, 0.0) + cost
+            self.calls_by_role[role] = self.calls_by_role.get(role, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            elapsed = time.time() - self.start_time
+            durations = sorted(self.durations)
+            episodes_per_minute = self.num_finished / elapsed * 60 if elapsed > 0 else 0.0
+            eta = None
+            if self.total is not None and episodes_per_minute > 0:
+                eta = (self.total - self.num_finished) / episodes_per_minute * 60
+            return {
+                "elapsed_seconds": elapsed,
+                "total": self.total,
+                "num_finished": self.num_finished,
+                "num_in_flight": self.num_started - self.num_finished,
+                "num_errors": self.num_errors,
+                "episodes_per_minute": episodes_per_minute,
+                "p50_episode_seconds": percentile(durations, 0.5),
+                "p95_episode_seconds": percentile(durations, 0.95),
+                "avg_reward": self.total_reward / self.num_finished if self.num_finished > 0 else None,
+                "success_rate": self.num_successes / self.num_finished if self.num_finished > 0 else None,
+                "cost_by_role": dict(self.cost_by_role),
+                "calls_by_role": dict(self.calls_by_role),
+                "total_cost": sum(self.cost_by_role.values()),
+                "eta_seconds": eta,
+            }
+
+    def status_line(self, snapshot: Optional[Dict[str, Any]] = None) -> str:
+        s = snapshot if snapshot is not None else self.snapshot()
+
+        def _fmt(value: Optional[float], spec: str) -> str:
+            return "-" if value is None else format(value, spec)
+
+        done = f"{s['num_finished']}/{s['total']}" if s["total"] is not None else str(s["num_finished"])
+        costs = " ".join(f"{role}=${cost:.2f}" for role, cost in sorted(s["cost_by_role"].items()))
+        return (
+            f"📊 {done} done, {s['num_in_flight']} in flight, {s['episodes_per_minute']:.1f} eps/min"
+            f" | p50 {_fmt(s['p50_episode_seconds'], '.0f')}s p95 {_fmt(s['p95_episode_seconds'], '.0f')}s"
+            f" | avg reward {_fmt(s['avg_reward'], '.3f')}"
+            f" | cost ${s['total_cost']:.2f} ({costs or 'no calls'})"
+            f" | ETA {_fmt(s['eta_seconds'] / 60 if s['eta_seconds'] is not None else None, '.1f')} min"
+        )
+
+    def report(self) -> None:
+        snapshot = self.snapshot()
+        print(self.status_line(snapshot), flush=True)
+        if self.metrics_path is not None:
+            # write then rename so that readers never see a half-written file
+            tmp_path = f"{self.metrics_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_path, self.metrics_path)
+
+
+RUN_TELEMETRY: Optional[RunTelemetry] = None
+_RUN_TELEMETRY_LOCK = threading.Lock()
+
+
+def set_run_telemetry(telemetry: Optional[RunTelemetry]) -> None:
+    with _RUN_TELEMETRY_LOCK:
+        global RUN_TELEMETRY
+        RUN_TELEMETRY = telemetry
+
+
+def get_run_telemetry() -> Optional[RunTelemetry]:
+    with _RUN_TELEMETRY_LOCK:
+        return RUN_TELEMETRY
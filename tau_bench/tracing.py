@@ -0,0 +1,146 @@
+# Copyright Sierra
+
+import os
+import json
+import time
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+class Span(object):
+    def __init__(self, name: str, category: str, span_id: int, parent_id: Optional[int], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.category = category
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoopSpan(object):
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(object):
+    """Writes spans to a Chrome trace event file (open it in https://ui.perfetto.dev or
+    chrome://tracing).
+
+    Events are appended as spans end, so the file is usable even if the run dies (the
+    format allows a missing closing bracket). Each thread gets its own track; spans
+    also carry `span_id` and `parent_id` attributes, so that the run -> episode ->
+    step -> call tree survives across threads.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.num_spans = 0
+        self._ids = itertools.count(1)
+        self._tids: Dict[int, int] = {}
+        self._file = open(path, "w")
+        self._file.write("[")
+        self._first = True
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        # called with the lock held
+        self._file.write(("\n" if self._first else ",\n") + json.dumps(event, default=str))
+        self._first = False
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        tid = self._tids.get(ident)
+        if tid is None:
+            tid = self._tids[ident] = len(self._tids) + 1
+            self._write(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "tid": tid,
+                    "args": {"name": threading.current_thread().name},
+                }
+            )
+        return tid
+
+    def record(self, span: Span, start: float, end: float) -> None:
+        args = dict(span.attrs)
+        args["span_id"] = span.span_id
+        if span.parent_id is not None:
+            args["parent_id"] = span.parent_id
+        with self.lock:
+            if self._file.closed:
+                return
+            self._write(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": (start - self.start) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": self.pid,
+                    "tid": self._tid(),
+                    "args": args,
+                }
+            )
+            self.num_spans += 1
+
+    def close(self) -> None:
+        with self.lock:
+            if not self._file.closed:
+                self._file.write("\n]\n")
+                self._file.close()
+
+
+_CURRENT_SPAN: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+@contextmanager
+def span(name: str, category: str, **attrs: Any) -> Iterator[Any]:
+    """Records a span if a tracer is set; attributes can be added while it is open."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    parent = _CURRENT_SPAN.get()
+    current = Span(name, category, tracer.next_id(), parent.span_id if parent is not None else None, attrs)
+    token = _CURRENT_SPAN.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _CURRENT_SPAN.reset(token)
+        tracer.record(current, start, time.perf_counter())
+
+
+TRACER: Optional[Tracer] = None
+_TRACER_LOCK = threading.Lock()
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    with _TRACER_LOCK:
+        global TRACER
+        TRACER = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    with _TRACER_LOCK:
+        return TRACER
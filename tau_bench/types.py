@@ -1,5 +1,6 @@
 # Copyright Sierra
 
+from enum import Enum
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional, Union
 
@@ -61,12 +62,44 @@ class EnvResetResponse(BaseModel):
     info: EnvInfo
 
 
+class EpisodeOutcome(Enum):
+    COMPLETED = "completed"
+    ERROR = "error"
+    # the episode reached --max-cost-per-episode
+    OVER_BUDGET = "over_budget"
+    # the run reached --max-cost while the episode was running
+    BUDGET_EXHAUSTED = "budget_exhausted"
+    # the episode ran past --episode-timeout
+    TIMEOUT = "timeout"
+
+
 class EnvRunResult(BaseModel):
     task_id: int
     reward: float
     info: Dict[str, Any]
     traj: List[Dict[str, Any]]
     trial: int
+    duration: Optional[float] = None
+    outcome: str = EpisodeOutcome.COMPLETED.value
+    cost: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    # prompt tokens served from the provider's prompt cache
+    cached_prompt_tokens: Optional[int] = None
+    # the same two counts for the calls of each role ("agent", "user")
+    usage_by_role: Optional[Dict[str, Dict[str, int]]] = None
+    # agent completions served from (or missing in) the persistent completion cache
+    completion_cache_hits: Optional[int] = None
+    completion_cache_misses: Optional[int] = None
+
+
+class RateLimit(BaseModel):
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+
+
+class RunTarget(BaseModel):
+    env: str
+    task_split: str = "test"
 
 
 class RunConfig(BaseModel):
@@ -88,3 +121,31 @@ class RunConfig(BaseModel):
     shuffle: int = 0
     user_strategy: str = "llm"
     few_shot_displays_path: Optional[str] = None
+    queue_path: Optional[str] = None
+    queue_lease_seconds: float = 300.0
+    queue_max_attempts: int = 3
+    adaptive_concurrency: bool = False
+    initial_concurrency: Optional[int] = None
+    max_llm_retries: int = 5
+    rate_limits: Optional[Dict[str, RateLimit]] = None
+    # max in-flight LLM calls per role ("agent", "user") or endpoint ("<provider>[/<model>]")
+    call_limits: Optional[Dict[str, int]] = None
+    schedule_from: Optional[List[str]] = None
+    schedule_policy: str = "longest-first"
+    telemetry_interval: float = 30.0
+    max_cost: Optional[float] = None
+    max_cost_per_episode: Optional[float] = None
+    episode_timeout: Optional[float] = None
+    llm_call_timeout: Optional[float] = None
+    results_db: Optional[str] = None
+    sample_fraction: Optional[float] = None
+    sample_strata_from: Optional[List[str]] = None
+    cassette_path: Optional[str] = None
+    cassette_mode: str = "record"
+    trace_path: Optional[str] = None
+    context_budget: Optional[int] = None
+    completion_cache_path: Optional[str] = None
+    completion_cache_max_mb: float = 1024.0
+    stream: bool = False
+    # with targets, `env` and `task_split` are ignored and every target is run on one worker pool
+    targets: Optional[List[RunTarget]] = None
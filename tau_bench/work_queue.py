@@ -0,0 +1,337 @@
+# Copyright Sierra
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+from typing import List, Dict, Optional, Tuple
+from pydantic import BaseModel
+
+from tau_bench.types import EnvRunResult, RunConfig
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+# claimed `max_attempts` times without a result, e.g. because its episode keeps
+# crashing its worker or outliving its lease
+FAILED = "failed"
+
+# fields that must agree between every worker attached to the same queue
+SHARED_CONFIG_FIELDS = [
+    "model_provider",
+    "user_model_provider",
+    "model",
+    "user_model",
+    "num_trials",
+    "env",
+    "agent_strategy",
+    "temperature",
+    "task_split",
+    "user_strategy",
+]
+
+
+class WorkItem(BaseModel):
+    env: str
+    task_id: int
+    trial: int
+    attempts: int
+
+
+class WorkQueue(object):
+    """A work queue of (env, task_id, trial) items backed by a SQLite file.
+
+    Workers claim items under a lease that a background thread keeps renewing. If a
+    worker dies, its leases expire and the items are handed out again, up to
+    `max_attempts` claims in total; after that an item is marked failed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 300.0,
+        worker_id: Optional[str] = None,
+        max_attempts: int = 3,
+    ) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = (
+            worker_id
+            if worker_id is not None
+            else f"{socket.gethostname()}-{os.getpid()}"
+        )
+        self._local = threading.local()
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        with self._transaction() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS items (
+                    env TEXT NOT NULL,
+                    task_id INTEGER NOT NULL,
+                    trial INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    PRIMARY KEY (env, task_id, trial)
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS items_status ON items (status, lease_expires)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections cannot be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection())
+
+    def enqueue(
+        self, items: List[Tuple[str, int, int]], config: Optional[RunConfig] = None
+    ) -> int:
+        """Adds items that are not already in the queue and returns how many were added.
+
+        If a config is given, it is stored on first use and every later worker must
+        agree with it on the fields in `SHARED_CONFIG_FIELDS`.
+        """
+        with self._transaction() as conn:
+            if config is not None:
+                self._check_config(conn, config)
+            before = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO items (env, task_id, trial, status) VALUES (?, ?, ?, ?)",
+                [(env, task_id, trial, PENDING) for env, task_id, trial in items],
+            )
+            after = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        return after - before
+
+    def _check_config(self, conn: sqlite3.Connection, config: RunConfig) -> None:
+        shared = {k: v for k, v in config.model_dump().items() if k in SHARED_CONFIG_FIELDS}
+        row = conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('config', ?)",
+                (json.dumps(config.model_dump()),),
+            )
+            return
+        stored = json.loads(row[0])
+        mismatched = [k for k in SHARED_CONFIG_FIELDS if stored.get(k) != shared.get(k)]
+        if len(mismatched) > 0:
+            raise ValueError(
+                f"Run config does not match the config of queue {self.path}: {mismatched}"
+            )
+
+    def get_config(self) -> Optional[RunConfig]:
+        row = (
+            self._connection()
+            .execute("SELECT value FROM meta WHERE key = 'config'")
+            .fetchone()
+        )
+        return RunConfig.model_validate_json(row[0]) if row is not None else None
+
+    def claim(self) -> Optional[WorkItem]:
+        """Leases the next pending (or expired) item, or returns None if there is none.
+
+        Claimable items that were already claimed `max_attempts` times are marked failed
+        instead of being handed out again.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE items SET status = ?, worker = NULL, lease_expires = NULL
+                WHERE (status = ? OR (status = ? AND lease_expires < ?)) AND attempts >= ?""",
+                (FAILED, PENDING, LEASED, now, self.max_attempts),
+            )
+            row = conn.execute(
+                """SELECT env, task_id, trial, attempts FROM items
+                WHERE status = ? OR (status = ? AND lease_expires < ?)
+                ORDER BY rowid LIMIT 1""",
+                (PENDING, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            env, task_id, trial, attempts = row
+            conn.execute(
+                """UPDATE items SET status = ?, worker = ?, lease_expires = ?, attempts = ?
+                WHERE env = ? AND task_id = ? AND trial = ?""",
+                (LEASED, self.worker_id, now + self.lease_seconds, attempts + 1, env, task_id, trial),
+            )
+        self._ensure_heartbeat()
+        return WorkItem(env=env, task_id=task_id, trial=trial, attempts=attempts + 1)
+
+    def heartbeat(self) -> int:
+        """Extends the leases of every item held by this worker."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE items SET lease_expires = ? WHERE status = ? AND worker = ?",
+                (time.time() + self.lease_seconds, LEASED, self.worker_id),
+            )
+            return cur.rowcount
+
+    def _ensure_heartbeat(self) -> None:
+        if self._heartbeat_thread is not None and self._heartbeat_thread.is_alive():
+            return
+
+        def _beat() -> None:
+            while not self._stop_heartbeat.wait(self.lease_seconds / 3):
+                try:
+                    self.heartbeat()
+                except sqlite3.OperationalError:
+                    # the database is busy; the next beat still lands well before expiry
+                    pass
+
+        self._heartbeat_thread = threading.Thread(target=_beat, daemon=True)
+        self._heartbeat_thread.start()
+
+    def complete(self, item: WorkItem, result: EnvRunResult) -> bool:
+        """Stores the result of an item. Returns False if another worker already did."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                """UPDATE items SET status = ?, worker = ?, lease_expires = NULL, result = ?
+                WHERE env = ? AND task_id = ? AND trial = ? AND status != ?""",
+                (DONE, self.worker_id, result.model_dump_json(), item.env, item.task_id, item.trial, DONE),
+            )
+            return cur.rowcount > 0
+
+    def release(self, item: WorkItem, attempted: bool = True) -> None:
+        """Gives an unfinished item back to the queue. If its episode never started
+        (`attempted=False`), the claim does not count towards `max_attempts`."""
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE items SET status = ?, worker = NULL, lease_expires = NULL, attempts = attempts - ?
+                WHERE env = ? AND task_id = ? AND trial = ? AND status = ? AND worker = ?""",
+                (PENDING, 0 if attempted else 1, item.env, item.task_id, item.trial, LEASED, self.worker_id),
+            )
+
+    def counts(self) -> Dict[str, int]:
+        rows = (
+            self._connection()
+            .execute("SELECT status, COUNT(*) FROM items GROUP BY status")
+            .fetchall()
+        )
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def failed(self) -> List[WorkItem]:
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT env, task_id, trial, attempts FROM items WHERE status = ? ORDER BY rowid", (FAILED,)
+            )
+            .fetchall()
+        )
+        return [
+            WorkItem(env=env, task_id=task_id, trial=trial, attempts=attempts)
+            for env, task_id, trial, attempts in rows
+        ]
+
+    def results(self) -> List[EnvRunResult]:
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT result FROM items WHERE status = ? ORDER BY trial, rowid", (DONE,)
+            )
+            .fetchall()
+        )
+        return [EnvRunResult.model_validate_json(row[0]) for row in rows]
+
+    def close(self) -> None:
+        self._stop_heartbeat.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _Transaction(object):
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        # take the write lock up front so that concurrent claims cannot interleave
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+
+
+def merge_queue_results(queue_path: str, output_path: Optional[str] = None) -> List[EnvRunResult]:
+    """Writes the finished items of a queue to a standard result file and prints metrics."""
+    from tau_bench.run import display_metrics, get_ckpt_path
+
+    queue = WorkQueue(queue_path)
+    counts = queue.counts()
+    if counts[PENDING] > 0 or counts[LEASED] > 0:
+        print(
+            f"Warning: queue is not drained ({counts[PENDING]} pending, {counts[LEASED]} leased)"
+        )
+    failed = queue.failed()
+    if len(failed) > 0:
+        print(
+            f"Warning: {len(failed)} items failed and have no result: "
+            + ", ".join(
+                f"{item.env} task {item.task_id} trial {item.trial} ({item.attempts} attempts)" for item in failed
+            )
+        )
+    results = queue.results()
+    if output_path is None:
+        config = queue.get_config()
+        if config is None:
+            raise ValueError(f"Queue {queue_path} has no stored config; pass an output path")
+        output_path = get_ckpt_path(config)
+    queue.close()
+    if len(results) > 0:
+        display_metrics(results)
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(output_path, "w") as f:
+        json.dump([result.model_dump() for result in results], f, indent=2)
+        print(f"\n📄 Results saved to {output_path}\n")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or merge a shared work queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    status_parser = subparsers.add_parser("status", help="Print item counts by status")
+    status_parser.add_argument("--queue-path", type=str, required=True)
+    merge_parser = subparsers.add_parser("merge", help="Write a standard result file")
+    merge_parser.add_argument("--queue-path", type=str, required=True)
+    merge_parser.add_argument(
+        "--output-path",
+        type=str,
+        help="Path to the result file (defaults to the run's checkpoint naming scheme)",
+    )
+    args = parser.parse_args()
+    if args.command == "status":
+        queue = WorkQueue(args.queue_path)
+        print(queue.counts())
+        queue.close()
+    elif args.command == "merge":
+        merge_queue_results(args.queue_path, args.output_path)
+
+
+if __name__ == "__main__":
+    main()